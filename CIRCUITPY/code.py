@@ -5,14 +5,41 @@ https://github.com/alankrantas/project-foobear-circuitpython-fnaf-fan-game
 '''
 
 
-# ===== import built-in modules =====
+# ===== boot profiler =====
 
-import random, time, os, sys, gc
-import board, digitalio, analogio, pwmio, displayio, audioio, audiocore, audiomixer
-from micropython import const
+import time, gc
 
+# every bootPhase() call ends the running startup phase and prints its time and the heap it kept
+# as one line of key=value pairs, read by tools/bootreport.py
 gc.enable()
 gc.collect()
+bootStart = time.monotonic_ns()
+bootMark = [bootStart, gc.mem_free()]  # start time and free heap of the running phase
+bootPhases = [0]
+
+def bootPhase(name):
+    end = time.monotonic_ns()
+    gc.collect()
+    free = gc.mem_free()
+    print(f'Boot phase: name={name} ms={(end - bootMark[0]) / 1000000:.1f} heapBytes={bootMark[1] - free} free={free}')
+    bootPhases[0] += 1
+    bootMark[0] = time.monotonic_ns()
+    bootMark[1] = free
+
+
+# ===== import built-in modules =====
+
+import random, os, sys
+import board, keypad, analogio, pwmio, displayio, audioio, audiocore, audiomixer, supervisor
+from micropython import const
+bootPhase('import.builtins')
+from engine import *
+bootPhase('import.engine')
+from layout import *  # generated by tools/genlayout.py
+bootPhase('import.layout')
+from glyphs import *  # generated by tools/subsetfont.py
+bootPhase('import.glyphs')
+
 mem_limit = gc.mem_free()
 
 
@@ -20,12 +47,16 @@ mem_limit = gc.mem_free()
 
 try:
     from adafruit_display_text.label import Label
+    bootPhase('import.adafruit_display_text')
     from adafruit_display_shapes.line import Line
     from adafruit_display_shapes.rect import Rect
     from adafruit_display_shapes.circle import Circle
     from adafruit_display_shapes.triangle import Triangle
+    bootPhase('import.adafruit_display_shapes')
     from adafruit_progressbar.verticalprogressbar import VerticalProgressBar
+    bootPhase('import.adafruit_progressbar')
     from adafruit_bitmap_font import bitmap_font
+    bootPhase('import.adafruit_bitmap_font')
 except Exception as e:
     print(f'import library error: {e}')
     
@@ -34,163 +65,45 @@ print('Loading packages...ok')
 
 # ===== game logic - config =====
 
-ANOMALY_NAME = 'FooBear'
 TITLE = f'Project\n{ANOMALY_NAME}'
 
 # for debugging or cheating purposes
 ANOMALY_ALWAYS_SHOWN = True
 ANOMALY_ACTION_LOG = True
 ANOMALY_NOT_MOVING = False
+ANOMALY_LEARNED_MOVES = False  # use movepolicy.bin (see tools/adversary.py); harder than the balance tools model
 SKIP_TITLE_ANIMATION = False
+TRACE_NIGHTS = True  # print a replayable trace of every night (see tools/replay.py)
 
-# game parameters (all interval and countdown time values are seconds * 10)
-AI_START_LEVEL = const(10)  # 1-100
-AI_FINAL_LEVEL = const(90)  # 1-100
-HOUR_INTERVAL = const(400)
-MOVE_INTERVAL = const(40)
-MOVE_MODE_RESET_CHANCE = const(33)
-MOVE_MODE_MORE_ACTIVE_CHANCE = const(66)
-LURED_CHANCE = const(75)
-SCAN_COOLDOWN = const(15)
-AUDIO_COOLDOWN = const(600)
-ZAP_COOLDOWN = const(150)
-POWER_LIMIT = const(100)
-DOOR_POWER_CHANGE_LEVEL = const(5)
-SCAN_POWER_CHANGE_LEVEL = const(15)
-AUDIO_POWER_CHANGE_LEVEL = const(30)
-ZAP_POWER_CHANGE_LEVEL = const(50)
-POWER_REBOOT_INTERNAL = const(160)
+# game parameters are in engine.py (all interval and countdown time values are seconds * 10)
+GC_INTERVAL = const(8)
+TICK_NS = const(100000000)  # 100 ms
+MAX_CATCH_UP_TICKS = const(5)  # game ticks replayed at most after a stall; older ones are dropped
 WHITE = const(0xFFFFFF)
 BLACK = const(0x000000)
 
 
-# ===== game logic - rooms =====
-
-'''
-0(b)-1----2
-|    |    |
-3----4----5--|
-|    |    w  9(z)
-6----7--d[8]-|
-
-0: Demo Room (has a Bluetooth speaker in there)
-1: Developers' Office
-2: Cafeteria
-3: Meeting room
-4: Main hallway
-5: Server room
-6: Restroom
-7: Lobby
-8: Control room (where you are; power usage is shown and the security door can be locked)
-9: Air Vent (has a electric bug zapper installed)
-
-b: Bluetooth speaker
-d: Security door
-w: Window
-z: Bug zapper
-'''
-
-ROOM_NAMES = {
-    0: 'Demo Room',
-    1: 'Dev Office',
-    2: 'Cafeteria',
-    3: 'Meeting',
-    4: 'Hallway',
-    5: 'Servers',
-    6: 'Restroom',
-    7: 'Lobby',
-    8: 'Control',  # target
-    9: 'Air Vent'
-}
-
-RESET_ROOMS = (0, 1, 3)
-SCANNABLE_ROOMS = (0, 1, 2, 3, 4, 5, 6, 7)
-WALK_SOUND_ROOMS = (4, 5, 7)
-TARGET_ROOM = const(8)
-AIR_VENT_ROOM = const(9)
-AUDIO_ROOM = const(0)
-DOOR_ROOM = const(7)
-WINDOW_ROOM = const(5)
-CENTER_ROOM = const(4)
-
-MOVE_PERF = {  # anamony's move mode
-    'Normal': {  # roaming; not hunting
-        0: (1, 3),
-        1: (2, 4),
-        2: (1, 5),
-        3: (4, 6),
-        4: (3, 5, 7),
-        5: (4,),
-        6: (3, 7),
-        7: (4,),
-        8: [],
-        9: (5,),
-    },
-    'Door': {  # go to the door; hunting
-        0: (3,),
-        1: (4,),
-        2: (1, 5),
-        3: (4, 6),
-        4: (7,),
-        5: (4,),
-        6: (7,),
-        7: (8,),
-        8: [],
-        9: (5,),
-    },
-    'Air Vent': {  # go to the air vent: hunting
-        0: (1, 3),
-        1: (2, 4),
-        2: (5,),
-        3: (0, 4),
-        4: (5,),
-        5: (9,),
-        6: (3, 7),
-        7: (4,),
-        8: [],
-        9: (8,),
-    },
-    'Escape': {  # escape from being blocked
-        0: (1, 3),
-        1: (0,),
-        2: (1,),
-        3: (0,),
-        4: (1, 3,),
-        5: (2, 4),
-        6: (3,),
-        7: (4,),
-        8: [],
-        9: (5,),
-    },
-    'Lure': {  # lured by audio
-        0: [],
-        1: (0,),
-        2: (1,),
-        3: (0,),
-        4: (1, 3,),
-        5: (2, 4,),
-        6: (3,),
-        7: (4, 6),
-        8: [],
-        9: (5,),
-    },
-}
+# ===== game engine =====
 
+movePolicy = None
+if ANOMALY_LEARNED_MOVES:
+    try:
+        with open('./movepolicy.bin', 'rb') as f:
+            movePolicy = f.read()
+    except OSError:
+        print('movepolicy.bin not found, using random moves')
 
-# ===== game logic - internal variables =====
+engine = Engine(
+    seed=random.getrandbits(30),
+    log=print,
+    actionLog=ANOMALY_ACTION_LOG,
+    alwaysShown=ANOMALY_ALWAYS_SHOWN,
+    notMoving=ANOMALY_NOT_MOVING,
+    movePolicy=movePolicy)
+trace = Trace()
 
-AI = 0
-gameStatus = ''
-hour = 0
-anomalyRoom = 0
-selectedRoom = TARGET_ROOM
-detectionRoom = 0
-moveMode = ''
-pressedKey = ''
-doorClosed = False
-systemPower = 0
-powerOut = False
-justLaughed = 0
+print('Loading game engine...ok')
+bootPhase('engine')
 
 
 # ===== pin and device config ===== https://wiki.seeedstudio.com/Wio-Terminal-IO-Overview/
@@ -207,48 +120,71 @@ pin_btn_right = board.SWITCH_RIGHT
 
 # ===== buttons =====
 
-def btnFactory(pin):
-    btn = digitalio.DigitalInOut(pin)
-    btn.direction = digitalio.Direction.INPUT
-    btn.pull = digitalio.Pull.UP
-    return btn
-
-btns = {
-    'Special': {
-        'btn': btnFactory(pin_btn_special),
-        'action': 'PlayerAction',
-    },
-    'Scan': {
-        'btn': btnFactory(pin_btn_scan),
-        'action': 'PlayerAction',
-    },
-    'Up': {
-        'btn': btnFactory(pin_btn_up),
-        'action': 'SelectRoom',
-    },
-    'Down': {
-        'btn': btnFactory(pin_btn_down),
-        'action': 'SelectRoom',
-    },
-    'Left': {
-        'btn': btnFactory(pin_btn_left),
-        'action': 'SelectRoom',
-    },
-    'Right': {
-        'btn': btnFactory(pin_btn_right),
-        'action': 'SelectRoom',
-    },
+# keypad scans the buttons in the background every KEY_SCAN_INTERVAL seconds, debounced, and queues
+# their press and release edges; the queue is read once per tick, so a press shorter than a tick
+# is not lost and the presses made during a slow tick are given to the following ticks in order
+KEY_NAMES = ('Special', 'Scan', 'Up', 'Down', 'Left', 'Right')  # by key number, the first held one wins
+KEY_SCAN_INTERVAL = 0.01
+KEY_QUEUE_SIZE = const(16)
+
+keys = keypad.Keys(
+    (pin_btn_special, pin_btn_scan, pin_btn_up, pin_btn_down, pin_btn_left, pin_btn_right),
+    value_when_pressed=False,
+    pull=True,
+    interval=KEY_SCAN_INTERVAL,
+    max_events=KEY_QUEUE_SIZE)
+keyEvent = keypad.Event()           # reused by pollKeys()
+keysHeld = bytearray(len(KEY_NAMES))
+keyPresses = []                     # key numbers pressed and not given to a tick yet, oldest first
+keyStats = {
+    'presses': 0,
+    'queued': 0,      # presses that came while another one was still waiting for a tick
+    'overflows': 0,   # times the event queue was full and had to be dropped
 }
 
-def detectKeyPress():
-    global pressedKey
-    for key, item in btns.items():
-        if not item['btn'].value:
-            pressedKey = key
-            invokeCallbackAndCountdown(item['action'])
-            return
+def pollKeys():
+    events = keys.events
+    if events.overflowed:
+        keyStats['overflows'] += 1
+        clearKeys()
+        return
+    while events.get_into(keyEvent):
+        number = keyEvent.key_number
+        if keyEvent.pressed:
+            keysHeld[number] = 1
+            keyStats['presses'] += 1
+            if keyPresses:
+                keyStats['queued'] += 1
+            if len(keyPresses) < KEY_QUEUE_SIZE:
+                keyPresses.append(number)
+        else:
+            keysHeld[number] = 0
+
+# the key of one tick: the oldest press not given to a tick yet, else the key held down (held keys repeat);
+# a press waits while its action is still counting down, as the engine would ignore it
+def nextKey():
+    pollKeys()
+    if keyPresses:
+        key = KEY_NAMES[keyPresses[0]]
+        if engine.countpool(KEY_ACTIONS[key]):
+            return None
+        keyPresses.pop(0)
+        return key
+    for number in range(len(KEY_NAMES)):
+        if keysHeld[number]:
+            return KEY_NAMES[number]
+    return None
+
+# forgets the queued presses; the keys still held down are queued again as new presses
+def clearKeys():
+    keys.events.clear()
+    keys.reset()
+    keyPresses.clear()
+    for number in range(len(KEY_NAMES)):
+        keysHeld[number] = 0
 
 print('Configuring buttons...ok')
+bootPhase('buttons')
 
 
 # ===== font ===== https://github.com/Tecate/bitmap-fonts/tree/master/bitmap/terminus-font-4.39
@@ -256,58 +192,122 @@ print('Configuring buttons...ok')
 try:
     font_12 = bitmap_font.load_font('./font/ter-u12b.pcf')
     font_22 = bitmap_font.load_font('./font/ter-u22b.pcf')
+    bootPhase('fonts')
+    # every glyph the game draws is loaded now, so that no text change reads the font files mid-game
+    font_12.load_glyphs(FONT_12_GLYPHS)
+    font_22.load_glyphs(FONT_22_GLYPHS)
 except Exception as e:
     print(f'Font load error: {e}')
     sys.exit()
 
 print('Loading fonts...ok')
+bootPhase('glyphs')
 
 
 # ===== audio =====
 
-VOICE_BACKGROUND = const(0)
-VOICE_PLAYER_ACTION = const(1)
-VOICE_PLAYER_EFFECT = const(2)
-VOICE_PLAYER_EFFECT_2 = const(3)
-VOICE_ANOMALY_ACTION = const(4)
-VOICE_ANOMALY_LAUGH = const(5)
-
-audioLibrary = {}
+# all audio files are mono WAVs in ./audio of the same sample rate and bits
+# clips are opened on their first play and kept open in a least recently used list within
+# AUDIO_CACHE_BUDGET bytes of RAM, except the pinned ones, which stay open the whole session
+AUDIO_CACHE_BUDGET = const(8192)
+AUDIO_PINNED = ('ambience', 'tap', 'error')
+
+audioFiles = {}     # clip name -> path
+audioLibrary = {}   # clip name -> open WaveFile
+audioCost = {}      # clip name -> bytes of RAM taken by opening it
+audioLRU = []       # open clips that are not pinned, least recently played first
+audioStats = {
+    'opened': 0,
+    'evicted': 0,
+    'bytes': 0,
+}
 
-# add all audio files in ./audio
-# all audio files are 22.5 KHz 16 bit mono WAVs
 for filename in os.listdir('audio'):
-    if not filename.endswith('.wav'):
-        continue
+    if filename.endswith('.wav'):
+        audioFiles[filename.replace('.wav', '')] = f'./audio/{filename}'
+
+def openAudio(name):
+    free = gc.mem_free()
     try:
-        audioLibrary[filename.replace('.wav', '')] = audiocore.WaveFile(f'./audio/{filename}')
+        wave = audiocore.WaveFile(audioFiles[name])
     except Exception as e:
         print(f'Audio load error: {e}')
+        return None
+    cost = free - gc.mem_free()
+    audioLibrary[name] = wave
+    audioCost[name] = cost if cost > 0 else 1024  # a gc run during the open hides the real cost
+    audioStats['opened'] += 1
+    audioStats['bytes'] += audioCost[name]
+    return wave
+
+def isClipPlaying(name):
+    for voice, clip in enumerate(voiceClips):
+        if clip == name and mixer.voice[voice].playing:
+            return True
+    return False
+
+# close the least recently played clips until there is room for another one; clips still playing stay open
+def evictAudio(budget):
+    i = 0
+    while i < len(audioLRU) and sum(audioCost[name] for name in audioLRU) > budget:
+        name = audioLRU[i]
+        if isClipPlaying(name):
+            i += 1
+            continue
+        audioLRU.pop(i)
+        audioLibrary.pop(name).deinit()
+        audioStats['evicted'] += 1
+        audioStats['bytes'] -= audioCost[name]
+
+def getAudio(name):
+    wave = audioLibrary.get(name)
+    if name in AUDIO_PINNED:
+        return wave if wave is not None else openAudio(name)
+    if wave is None:
+        evictAudio(AUDIO_CACHE_BUDGET - audioCost.get(name, 1024))
+        wave = openAudio(name)
+        if wave is None:
+            return None
+    else:
+        audioLRU.remove(name)
+    audioLRU.append(name)
+    return wave
+
+for name in AUDIO_PINNED:
+    if name not in audioFiles or openAudio(name) is None:
+        print(f'Audio file missing: {name}.wav')
         sys.exit()
-        
-print('Loading audio library...ok')
 
+print(f'Loading audio library...ok ({len(audioFiles)} clips, {len(AUDIO_PINNED)} opened)')
+bootPhase('audio')
+
+# the mixer only plays clips of its own format, which all clips share (see tools/audiopack.py)
 audio = audioio.AudioOut(pin_audio)
 mixer = audiomixer.Mixer(
     channel_count=1,
     voice_count=6,
     buffer_size=2048,
-    bits_per_sample=16,
-    sample_rate=22050,
-    samples_signed=True)
+    bits_per_sample=audioLibrary['ambience'].bits_per_sample,
+    sample_rate=audioLibrary['ambience'].sample_rate,
+    samples_signed=audioLibrary['ambience'].bits_per_sample > 8)  # 8 bit WAVs are unsigned
 audio.play(mixer)
+voiceClips = [None] * len(mixer.voice)  # clip last played on each voice
 
-def playAudio(voice, name):
-    mixer.voice[voice].play(audioLibrary[name])
+def playAudio(voice, name, loop=False):
+    wave = getAudio(name)
+    if wave is not None:
+        mixer.voice[voice].play(wave, loop=loop)
+        voiceClips[voice] = name
 
 def isVoicePlaying(voice):
     return mixer.voice[voice].playing
 
 def playBackgroundAudio():
-    if not powerOut and not isVoicePlaying(VOICE_BACKGROUND):
-        playAudio(VOICE_BACKGROUND, 'ambience')
+    if not engine.powerOut and not isVoicePlaying(VOICE_BACKGROUND):
+        playAudio(VOICE_BACKGROUND, 'ambience', loop=True)
 
 print('Configuring audio mixer...ok')
+bootPhase('mixer')
 
 
 # ===== main screen config =====
@@ -317,18 +317,48 @@ display.root_group = None
 display.brightness = 1.0
 display.auto_refresh = False
 
+# the gameplay loop only refreshes the display after something on it has changed
+refreshStats = {
+    'dirty': True,
+    'performed': 0,
+    'skipped': 0,
+}
+
+def markDirty():
+    refreshStats['dirty'] = True
+
+# last value written to each property of the main screen objects, so that unchanged values are not written again
+appliedUI = {}
+uiStats = {
+    'writes': 0,
+    'avoided': 0,
+}
+
+def setUI(obj, prop, value):
+    applied = appliedUI.get(obj)
+    if applied is None:
+        applied = appliedUI[obj] = {}
+    elif prop in applied and applied[prop] == value:
+        uiStats['avoided'] += 1
+        return
+    setattr(obj, prop, value)
+    applied[prop] = value
+    uiStats['writes'] += 1
+    markDirty()
+
+def refreshIfDirty():
+    if refreshStats['dirty']:
+        display.refresh()
+        refreshStats['dirty'] = False
+        refreshStats['performed'] += 1
+    else:
+        refreshStats['skipped'] += 1
+
 splashMain = displayio.Group()
 splashTitle = displayio.Group()
 
 SCREEN_W = display.width
 SCREEN_H = display.height
-ROOM_W = const(65)
-ROOM_H = const(40)
-ROOM_INTERVAL = const(15)
-LEFT_PAD = const(25)
-TOP_PAD = const(75)
-ICON_DEFAULT_X = const(-ROOM_INTERVAL*2)
-ICON_DEFAULT_Y = const(-ROOM_INTERVAL*2)
 
 ROOM_BORDER_COLOR = const(0xFFF5EE)
 ROOM_BORDER_CONTROL_COLOR = const(0x00BFFF)
@@ -366,25 +396,11 @@ MSG_PAD = const(20)
 
 # ===== display - main =====
 
-drawRooms = []
-
-for j in range(3):
-    for i in range(3):
-        drawRooms.append(
-            Rect(
-                x=LEFT_PAD+(ROOM_W+ROOM_INTERVAL)*i,
-                y=TOP_PAD+(ROOM_H+ROOM_INTERVAL)*j,
-                width=ROOM_W,
-                height=ROOM_H,
-                outline=ROOM_BORDER_COLOR))
-
-drawRooms.append(
-    Rect(
-        x=drawRooms[WINDOW_ROOM].x+drawRooms[WINDOW_ROOM].width+round(ROOM_INTERVAL*1.5),
-        y=drawRooms[WINDOW_ROOM].y+round(drawRooms[WINDOW_ROOM].height/4),
-        width=round(ROOM_W/3),
-        height=round(ROOM_H*1.5)+ROOM_INTERVAL,
-        outline=ROOM_BORDER_COLOR))
+# all coordinates come from layout.py, regenerate it with tools/genlayout.py after changing the layout
+drawRooms = [
+    Rect(x=x, y=y, width=w, height=h, outline=ROOM_BORDER_COLOR)
+    for x, y, w, h in ROOM_RECTS
+]
 
 drawRooms[TARGET_ROOM].outline = ROOM_BORDER_CONTROL_COLOR
 
@@ -392,160 +408,91 @@ roomLabels = [
     Label(
         font=font_12,
         text=ROOM_NAMES[i],
-        x=drawRooms[i].x,
-        y=drawRooms[i].y+6,
+        x=x,
+        y=y,
         color=ROOM_LABEL_COLOR)
-    for i in range(9)
+    for i, (x, y) in enumerate(ROOM_LABEL_POS)
 ]
 
-roomLabels.append(
-    Label(
-        font=font_12,
-        text=ROOM_NAMES[AIR_VENT_ROOM],
-        x=drawRooms[AIR_VENT_ROOM].x,
-        y=drawRooms[AIR_VENT_ROOM].y-12,
-        color=ROOM_LABEL_COLOR))
-
-
-for i in (0, 1, 3, 4, 6, 7):
-    splashMain.append(
-        Line(
-            x0=drawRooms[i].x+drawRooms[i].width,
-            y0=drawRooms[i].y+round(drawRooms[i].height/2),
-            x1=drawRooms[i].x+drawRooms[i].width+ROOM_INTERVAL,
-            y1=drawRooms[i].y+round(drawRooms[i].height/2),
-            color=CORRIDOR_COLOR))
-
-for i in range(5):
-    splashMain.append(
-        Line(
-            x0=drawRooms[i].x+round(drawRooms[i].width/2),
-            y0=drawRooms[i].y+drawRooms[i].height,
-            x1=drawRooms[i].x+round(drawRooms[i].width/2),
-            y1=drawRooms[i].y+drawRooms[i].height+ROOM_INTERVAL,
-            color=CORRIDOR_COLOR))
-
-for i in (5, 8):
-    splashMain.append(
-        Line(
-            x0=drawRooms[i].x+drawRooms[i].width,
-            y0=drawRooms[i].y+round(drawRooms[i].height/2),
-            x1=drawRooms[AIR_VENT_ROOM].x,
-            y1=drawRooms[i].y+round(drawRooms[i].height/2),
-            color=CORRIDOR_COLOR))
+for x0, y0, x1, y1 in CORRIDOR_LINES:
+    splashMain.append(Line(x0=x0, y0=y0, x1=x1, y1=y1, color=CORRIDOR_COLOR))
 
 for r in drawRooms:
     splashMain.append(r)
 
-for i, l in enumerate(roomLabels):
-    l.x = drawRooms[i].x+round(drawRooms[i].width/2 - l.width/2)
+for l in roomLabels:
     splashMain.append(l)
-        
+
 door = Rect(
-            x=drawRooms[TARGET_ROOM].x-round(ROOM_INTERVAL/4),
-            y=drawRooms[TARGET_ROOM].y+round(drawRooms[TARGET_ROOM].height/8),
-            width=round(ROOM_INTERVAL/2),
-            height=round(drawRooms[TARGET_ROOM].height*3/4),
+            x=DOOR_RECT[0],
+            y=DOOR_RECT[1],
+            width=DOOR_RECT[2],
+            height=DOOR_RECT[3],
             fill=DOOR_OPEN_LABEL_COLOR)
 
 window = Rect(
-            x=drawRooms[TARGET_ROOM].x+round(drawRooms[TARGET_ROOM].width/8),
-            y=drawRooms[TARGET_ROOM].y-round(ROOM_INTERVAL*3/4),
-            width=round(drawRooms[TARGET_ROOM].width*3/4),
-            height=round(ROOM_INTERVAL/2),
+            x=WINDOW_RECT[0],
+            y=WINDOW_RECT[1],
+            width=WINDOW_RECT[2],
+            height=WINDOW_RECT[3],
             fill=ROOM_WINDOW_COLOR)
 
 scanBtnLabel = Label(
             font=font_22,
             text='Scan',
-            x=drawRooms[0].x,
-            y=drawRooms[0].y-ROOM_INTERVAL*2,
+            x=SCAN_LABEL_X,
+            y=BUTTON_LABEL_Y,
             color=BLACK,
             background_color=BLACK,
-            padding_top=4,
-            padding_bottom=4,
-            padding_left=4,
-            padding_right=4)
-scanBtnLabel.x = drawRooms[0].x + round(drawRooms[0].width/2 - scanBtnLabel.width/2)
+            padding_top=BUTTON_LABEL_PADDING,
+            padding_bottom=BUTTON_LABEL_PADDING,
+            padding_left=BUTTON_LABEL_PADDING,
+            padding_right=BUTTON_LABEL_PADDING)
 
 actionBtnLabel = Label(
             font=font_22,
             text='Action',
-            x=drawRooms[2].x,
-            y=drawRooms[2].y-ROOM_INTERVAL*2,
+            x=ACTION_LABEL_X['Action'],
+            y=BUTTON_LABEL_Y,
             color=BLACK,
             background_color=BLACK,
-            padding_top=4,
-            padding_bottom=4,
-            padding_left=4,
-            padding_right=4)
-actionBtnLabel.x = drawRooms[2].x + round(drawRooms[2].width/2 - actionBtnLabel.width/2)
+            padding_top=BUTTON_LABEL_PADDING,
+            padding_bottom=BUTTON_LABEL_PADDING,
+            padding_left=BUTTON_LABEL_PADDING,
+            padding_right=BUTTON_LABEL_PADDING)
 
 hourLabel = Label(
             font=font_22,
             text='0 AM',
-            x=drawRooms[1].x,
-            y=drawRooms[1].y-ROOM_INTERVAL*2,
+            x=HOUR_LABEL_X[0],
+            y=BUTTON_LABEL_Y,
             color=HOUR_LABEL_TEXT_COLOR,
             background_color=BLACK,
-            padding_top=4,
-            padding_bottom=4,
-            padding_left=4,
-            padding_right=4)
-hourLabel.x = drawRooms[1].x + round(drawRooms[1].width/2 - hourLabel.width/2)
-
-scanCooldownBar = VerticalProgressBar(
-            position=(
-                drawRooms[0].x-ROOM_INTERVAL,
-                round(scanBtnLabel.y-scanBtnLabel.height/2)),
-            size=(round(ROOM_INTERVAL/2), scanBtnLabel.height),
+            padding_top=BUTTON_LABEL_PADDING,
+            padding_bottom=BUTTON_LABEL_PADDING,
+            padding_left=BUTTON_LABEL_PADDING,
+            padding_right=BUTTON_LABEL_PADDING)
+
+def barFactory(rect, max_value, bar_color=COOLDOWN_BAR_COLOR, outline_color=BLACK):
+    return VerticalProgressBar(
+            position=(rect[0], rect[1]),
+            size=(rect[2], rect[3]),
             min_value=0,
-            max_value=SCAN_COOLDOWN,
+            max_value=max_value,
             value=0,
-            bar_color=COOLDOWN_BAR_COLOR_2,
-            outline_color=BLACK,
+            bar_color=bar_color,
+            outline_color=outline_color,
             fill_color=BLACK)
 
-audioCooldownBar = VerticalProgressBar(
-            position=(
-                drawRooms[AUDIO_ROOM].x-ROOM_INTERVAL,
-                drawRooms[AUDIO_ROOM].y),
-            size=(round(ROOM_INTERVAL/2), ROOM_H),
-            min_value=0,
-            max_value=AUDIO_COOLDOWN,
-            value=0,
-            bar_color=COOLDOWN_BAR_COLOR,
-            outline_color=BLACK,
-            fill_color=BLACK)
-
-zapCooldownBar = VerticalProgressBar(
-            position=(
-                drawRooms[AIR_VENT_ROOM].x+drawRooms[AIR_VENT_ROOM].width+round(ROOM_INTERVAL/2),
-                drawRooms[AIR_VENT_ROOM].y+round(drawRooms[AIR_VENT_ROOM].height/4)),
-            size=(round(ROOM_INTERVAL/2), round(drawRooms[AIR_VENT_ROOM].height/2)),
-            min_value=0,
-            max_value=ZAP_COOLDOWN,
-            value=0,
-            bar_color=COOLDOWN_BAR_COLOR,
-            outline_color=BLACK,
-            fill_color=BLACK)
-
-systemPowerBar = VerticalProgressBar(
-            position=(
-                drawRooms[TARGET_ROOM].x+drawRooms[TARGET_ROOM].width-round(ROOM_INTERVAL/2),
-                drawRooms[TARGET_ROOM].y),
-            size=(round(ROOM_INTERVAL/2), drawRooms[TARGET_ROOM].height),
-            min_value=0,
-            max_value=POWER_LIMIT,
-            value=0,
-            bar_color=COOLDOWN_BAR_COLOR,
-            outline_color=ROOM_BORDER_CONTROL_COLOR,
-            fill_color=BLACK)
+scanCooldownBar = barFactory(SCAN_BAR_RECT, Engine.SCAN_COOLDOWN, bar_color=COOLDOWN_BAR_COLOR_2)
+audioCooldownBar = barFactory(AUDIO_BAR_RECT, Engine.AUDIO_COOLDOWN)
+zapCooldownBar = barFactory(ZAP_BAR_RECT, Engine.ZAP_COOLDOWN)
+systemPowerBar = barFactory(POWER_BAR_RECT, Engine.POWER_LIMIT, outline_color=ROOM_BORDER_CONTROL_COLOR)
 
 anomalyIcon = Circle(
             x0=ICON_DEFAULT_X,
             y0=ICON_DEFAULT_Y,
-            r=round(ROOM_INTERVAL/2),
+            r=ANOMALY_ICON_R,
             fill=ANOMALY_ICON_COLOR)
 
 anomalyLabel = Label(
@@ -555,28 +502,10 @@ anomalyLabel = Label(
             y=anomalyIcon.y0,
             color=WHITE)
 
-TRI_BASE = ROOM_INTERVAL
-TRI_H = round(TRI_BASE * (3 ** 0.5) / 2)
-TRI_CEN_TO_BASE = round(TRI_BASE * (3 ** 0.5) / 6)
-
-audioIcon = Triangle(
-            x0=drawRooms[AUDIO_ROOM].x-TRI_CEN_TO_BASE,
-            y0=drawRooms[AUDIO_ROOM].y+round(drawRooms[AUDIO_ROOM].height/2)-round(TRI_BASE/2),
-            x1=drawRooms[AUDIO_ROOM].x-TRI_CEN_TO_BASE,
-            y1=drawRooms[AUDIO_ROOM].y+round(drawRooms[AUDIO_ROOM].height/2)+round(TRI_BASE/2),
-            x2=drawRooms[AUDIO_ROOM].x+TRI_CEN_TO_BASE,
-            y2=drawRooms[AUDIO_ROOM].y+round(drawRooms[AUDIO_ROOM].height/2),
-            fill=AUDIO_ICON_COLOR)
+audioIcon = Triangle(*AUDIO_ICON_POINTS, fill=AUDIO_ICON_COLOR)
 audioIcon.fill = None
 
-zapIcon = Triangle(
-            x0=drawRooms[AIR_VENT_ROOM].x+drawRooms[AIR_VENT_ROOM].width+TRI_CEN_TO_BASE,
-            y0=drawRooms[AIR_VENT_ROOM].y+round(drawRooms[AIR_VENT_ROOM].height/2)-round(TRI_BASE/2),
-            x1=drawRooms[AIR_VENT_ROOM].x+drawRooms[AIR_VENT_ROOM].width+TRI_CEN_TO_BASE,
-            y1=drawRooms[AIR_VENT_ROOM].y+round(drawRooms[AIR_VENT_ROOM].height/2)+round(TRI_BASE/2),
-            x2=drawRooms[AIR_VENT_ROOM].x+drawRooms[AIR_VENT_ROOM].width-(TRI_H-TRI_CEN_TO_BASE),
-            y2=drawRooms[AIR_VENT_ROOM].y+round(drawRooms[AIR_VENT_ROOM].height/2),
-            fill=ZAP_ICON_COLOR)
+zapIcon = Triangle(*ZAP_ICON_POINTS, fill=ZAP_ICON_COLOR)
 zapIcon.fill = None
 
 splashMain.append(door)
@@ -593,28 +522,31 @@ splashMain.append(anomalyLabel)
 splashMain.append(audioIcon)
 splashMain.append(zapIcon)
 print('Loading main screen layers...ok')
+bootPhase('mainScreen')
 
 def showIcon(icon):
     if icon == 'anomaly':
-        anomalyIcon.x0 = drawRooms[anomalyRoom].x + round(drawRooms[anomalyRoom].width/2)
-        anomalyIcon.y0 = drawRooms[anomalyRoom].y + round(drawRooms[anomalyRoom].height/2)
-        anomalyLabel.x = anomalyIcon.x0 - round(anomalyLabel.width/2)
-        anomalyLabel.y = anomalyIcon.y0
+        x0, y0 = ROOM_CENTERS[engine.anomalyRoom]
+        x, y = ANOMALY_LABEL_POS[engine.anomalyRoom]
+        setUI(anomalyIcon, 'x0', x0)
+        setUI(anomalyIcon, 'y0', y0)
+        setUI(anomalyLabel, 'x', x)
+        setUI(anomalyLabel, 'y', y)
     elif icon == 'audio':
-        audioIcon.fill = AUDIO_ICON_COLOR
+        setUI(audioIcon, 'fill', AUDIO_ICON_COLOR)
     elif icon == 'zap':
-        zapIcon.fill = ZAP_ICON_COLOR
+        setUI(zapIcon, 'fill', ZAP_ICON_COLOR)
 
 def hideIcon(icon):
     if icon == 'anomaly' or icon == 'all':
-        anomalyIcon.x0 = ICON_DEFAULT_X
-        anomalyIcon.y0 = ICON_DEFAULT_Y
-        anomalyLabel.x = anomalyIcon.x
-        anomalyLabel.y = anomalyIcon.y
+        setUI(anomalyIcon, 'x0', ICON_DEFAULT_X)
+        setUI(anomalyIcon, 'y0', ICON_DEFAULT_Y)
+        setUI(anomalyLabel, 'x', ANOMALY_LABEL_HIDDEN_POS[0])
+        setUI(anomalyLabel, 'y', ANOMALY_LABEL_HIDDEN_POS[1])
     if icon == 'audio' or icon == 'all':
-        audioIcon.fill = None
+        setUI(audioIcon, 'fill', None)
     if icon == 'zap' or icon == 'all':
-        zapIcon.fill = None
+        setUI(zapIcon, 'fill', None)
 
 def startMainScreen():
     global splashTitle
@@ -622,6 +554,7 @@ def startMainScreen():
     splashTitle = None
     gc.collect()
     display.root_group = splashMain
+    markDirty()
 
 
 # ===== power out screen =====
@@ -630,6 +563,7 @@ powerOutLabel = None
 
 def startMainScreenPowerOut():
     global splashTitle, powerOutLabel
+    enterMemoryPhase('powerOut')
     print('Loading power out screen...')
     display.root_group = None
     splashTitle = None
@@ -646,12 +580,14 @@ def startMainScreenPowerOut():
     powerOutLabel.y = round(SCREEN_H/2 - powerOutLabel.height/2)
     splashTitle.append(powerOutLabel)
     display.root_group = splashTitle
+    markDirty()
 
 
 # ===== title screen =====
 
 def startTitleScreen():
     global splashTitle, firstTimeRunning
+    enterMemoryPhase('title')
     print('Loading title screen...')
     print(f'First time playing: {firstTimeRunning}')
     splashTitle = displayio.Group()
@@ -679,6 +615,7 @@ def startTitleScreen():
     splashTitle.append(labelMsg)
     splashTitle.append(labelMsgBox)
     display.root_group = splashTitle
+    sampleMemory()
     gc.collect()
     if firstTimeRunning and not SKIP_TITLE_ANIMATION:
         time.sleep(1)
@@ -711,12 +648,12 @@ def startTitleScreen():
     msgFlash = False
     msgFlashCountdown = 5
     start = time.monotonic_ns()
+    clearKeys()
     while not exitFlag:
         playBackgroundAudio()
-        for item in btns.values():
-            if not item['btn'].value:
-                exitFlag = True
-                break
+        pollSerialCommands()
+        pollKeys()
+        exitFlag = bool(keyPresses)
         if (time.monotonic_ns() - start) >= 100000000:  # 100 ms
             start = time.monotonic_ns()
             if random.randint(1, 100) <= 5:
@@ -736,6 +673,7 @@ def startTitleScreen():
                 msgFlashCountdown -= 1
             labelMsg.color = LABEL_MSG_COLOR if msgFlash else BLACK
             display.refresh()
+            sampleMemory()
     print('The player pressed start')
     labelTitle.color = BLACK
     labelMsg.color = BLACK
@@ -767,6 +705,7 @@ def startTitleScreen():
     time.sleep(1)
     display.root_group = None
     splashTitle = None
+    sampleMemory()
     gc.collect()
 
 
@@ -774,6 +713,7 @@ def startTitleScreen():
 
 def startEndTitleScreen():
     global splashTitle
+    enterMemoryPhase('end')
     print('Loding end title screen...')
     time.sleep(1)
     splashTitle = displayio.Group()
@@ -784,7 +724,7 @@ def startEndTitleScreen():
             y=0,
             color=BLACK)
     t = ''
-    if gameStatus == 'Died':
+    if engine.gameStatus == 'Died':
         t = 'Y O U  D I E D'
         labelMsg.color = LABEL_TITLE_COLOR[0]
     else:
@@ -795,8 +735,9 @@ def startEndTitleScreen():
     labelMsg.y = round(SCREEN_H/2 - labelMsg.height/2)
     splashTitle.append(labelMsg)
     display.root_group = splashTitle
+    sampleMemory()
     gc.collect()
-    if gameStatus == 'Died':
+    if engine.gameStatus == 'Died':
         playAudio(VOICE_BACKGROUND, 'jumpscare')
         for _ in range(20):
             labelMsg.color = LABEL_TITLE_COLOR[random.randint(0, len(LABEL_TITLE_COLOR)-1)]
@@ -814,213 +755,72 @@ def startEndTitleScreen():
     gc.collect()
 
 
-# ===== game logic - countdowns and callbacks =====
-
-countdownTable = {
-    'GC': {
-        'mode': 'continuous',
-        'interval': const(7),
-    },
-    'Hour': {
-        'mode': 'continuous',
-        'interval': HOUR_INTERVAL,
-    },
-    'Move': {
-        'mode': 'continuous',
-        'interval': MOVE_INTERVAL,
-    },
-    'PowerMonitor': {
-        'mode': 'continuous',
-        'interval': const(10),
-    },
-    'PowerReboot': {
-        'mode': 'stepping',
-        'interval': POWER_REBOOT_INTERNAL,
-    },
-    'SelectRoom': {
-        'mode': 'once',
-        'interval': const(3),
-    },
-    'PlayerAction': {
-        'mode': 'once',
-        'interval': const(5),
-    },
-    'Door': {
-        'mode': 'stepping',
-        'interval': const(8),
-    },
-    'Scan': {
-        'mode': 'stepping',
-        'interval': const(10),
-        'cooldown': 'ScanCooldown',
-    },
-    'Audio': {
-        'mode': 'stepping',
-        'interval': const(10),
-        'cooldown': 'AudioCooldown',
-    },
-    'Zap': {
-        'mode': 'stepping',
-        'interval': const(10),
-        'cooldown': 'ZapCooldown',
-    },
-    'ScanCooldown': {
-        'mode': 'stepping',
-        'interval': SCAN_COOLDOWN,
-    },
-    'AudioCooldown': {
-        'mode': 'stepping',
-        'interval': AUDIO_COOLDOWN,
-    },
-    'ZapCooldown': {
-        'mode': 'stepping',
-        'interval': ZAP_COOLDOWN,
-    },
-    'ShowAnomaly': {
-        'mode': 'stepping' if not ANOMALY_ALWAYS_SHOWN else 'continuous',
-        'interval': const(25) if not ANOMALY_ALWAYS_SHOWN else const(3),
-    },
-}
-
-# helpers
+# ===== game events =====
 
-def chance(threshold):
-    return random.randint(1, 100) <= threshold
-
-def setMoveMode(modes):
-    global moveMode
-    moveMode = modes[random.randint(0, len(modes)-1)]
-    if ANOMALY_ALWAYS_SHOWN and ANOMALY_ACTION_LOG:
-        print(f'{ANOMALY_NAME} switchs to move mode: {moveMode}')
+cooldownBars = {
+    BAR_SCAN: scanCooldownBar,
+    BAR_AUDIO: audioCooldownBar,
+    BAR_ZAP: zapCooldownBar,
+}
 
-def moveModeChange():
-    if powerOut and moveMode in ('Normal', 'Lure', 'Escape'):
-        setMoveMode(('Door', 'Air Vent'))
-    elif ((moveMode == 'Lure' and anomalyRoom == AUDIO_ROOM) or (moveMode == 'Escape' and anomalyRoom in RESET_ROOMS)) \
-            and chance(MOVE_MODE_RESET_CHANCE):
-        setMoveMode(('Normal',))
-        return True
-    elif moveMode == 'Normal' and anomalyRoom not in (WINDOW_ROOM, DOOR_ROOM, AIR_VENT_ROOM) \
-            and chance(MOVE_MODE_MORE_ACTIVE_CHANCE):
-        setMoveMode(('Door', 'Air Vent'))
+iconNames = {
+    ICON_ANOMALY: 'anomaly',
+    ICON_AUDIO: 'audio',
+    ICON_ZAP: 'zap',
+}
 
 def setLabelsAndColors():
-    countdown, _ = getCountdownAndInterval('ScanCooldown')
+    selectedRoom = engine.selectedRoom
+    doorClosed = engine.doorClosed
+    countdown, _ = engine.getCountdownAndInterval(TIMER_SCAN_COOLDOWN)
     if selectedRoom in SCANNABLE_ROOMS:
-        scanBtnLabel.background_color = SCAN_LABEL_COLOR if countdown == 0 else DISABLED_LABEL_COLOR
+        setUI(scanBtnLabel, 'background_color', SCAN_LABEL_COLOR if countdown == 0 else DISABLED_LABEL_COLOR)
     else:
-        scanBtnLabel.background_color = BLACK
+        setUI(scanBtnLabel, 'background_color', BLACK)
     if selectedRoom == TARGET_ROOM:
-        actionBtnLabel.text = 'Door'
-        actionBtnLabel.background_color = DOOR_CLOSED_LABEL_COLOR if doorClosed else DOOR_OPEN_LABEL_COLOR
+        setUI(actionBtnLabel, 'text', 'Door')
+        setUI(actionBtnLabel, 'background_color', DOOR_CLOSED_LABEL_COLOR if doorClosed else DOOR_OPEN_LABEL_COLOR)
     elif selectedRoom == AUDIO_ROOM:
-        countdown, _ = getCountdownAndInterval('AudioCooldown')
-        actionBtnLabel.text = 'Audio'
-        actionBtnLabel.background_color = AUDIO_LABEL_COLOR if countdown == 0 else DISABLED_LABEL_COLOR
+        countdown, _ = engine.getCountdownAndInterval(TIMER_AUDIO_COOLDOWN)
+        setUI(actionBtnLabel, 'text', 'Audio')
+        setUI(actionBtnLabel, 'background_color', AUDIO_LABEL_COLOR if countdown == 0 else DISABLED_LABEL_COLOR)
     elif selectedRoom == AIR_VENT_ROOM:
-        countdown, _ = getCountdownAndInterval('ZapCooldown')
-        actionBtnLabel.text = 'Zap'
-        actionBtnLabel.background_color = ZAP_LABEL_COLOR if countdown == 0 else DISABLED_LABEL_COLOR
+        countdown, _ = engine.getCountdownAndInterval(TIMER_ZAP_COOLDOWN)
+        setUI(actionBtnLabel, 'text', 'Zap')
+        setUI(actionBtnLabel, 'background_color', ZAP_LABEL_COLOR if countdown == 0 else DISABLED_LABEL_COLOR)
     else:
-        actionBtnLabel.background_color = BLACK
-    actionBtnLabel.x = drawRooms[2].x + round(drawRooms[2].width/2 - actionBtnLabel.width/2)
-    door.fill = DOOR_CLOSED_LABEL_COLOR if doorClosed else DOOR_OPEN_LABEL_COLOR
+        setUI(actionBtnLabel, 'background_color', BLACK)
+    setUI(actionBtnLabel, 'x', ACTION_LABEL_X[actionBtnLabel.text])
+    setUI(door, 'fill', DOOR_CLOSED_LABEL_COLOR if doorClosed else DOOR_OPEN_LABEL_COLOR)
 
 def setHourLabel():
-    hourLabel.text = f'{hour} AM'
-    hourLabel.x = drawRooms[1].x + round(drawRooms[1].width/2 - hourLabel.width/2)
-
-def getCountdownAndInterval(key):
-    return countdownTable[key]['countpool'], countdownTable[key]['interval']
-
-def resetCountDown(key, value=0):
-    countdownTable[key]['countpool'] = value
-
-# callbacks
-
-def GC():
-    gc.collect()
-
-def Hour():
-    global hour, AI, gameStatus
-    if hour == 6:
-        return
-    hour += 1
-    if hour == 6:
-        gameStatus = 'Survived'
-        return
-    setHourLabel()
-    AI = min(100, AI + round((AI_FINAL_LEVEL - AI_START_LEVEL) / 5))
-    print(f'Time: {hour} AM, AI level: {AI}/100')
-
-def Move():
-    global anomalyRoom, moveMode, gameStatus, justLaughed
-    if ANOMALY_NOT_MOVING:
-        return
-    if anomalyRoom == TARGET_ROOM and gameStatus != 'Died':
-        gameStatus = 'Died'
-        return
-    if (not powerOut or moveMode not in ('Escape', 'Lure') or anomalyRoom not in (DOOR_ROOM, AIR_VENT_ROOM)) \
-           and not chance(AI):
-        return
-    moveModeChange()
-    ConnectedRooms = MOVE_PERF[moveMode].get(anomalyRoom, [])
-    if len(ConnectedRooms) == 0:
-        return
-    newDirection = ConnectedRooms[random.randint(0, len(ConnectedRooms)-1)]
-    if moveMode == 'Door' and anomalyRoom == DOOR_ROOM and newDirection == TARGET_ROOM and doorClosed:
-        print(f'{ANOMALY_NAME} is blocked by the security door! (knocking sound heard)')
-        playAudio(VOICE_ANOMALY_ACTION, 'knock')
-        setMoveMode(('Normal', 'Air Vent', 'Escape'))
-        return
-    anomalyRoom = newDirection
-    if ANOMALY_ACTION_LOG and anomalyRoom != TARGET_ROOM:
-        print(f'{ANOMALY_NAME} moves to {ROOM_NAMES[anomalyRoom]} (room {anomalyRoom}), mode: {moveMode}')
-    if anomalyRoom == TARGET_ROOM:
-        playAudio(VOICE_ANOMALY_LAUGH, f'laugh{random.randint(1, 2)}')
-        playAudio(VOICE_ANOMALY_ACTION, 'walk')
-        if ANOMALY_ACTION_LOG:
-            print(f'Help me, Markimoo, you are my only hope... ({ANOMALY_NAME} has reached the target)')
-    elif anomalyRoom in WALK_SOUND_ROOMS:
-        playAudio(VOICE_ANOMALY_ACTION, 'walk')
-        print(f'{ANOMALY_NAME} walking sound heard')
-    elif anomalyRoom == AIR_VENT_ROOM:
-        playAudio(VOICE_ANOMALY_ACTION, 'airvent')
-        print(f'{ANOMALY_NAME} crawling in the air vent heard')
-    if anomalyRoom in SCANNABLE_ROOMS and moveMode in ('Door', 'Air Vent'):
-        if (time.monotonic_ns() - justLaughed) >= 700000000:
-            playAudio(VOICE_ANOMALY_LAUGH, f'laugh{random.randint(1, 2)}')
-            print(f'{ANOMALY_NAME} laughing sound heard')
-            justLaughed = time.monotonic_ns()
-
-def PowerMonitor():
-    global systemPower, powerOut, doorClosed
-    if powerOut:
-        return
-    if doorClosed:
-        systemPower += DOOR_POWER_CHANGE_LEVEL
+    setUI(hourLabel, 'text', f'{engine.hour} AM')
+    setUI(hourLabel, 'x', HOUR_LABEL_X[engine.hour])
+
+def setPowerBar(systemPower):
+    setUI(systemPowerBar, 'value', systemPower)
+    setUI(systemPowerBar, 'bar_color',
+          DOOR_CLOSED_LABEL_COLOR if (Engine.POWER_LIMIT - systemPower <= Engine.POWER_LIMIT * 0.3) else DOOR_OPEN_LABEL_COLOR)
+
+def setCooldownBar(bar, countdown):
+    setUI(cooldownBars[bar], 'value', countdown)
+
+def setSelectedRoom(oldRoom, newRoom):
+    setUI(drawRooms[oldRoom], 'fill', BLACK)
+    setUI(drawRooms[newRoom], 'fill', ROOM_SELECTED_COLOR)
+    setUI(roomLabels[oldRoom], 'color', ROOM_LABEL_COLOR)
+    setUI(roomLabels[newRoom], 'color', ROOM_LABEL_SELECTED_COLOR)
+
+def setScanFill(room, fill):
+    if fill == FILL_DANGER:
+        setUI(drawRooms[room], 'fill', ROOM_SCAN_DANGER_COLOR)
+    elif fill == FILL_CLEAR:
+        setUI(drawRooms[room], 'fill', ROOM_SCAN_CLEAR_COLOR)
     else:
-        systemPower -= DOOR_POWER_CHANGE_LEVEL
-    systemPower = max(0, min(POWER_LIMIT, systemPower))
-    systemPowerBar.value = systemPower
-    systemPowerBar.bar_color = \
-        DOOR_CLOSED_LABEL_COLOR if (POWER_LIMIT - systemPower <= POWER_LIMIT * 0.3) else DOOR_OPEN_LABEL_COLOR
-    if not powerOut and systemPower == POWER_LIMIT:
-        print('Power out!')
-        startMainScreenPowerOut()
-        if doorClosed:
-            playAudio(VOICE_PLAYER_EFFECT_2, 'door')
-            doorClosed = False
-        playAudio(VOICE_BACKGROUND, 'powerdown')
-        powerOut = True
-        systemPower = 0
-        systemPowerBar.value = 0
-        if moveMode not in ('Door', 'Air Vent'):
-            setMoveMode(('Door', 'Air Vent'))
-        invokeCallbackAndCountdown('PowerReboot')
-
-def PowerReboot():
-    global powerOut
+        setUI(drawRooms[room], 'fill', ROOM_SELECTED_COLOR if engine.selectedRoom == room else BLACK)
+
+def glitchPowerOutLabel():
+    markDirty()
     powerOutLabel.color = LABEL_TITLE_COLOR[random.randint(0, len(LABEL_TITLE_COLOR)-1)]
     if random.randint(1, 100) <= 20:
         powerOutLabel.x = powerOutLabel.x + random.randint(-SCREEN_W, SCREEN_W) - round(powerOutLabel.width/2)
@@ -1030,255 +830,212 @@ def PowerReboot():
         powerOutLabel.y = powerOutLabel.y + random.randint(-SCREEN_H, SCREEN_H) - round(powerOutLabel.height/2)
     else:
         powerOutLabel.y = round(SCREEN_H/2 - powerOutLabel.height/2)
-    countdown, _ = getCountdownAndInterval('PowerReboot')
-    if ANOMALY_ACTION_LOG and countdown % 10 == 0:
-        print(f'Power reboot countdown: {int(countdown/10)}')
-    if countdown == 0:
-        powerOut = False
-        playBackgroundAudio()
-        setLabelsAndColors()
-        startMainScreen()
-
-def SelectRoom():
-    global selectedRoom, pressedKey
-    newRoom = selectedRoom
-    if pressedKey == 'Up':
-        roomChanged = True
-        if selectedRoom in (3, 4, 5, 6, 7, 8):
-            newRoom -= 3
-        elif selectedRoom == 9:
-            newRoom = 5
-    elif pressedKey == 'Down':
-        roomChanged = True
-        if selectedRoom in (0, 1, 2, 3, 4, 5):
-            newRoom += 3
-    elif pressedKey == 'Left':
-        roomChanged = True
-        if selectedRoom in (1, 2, 4, 5, 7, 8):
-            newRoom -=1
-        elif selectedRoom == 9:
-            newRoom = 8
-    elif pressedKey == 'Right':
-        roomChanged = True
-        if selectedRoom in (0, 1, 3, 4, 6, 7, 8):
-            newRoom += 1
-        elif selectedRoom == 5:
-            newRoom = 9
-    if newRoom != selectedRoom:
-        drawRooms[selectedRoom].fill = BLACK
-        drawRooms[newRoom].fill = ROOM_SELECTED_COLOR
-        roomLabels[selectedRoom].color = ROOM_LABEL_COLOR
-        roomLabels[newRoom].color = ROOM_LABEL_SELECTED_COLOR
-        selectedRoom = newRoom
-        setLabelsAndColors()
-        pressedKey = ''
-        playAudio(VOICE_PLAYER_ACTION, 'tap')
-
-def PlayerAction():
-    global pressedKey, detectionRoom
-    if powerOut or anomalyRoom == TARGET_ROOM:
-        playAudio(VOICE_PLAYER_EFFECT, 'error')
-    elif pressedKey == 'Special':
-        if selectedRoom == TARGET_ROOM:
-            invokeCallbackAndCountdown('Door')
-        elif selectedRoom == AIR_VENT_ROOM:
-            invokeCallbackAndCountdown('Zap')
-        elif selectedRoom == AUDIO_ROOM:
-            invokeCallbackAndCountdown('Audio')
-    elif pressedKey == 'Scan':
-        if selectedRoom in SCANNABLE_ROOMS:
-            detectionRoom = selectedRoom
-            invokeCallbackAndCountdown('Scan')
-    pressedKey = ''
-
-def Door():
-    global doorClosed
-    if powerOut:
-        resetCountDown('Door')
-    countdown, maxCountDown = getCountdownAndInterval('Door')
-    if countdown == maxCountDown-2:
-        doorClosed = not doorClosed
-        playAudio(VOICE_PLAYER_EFFECT_2, 'door')
-        setLabelsAndColors()
-
-def Scan():
-    global detectionRoom, systemPower
-    if powerOut:
-        resetCountDown('Scan')
-    countdown, maxCountDown = getCountdownAndInterval('Scan')
-    detected = (anomalyRoom == detectionRoom)
-    if countdown == maxCountDown:
-        if detected:
-            invokeCallbackAndCountdown('ShowAnomaly')
-    elif countdown == maxCountDown-2:
-        if detected:
-            playAudio(VOICE_PLAYER_EFFECT_2, 'windowscare')
-        playAudio(VOICE_PLAYER_EFFECT, 'scan')
-        systemPower += SCAN_POWER_CHANGE_LEVEL
-    if countdown == 0:
-        detectionRoom = -1
-        drawRooms[detectionRoom].fill = BLACK
-    elif countdown in (maxCountDown-2, maxCountDown-4, maxCountDown-6):
-        drawRooms[detectionRoom].fill = ROOM_SCAN_DANGER_COLOR if detected else ROOM_SCAN_CLEAR_COLOR
-    elif countdown in (maxCountDown-3, maxCountDown-5, maxCountDown-7):
-        drawRooms[detectionRoom].fill = ROOM_SELECTED_COLOR if selectedRoom == detectionRoom else BLACK
-        
-def Audio():
-    global anomalyRoom, systemPower
-    if powerOut:
-        resetCountDown('Audio')
-        hideIcon('audio')
-    countdown, maxCountDown = getCountdownAndInterval('Audio')
-    if countdown == maxCountDown-2:
-        playAudio(VOICE_PLAYER_EFFECT_2, f'lure{random.randint(1, 3)}')
-        print('Lure audio played')
-        if anomalyRoom not in (TARGET_ROOM, 9):
-            if chance(LURED_CHANCE):
-                setMoveMode(('Lure',))
-                if ANOMALY_ACTION_LOG:
-                    print(f'{ANOMALY_NAME} is attracted by the audio lure!')
-        systemPower += AUDIO_POWER_CHANGE_LEVEL
-    if countdown in (maxCountDown, maxCountDown-6):
-        showIcon('audio')
-    elif countdown in (maxCountDown-5, 1):
-        hideIcon('audio')
-
-def Zap():
-    global anomalyRoom, systemPower
-    if powerOut:
-        resetCountDown('Zap')
-        hideIcon('zap')
-    countdown, maxCountDown = getCountdownAndInterval('Zap')
-    if countdown == maxCountDown-2:
-        playAudio(VOICE_PLAYER_EFFECT_2, 'zap')
-        if anomalyRoom == AIR_VENT_ROOM:
-            playAudio(VOICE_ANOMALY_ACTION, 'zapscream')
-            anomalyRoom = WINDOW_ROOM
-            setMoveMode(('Escape', 'Door'))
-            if ANOMALY_ACTION_LOG:
-                print(f'{ANOMALY_NAME} get zapped in the air vent!')
-        systemPower += ZAP_POWER_CHANGE_LEVEL
-    if countdown in (maxCountDown, maxCountDown-6):
-        showIcon('zap')
-    elif countdown in (maxCountDown-5, 1):
-        hideIcon('zap')
-
-def ScanCooldown():
-    if powerOut:
-        resetCountDown('ScanCooldown')
-    countdown, maxCountDown = getCountdownAndInterval('ScanCooldown')
-    scanCooldownBar.value = countdown
-    if countdown == maxCountDown or countdown == 0:
-        setLabelsAndColors()
-
-def AudioCooldown():
-    if powerOut:
-        resetCountDown('AudioCooldown')
-    countdown, maxCountDown = getCountdownAndInterval('AudioCooldown')
-    audioCooldownBar.value = countdown
-    if countdown == maxCountDown or countdown == 0:
-        setLabelsAndColors()
-
-def ZapCooldown():
-    if powerOut:
-        resetCountDown('ZapCooldown')
-    countdown, maxCountDown = getCountdownAndInterval('ZapCooldown')
-    zapCooldownBar.value = countdown
-    if countdown == maxCountDown or countdown == 0:
-        setLabelsAndColors()
-    
-def ShowAnomaly():
-    if ANOMALY_ALWAYS_SHOWN:
-        showIcon('anomaly')
-    else:
-        if powerOut:
-            resetCountDown('ShowAnomaly')
-        countdown, maxCountDown = getCountdownAndInterval('ShowAnomaly')
-        if countdown == maxCountDown:
-            showIcon('anomaly')
-        elif countdown == 0:
-            hideIcon('anomaly')
-
-# add callbacks to countdownTable
-for key, item in countdownTable.items():
-    try:
-        func = globals()[key]
-        if callable(func):
-            item['callback'] = func
-    except:
-        print(f'error: cannot find callback function {key}')
-        sys.exit()
-print('Callback functions loaded')
 
-def invokeCallbackAndCountdown(key):
-    item = countdownTable[key]
-    if item['countpool'] == 0:
-        if countdownTable.get(item.get('cooldown', None), {}).get('countpool', 0) > 0:
-            playAudio(VOICE_PLAYER_ACTION, 'error')
-        else:
-            item['countpool'] = item['interval']
-            if item['mode'] != 'onceAtEnd':
-                item['callback']()
-            
-def countdownProcess():
-    for key, item in countdownTable.items():
-        if item['countpool'] == 0 and item['mode'] == 'continuous':
-            invokeCallbackAndCountdown(key)
-        elif item['countpool'] > 0:
-            item['countpool'] -= 1
-            if item['mode'] == 'stepping':
-                item['callback']()
-            if item['countpool'] == 0:
-                if item['mode'] == 'onceAtEnd':
-                    item['callback']()
-                if item.get('cooldown', None):
-                    invokeCallbackAndCountdown(item['cooldown'])
-
-# ===== game logic - reset functions =====
-
-def resetConfig():
-    global AI, gameStatus, hour, power, selectedRoom, detectionRoom, moveMode, pressedKey, doorClosed, powerOut, systemPower
-    AI = max(0, AI_START_LEVEL + (AI_FINAL_LEVEL - AI_START_LEVEL - round((AI_FINAL_LEVEL - AI_START_LEVEL) / 5) * 5))
-    gameStatus = 'Ongoing'
-    hour = 0
-    selectedRoom = TARGET_ROOM
-    detectionRoom = -1
-    moveMode = 'Normal'
-    pressedKey = ''
-    doorClosed = False
-    powerOut = False
-    systemPower = 0
-
-def resetCountdown():
-    for item in countdownTable.values():
-        item['countpool'] = item['interval'] if item['mode'] == 'continuous' else 0
-    scanCooldownBar.value = 0
-    audioCooldownBar.value = 0
-    zapCooldownBar.value = 0
-    systemPowerBar.value = 0
+def handleEvents(events):
+    for kind, a, b in events:
+        if kind == EVENT_AUDIO:
+            playAudio(a, b)
+        elif kind == EVENT_BAR:
+            if a == BAR_POWER:
+                setPowerBar(b)
+            else:
+                setCooldownBar(a, b)
+        elif kind == EVENT_LABELS:
+            setLabelsAndColors()
+        elif kind == EVENT_ICON:
+            if b:
+                showIcon(iconNames[a])
+            else:
+                hideIcon(iconNames[a])
+        elif kind == EVENT_ROOM_FILL:
+            setScanFill(a, b)
+        elif kind == EVENT_SELECT:
+            setSelectedRoom(a, b)
+        elif kind == EVENT_HOUR:
+            setHourLabel()
+            if engine.gameStatus == 'Ongoing':
+                enterMemoryPhase(HOUR_PHASES[a], False)
+        elif kind == EVENT_POWER_OUT:
+            startMainScreenPowerOut()
+        elif kind == EVENT_POWER_REBOOT:
+            glitchPowerOutLabel()
+        elif kind == EVENT_POWER_RESTORED:
+            playBackgroundAudio()
+            setLabelsAndColors()
+            startMainScreen()
+            enterMemoryPhase(HOUR_PHASES[engine.hour], False)
+
+
+# ===== reset functions =====
+
+def resetBars():
+    setUI(scanCooldownBar, 'value', 0)
+    setUI(audioCooldownBar, 'value', 0)
+    setUI(zapCooldownBar, 'value', 0)
+    setUI(systemPowerBar, 'value', 0)
 
 def resetRoom():
-    global anomalyRoom, selectedRoom
-    selectedRoom = TARGET_ROOM
-    anomalyRoom = RESET_ROOMS[random.randint(0, len(RESET_ROOMS)-1)]
-    roomLabels[selectedRoom].color = ROOM_LABEL_SELECTED_COLOR
+    selectedRoom = engine.selectedRoom
     for idx in range(len(drawRooms)):
-        drawRooms[idx].fill = ROOM_SELECTED_COLOR if idx == selectedRoom else BLACK
+        setUI(roomLabels[idx], 'color', ROOM_LABEL_SELECTED_COLOR if idx == selectedRoom else ROOM_LABEL_COLOR)
+        setUI(drawRooms[idx], 'fill', ROOM_SELECTED_COLOR if idx == selectedRoom else BLACK)
 
 def resetGame():
-    resetConfig()
-    resetCountdown()
+    trace.start(engine)
+    engine.reset()
+    resetBars()
     resetRoom()
     hideIcon('all')
     setLabelsAndColors()
     setHourLabel()
     
 
+# ===== tick timing =====
+
+# time from a tick's deadline to the end of its display refresh, in 10 ms bins (the last bin is 100 ms+)
+TICK_HISTOGRAM_BINS = const(11)
+
+tickStats = {
+    'ticks': 0,
+    'overruns': 0,    # ticks that started a tick period or more late
+    'caughtUp': 0,    # extra game ticks run to catch up after an overrun
+    'dropped': 0,     # game ticks skipped after a stall longer than MAX_CATCH_UP_TICKS
+    'maxLateMs': 0,
+    'histogram': [0] * TICK_HISTOGRAM_BINS,
+}
+
+def resetTickStats():
+    for key in ('ticks', 'overruns', 'caughtUp', 'dropped', 'maxLateMs'):
+        tickStats[key] = 0
+    histogram = tickStats['histogram']
+    for i in range(TICK_HISTOGRAM_BINS):
+        histogram[i] = 0
+
+def recordTickTime(deadline, late):
+    tickStats['ticks'] += 1
+    lateMs = late // 1000000
+    if lateMs > tickStats['maxLateMs']:
+        tickStats['maxLateMs'] = lateMs
+    tickMs = (time.monotonic_ns() - deadline) // 1000000
+    tickStats['histogram'][min(TICK_HISTOGRAM_BINS - 1, tickMs // 10)] += 1
+
+# one line of key=value pairs, printed on every hour and at the end of a night
+def printTickStats():
+    print('Tick stats: ' + ' '.join(f'{key}={tickStats[key]}' for key in ('ticks', 'overruns', 'caughtUp', 'dropped', 'maxLateMs'))
+          + ' histogram10ms=' + ','.join(str(n) for n in tickStats['histogram'])
+          + f' refreshes={refreshStats["performed"]} refreshesSkipped={refreshStats["skipped"]}'
+          + f' uiWrites={uiStats["writes"]} uiWritesAvoided={uiStats["avoided"]}'
+          + f' audioOpen={len(audioLibrary)} audioBytes={audioStats["bytes"]}'
+          + f' audioOpened={audioStats["opened"]} audioEvicted={audioStats["evicted"]}'
+          + f' keyPresses={keyStats["presses"]} keysQueued={keyStats["queued"]} keyOverflows={keyStats["overflows"]}')
+
+
+# ===== memory stats =====
+
+# the lowest free heap and the smallest largest free block of each phase of a night: the title screen,
+# every hour of the game, the power out screen and the end screen, printed as key=value lines at the end
+# of each night (read by tools/memreport.py) and on the serial command 'mem'; the largest free block is
+# only probed at the screen changes that collect anyway and on 'mem', never on an hour change mid-game
+HOUR_PHASES = ('hour0', 'hour1', 'hour2', 'hour3', 'hour4', 'hour5')
+MEM_PROBE_STEP = const(256)  # accuracy of largestFreeBlock() in bytes
+
+memStats = []        # [name, lowest free heap, smallest largest free block, free heap then, samples] by phase
+memPhase = [None]    # entry of memStats being sampled
+memNight = [1]
+
+# CircuitPython has no call for the largest free block (micropython.mem_info() only prints it),
+# so the largest bytearray that can be allocated is searched for; failed allocations collect first
+def largestFreeBlock():
+    low, high = 0, gc.mem_free()
+    while high - low > MEM_PROBE_STEP:
+        size = (low + high) // 2
+        try:
+            block = bytearray(size)
+            del block
+            low = size
+        except MemoryError:
+            high = size
+    return low
+
+def sampleMemory():
+    stats = memPhase[0]
+    if stats is None:
+        return
+    free = gc.mem_free()
+    if free < stats[1]:
+        stats[1] = free
+    stats[4] += 1
+
+# a heap probe is slow (it collects up to a dozen times), so it only runs when a phase ends on a screen change
+def probeMemory():
+    stats = memPhase[0]
+    if stats is None:
+        return
+    sampleMemory()
+    largest = largestFreeBlock()
+    if stats[2] is None or largest < stats[2]:
+        stats[2] = largest
+        stats[3] = gc.mem_free()
+
+def enterMemoryPhase(name, probe=True):
+    if probe:
+        probeMemory()
+    else:
+        sampleMemory()
+    for stats in memStats:
+        if stats[0] == name:
+            break
+    else:
+        stats = [name, gc.mem_free(), None, 0, 0]
+        memStats.append(stats)
+    memPhase[0] = stats
+    sampleMemory()
+
+def printMemoryStats():
+    for name, minFree, largest, free, samples in memStats:
+        if largest is None:
+            print(f'Memory phase: night={memNight[0]} name={name} minFree={minFree} samples={samples}')
+        else:
+            print(f'Memory phase: night={memNight[0]} name={name} minFree={minFree} largestBlock={largest} free={free} samples={samples}')
+
+# after the end screen is gone: the heap left should not shrink from night to night
+def printNightMemoryStats():
+    probeMemory()
+    memPhase[0] = None
+    printMemoryStats()
+    gc.collect()
+    free = gc.mem_free()
+    print(f'Memory night: night={memNight[0]} free={free} largestBlock={largestFreeBlock()}')
+    memStats.clear()
+    memNight[0] += 1
+
+
+# ===== serial commands =====
+
+# type a command and Enter in the serial console
+serialCommand = []
+
+def pollSerialCommands():
+    while supervisor.runtime.serial_bytes_available:
+        character = sys.stdin.read(1)
+        if character not in '\r\n':
+            serialCommand.append(character)
+            continue
+        command = ''.join(serialCommand).strip()
+        serialCommand.clear()
+        if command == 'mem':
+            probeMemory()
+            printMemoryStats()
+        elif command:
+            print(f'Unknown command: {command} (commands: mem)')
+
+
 # ===== runtime loop =====
 
 print('Loading game logic and runtime...ok')
 firstTimeRunning = True
-gc.collect()
+bootPhase('runtime')
+print(f'Boot total: ms={(time.monotonic_ns() - bootStart) / 1000000:.1f} phases={bootPhases[0]} free={bootMark[1]}')
 print(f'Memory used: {100 - round(gc.mem_free() / mem_limit * 100, 1)}%')
 
 while True:
@@ -1291,29 +1048,67 @@ while True:
     
     # ===== start main screen =====
     startMainScreen()
+    enterMemoryPhase(HOUR_PHASES[engine.hour])
     
     print('Game started')
-    print(f'Time: {hour} AM, AI level: {AI}/100')
+    print(f'Time: {engine.hour} AM, AI level: {engine.AI}/100')
     if ANOMALY_ACTION_LOG:
-        print(f'{ANOMALY_NAME} starts in {ROOM_NAMES[anomalyRoom]} (mode: {moveMode})')
+        print(f'{ANOMALY_NAME} starts in {ROOM_NAMES[engine.anomalyRoom]} (mode: {engine.moveMode})')
     
-    nxtTime = time.monotonic_ns()
+    resetTickStats()
+    refreshStats['performed'] = refreshStats['skipped'] = 0
+    uiStats['writes'] = uiStats['avoided'] = 0
+    keyStats['presses'] = keyStats['queued'] = keyStats['overflows'] = 0
+    clearKeys()  # presses made during the title animation don't carry into the night
+    deadline = time.monotonic_ns() + TICK_NS
     
     # ===== main loop =====
-    while gameStatus == 'Ongoing':
+    # ticks are due at fixed deadlines, so a slow tick doesn't push the later ones back
+    while engine.gameStatus == 'Ongoing':
     
         playBackgroundAudio()
     
-        if (time.monotonic_ns() - nxtTime) < 100000000:  # 100 ms
+        now = time.monotonic_ns()
+        if now < deadline:
+            pollSerialCommands()
+            time.sleep((deadline - now) / 1000000000)  # lets audio and other background tasks run
             continue
-        nxtTime = time.monotonic_ns()
-
-        detectKeyPress()
-        countdownProcess()
-        display.refresh()
+        late = now - deadline
+        missed = late // TICK_NS
+        if missed:
+            tickStats['overruns'] += 1
+            if missed > MAX_CATCH_UP_TICKS:
+                tickStats['dropped'] += missed - MAX_CATCH_UP_TICKS
+                deadline += (missed - MAX_CATCH_UP_TICKS) * TICK_NS
+                missed = MAX_CATCH_UP_TICKS
+        
+        # the missed ticks run game logic only, the screen is refreshed once
+        for i in range(missed + 1):
+            hour = engine.hour
+            key = nextKey()
+            events = engine.step(key)
+            if TRACE_NIGHTS:
+                trace.record(engine.tick, key, events)
+            handleEvents(events)
+            if engine.tick % GC_INTERVAL == 0:
+                sampleMemory()  # the heap is at its lowest right before a collection
+                gc.collect()
+            if engine.hour != hour and engine.gameStatus == 'Ongoing':
+                printTickStats()
+            if engine.gameStatus != 'Ongoing':
+                break
+        tickStats['caughtUp'] += i
+        refreshIfDirty()
+        recordTickTime(deadline, late)
+        deadline += (i + 1) * TICK_NS
 
     # ===== end game =====
-    print(f'Game orver; you {gameStatus.lower()}!')
+    print(f'Game orver; you {engine.gameStatus.lower()}!')
+    printTickStats()
+    if TRACE_NIGHTS:
+        trace.finish(engine)
+        trace.write(sys.stdout.write)
     startEndTitleScreen()
 
     time.sleep(2)
+    printNightMemoryStats()
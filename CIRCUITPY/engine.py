@@ -0,0 +1,1055 @@
+'''
+Project Foobear: hardware-independent game engine
+
+The engine holds the whole game state and advances it one tick (100 ms on the
+device) per step(). Everything the screen and the speaker need to know about is
+returned as a list of events, so the same rules run on the Wio Terminal (driven
+by code.py) and under CPython on a desktop (driven by the host tools).
+'''
+
+
+from array import array
+
+try:
+    from micropython import const
+except ImportError:
+    def const(x):
+        return x
+
+
+# ===== game logic - rooms =====
+
+'''
+0(b)-1----2
+|    |    |
+3----4----5--|
+|    |    w  9(z)
+6----7--d[8]-|
+
+0: Demo Room (has a Bluetooth speaker in there)
+1: Developers' Office
+2: Cafeteria
+3: Meeting room
+4: Main hallway
+5: Server room
+6: Restroom
+7: Lobby
+8: Control room (where you are; power usage is shown and the security door can be locked)
+9: Air Vent (has a electric bug zapper installed)
+
+b: Bluetooth speaker
+d: Security door
+w: Window
+z: Bug zapper
+'''
+
+ANOMALY_NAME = 'FooBear'
+
+ROOM_NAMES = {
+    0: 'Demo Room',
+    1: 'Dev Office',
+    2: 'Cafeteria',
+    3: 'Meeting',
+    4: 'Hallway',
+    5: 'Servers',
+    6: 'Restroom',
+    7: 'Lobby',
+    8: 'Control',  # target
+    9: 'Air Vent'
+}
+
+RESET_ROOMS = (0, 1, 3)
+SCANNABLE_ROOMS = (0, 1, 2, 3, 4, 5, 6, 7)
+WALK_SOUND_ROOMS = (4, 5, 7)
+TARGET_ROOM = const(8)
+AIR_VENT_ROOM = const(9)
+AUDIO_ROOM = const(0)
+DOOR_ROOM = const(7)
+WINDOW_ROOM = const(5)
+CENTER_ROOM = const(4)
+
+MOVE_MODES = ('Normal', 'Door', 'Air Vent', 'Escape', 'Lure')
+
+MOVE_PERF = {  # anamony's move mode
+    'Normal': {  # roaming; not hunting
+        0: (1, 3),
+        1: (2, 4),
+        2: (1, 5),
+        3: (4, 6),
+        4: (3, 5, 7),
+        5: (4,),
+        6: (3, 7),
+        7: (4,),
+        8: (),
+        9: (5,),
+    },
+    'Door': {  # go to the door; hunting
+        0: (3,),
+        1: (4,),
+        2: (1, 5),
+        3: (4, 6),
+        4: (7,),
+        5: (4,),
+        6: (7,),
+        7: (8,),
+        8: (),
+        9: (5,),
+    },
+    'Air Vent': {  # go to the air vent: hunting
+        0: (1, 3),
+        1: (2, 4),
+        2: (5,),
+        3: (0, 4),
+        4: (5,),
+        5: (9,),
+        6: (3, 7),
+        7: (4,),
+        8: (),
+        9: (8,),
+    },
+    'Escape': {  # escape from being blocked
+        0: (1, 3),
+        1: (0,),
+        2: (1,),
+        3: (0,),
+        4: (1, 3,),
+        5: (2, 4),
+        6: (3,),
+        7: (4,),
+        8: (),
+        9: (5,),
+    },
+    'Lure': {  # lured by audio
+        0: (),
+        1: (0,),
+        2: (1,),
+        3: (0,),
+        4: (1, 3,),
+        5: (2, 4,),
+        6: (3,),
+        7: (4, 6),
+        8: (),
+        9: (5,),
+    },
+}
+
+
+# ===== learned move policy =====
+
+# an optional table picks FooBear's next room instead of a uniform random choice;
+# it has 2 bits per (room, move mode, hour, door, power bucket) entry, 4 entries per byte:
+# the index into the MOVE_PERF exits, or 3 (or an index out of range) for a random exit
+MOVE_POLICY_HOURS = const(6)
+MOVE_POLICY_POWER_BUCKETS = const(4)
+MOVE_POLICY_ENTRIES = len(ROOM_NAMES) * len(MOVE_MODES) * MOVE_POLICY_HOURS * 2 * MOVE_POLICY_POWER_BUCKETS
+MOVE_POLICY_SIZE = (MOVE_POLICY_ENTRIES + 3) // 4
+MOVE_POLICY_RANDOM = const(3)
+MOVE_MODE_INDEX = {mode: i for i, mode in enumerate(MOVE_MODES)}
+
+
+# 24-bit checksum of a move policy table, so that a trace tells which table its night was played with
+def movePolicyHash(movePolicy):
+    digest = 0
+    for byte in movePolicy:
+        digest = (digest * 33 + byte) & 0xFFFFFF
+    return digest
+
+
+# ===== timers =====
+
+# timer IDs, in the order the timers run within a tick; the callback of each is the Engine method in TIMER_NAMES
+TIMER_HOUR = const(0)
+TIMER_MOVE = const(1)
+TIMER_POWER_MONITOR = const(2)
+TIMER_POWER_REBOOT = const(3)
+TIMER_SELECT_ROOM = const(4)
+TIMER_PLAYER_ACTION = const(5)
+TIMER_DOOR = const(6)
+TIMER_SCAN = const(7)
+TIMER_AUDIO = const(8)
+TIMER_ZAP = const(9)
+TIMER_SCAN_COOLDOWN = const(10)
+TIMER_AUDIO_COOLDOWN = const(11)
+TIMER_ZAP_COOLDOWN = const(12)
+TIMER_SHOW_ANOMALY = const(13)
+TIMER_NONE = const(-1)
+
+TIMER_NAMES = ('Hour', 'Move', 'PowerMonitor', 'PowerReboot', 'SelectRoom', 'PlayerAction', 'Door', 'Scan',
+               'Audio', 'Zap', 'ScanCooldown', 'AudioCooldown', 'ZapCooldown', 'ShowAnomaly')
+TIMERS = len(TIMER_NAMES)
+
+# the cooldown bar timers only count down and redraw their bar (see Engine.skip())
+COOLDOWN_TIMERS = (TIMER_SCAN_COOLDOWN, TIMER_AUDIO_COOLDOWN, TIMER_ZAP_COOLDOWN)
+
+# the countdowns, from high to low, on which the callback of a counting timer does more than redraw a
+# cooldown bar while the power is on, or None if that is every one; on the others the timer only counts
+# (see Engine.quietTicks())
+TIMER_LOUD_COUNTS = (
+    None, None, None,       # Hour, Move, PowerMonitor (continuous)
+    None,                   # PowerReboot
+    (), (),                 # SelectRoom, PlayerAction
+    (6,),                   # Door
+    (8, 7, 6, 5, 4, 3, 0),  # Scan
+    (8, 5, 4, 1, 0),        # Audio
+    (8, 5, 4, 1, 0),        # Zap
+    (0,), (0,), (0,),       # ScanCooldown, AudioCooldown, ZapCooldown
+    (0,),                   # ShowAnomaly
+)
+
+# timer modes
+MODE_CONTINUOUS = const(0)  # fires every interval + 1 ticks
+MODE_STEPPING = const(1)    # callback at the start and on every tick of the countdown
+MODE_ONCE = const(2)        # callback at the start of the countdown
+MODE_ONCE_AT_END = const(3) # callback at the end of the countdown
+
+
+# ===== player input =====
+
+KEY_ACTIONS = {
+    'Special': TIMER_PLAYER_ACTION,
+    'Scan': TIMER_PLAYER_ACTION,
+    'Up': TIMER_SELECT_ROOM,
+    'Down': TIMER_SELECT_ROOM,
+    'Left': TIMER_SELECT_ROOM,
+    'Right': TIMER_SELECT_ROOM,
+}
+
+
+# room focus after pressing a direction key
+def selectRoom(selectedRoom, key):
+    newRoom = selectedRoom
+    if key == 'Up':
+        if selectedRoom in (3, 4, 5, 6, 7, 8):
+            newRoom -= 3
+        elif selectedRoom == 9:
+            newRoom = 5
+    elif key == 'Down':
+        if selectedRoom in (0, 1, 2, 3, 4, 5):
+            newRoom += 3
+    elif key == 'Left':
+        if selectedRoom in (1, 2, 4, 5, 7, 8):
+            newRoom -= 1
+        elif selectedRoom == 9:
+            newRoom = 8
+    elif key == 'Right':
+        if selectedRoom in (0, 1, 3, 4, 6, 7, 8):
+            newRoom += 1
+        elif selectedRoom == 5:
+            newRoom = 9
+    return newRoom
+
+
+# ===== audio voices =====
+
+VOICE_BACKGROUND = const(0)
+VOICE_PLAYER_ACTION = const(1)
+VOICE_PLAYER_EFFECT = const(2)
+VOICE_PLAYER_EFFECT_2 = const(3)
+VOICE_ANOMALY_ACTION = const(4)
+VOICE_ANOMALY_LAUGH = const(5)
+
+
+# ===== events =====
+
+# every event is a (kind, a, b) tuple
+EVENT_AUDIO = const(0)           # (voice, audio name)
+EVENT_LABELS = const(1)          # button labels and door colors need updating
+EVENT_HOUR = const(2)            # (hour, AI level)
+EVENT_SELECT = const(3)          # (old room, new room)
+EVENT_ROOM_FILL = const(4)       # (room, FILL_*)
+EVENT_ICON = const(5)            # (ICON_*, shown)
+EVENT_BAR = const(6)             # (BAR_*, value)
+EVENT_MOVE = const(7)            # (old room, new room)
+EVENT_POWER_OUT = const(8)
+EVENT_POWER_REBOOT = const(9)    # (reboot countdown, None)
+EVENT_POWER_RESTORED = const(10)
+
+FILL_IDLE = const(0)
+FILL_CLEAR = const(1)
+FILL_DANGER = const(2)
+
+ICON_ANOMALY = const(0)
+ICON_AUDIO = const(1)
+ICON_ZAP = const(2)
+
+BAR_SCAN = const(0)
+BAR_AUDIO = const(1)
+BAR_ZAP = const(2)
+BAR_POWER = const(3)
+
+_LABELS = (EVENT_LABELS, None, None)
+
+COOLDOWN_BARS = (BAR_SCAN, BAR_AUDIO, BAR_ZAP)  # bar of each of COOLDOWN_TIMERS
+
+
+# ===== snapshots =====
+
+GAME_STATUSES = ('Ongoing', 'Died', 'Survived')
+PRESSED_KEYS = ('',) + tuple(KEY_ACTIONS)
+
+# state fields of a snapshot record, followed by one countpool per timer
+SNAPSHOT_FIELDS = const(15)
+
+
+# ===== engine =====
+
+# the class attributes of Engine that params may override
+GAME_PARAMETERS = ('AI_START_LEVEL', 'AI_FINAL_LEVEL', 'HOUR_INTERVAL', 'MOVE_INTERVAL', 'MOVE_MODE_RESET_CHANCE',
+                   'MOVE_MODE_MORE_ACTIVE_CHANCE', 'LURED_CHANCE', 'SCAN_COOLDOWN', 'AUDIO_COOLDOWN', 'ZAP_COOLDOWN',
+                   'POWER_LIMIT', 'DOOR_POWER_CHANGE_LEVEL', 'SCAN_POWER_CHANGE_LEVEL', 'AUDIO_POWER_CHANGE_LEVEL',
+                   'ZAP_POWER_CHANGE_LEVEL', 'POWER_REBOOT_INTERNAL', 'LAUGH_INTERVAL')
+
+
+class Engine:
+
+    # game parameters (all interval and countdown time values are seconds * 10)
+    AI_START_LEVEL = 10  # 1-100
+    AI_FINAL_LEVEL = 90  # 1-100
+    HOUR_INTERVAL = 400
+    MOVE_INTERVAL = 40
+    MOVE_MODE_RESET_CHANCE = 33
+    MOVE_MODE_MORE_ACTIVE_CHANCE = 66
+    LURED_CHANCE = 75
+    SCAN_COOLDOWN = 15
+    AUDIO_COOLDOWN = 600
+    ZAP_COOLDOWN = 150
+    POWER_LIMIT = 100
+    DOOR_POWER_CHANGE_LEVEL = 5
+    SCAN_POWER_CHANGE_LEVEL = 15
+    AUDIO_POWER_CHANGE_LEVEL = 30
+    ZAP_POWER_CHANGE_LEVEL = 50
+    POWER_REBOOT_INTERNAL = 160
+    LAUGH_INTERVAL = 7
+
+    # params overrides the game parameters above, e.g. {'MOVE_INTERVAL': 30};
+    # movePolicy is a MOVE_POLICY_SIZE bytes table (see tools/adversary.py)
+    def __init__(self, seed=1, log=None, actionLog=False, alwaysShown=False, notMoving=False, params=None,
+                 movePolicy=None):
+        if params:
+            for name, value in params.items():
+                if name not in GAME_PARAMETERS:
+                    raise AttributeError(f'unknown game parameter: {name}')
+                setattr(self, name, value)
+        self.log = log
+        self.actionLog = actionLog and log is not None
+        self.alwaysShown = alwaysShown
+        self.notMoving = notMoving
+        if movePolicy is not None and len(movePolicy) != MOVE_POLICY_SIZE:
+            raise ValueError(f'move policy must be {MOVE_POLICY_SIZE} bytes')
+        self.movePolicy = movePolicy
+        self.movePolicyHash = movePolicyHash(movePolicy) if movePolicy is not None else 0
+        self.events = []
+        # timers as parallel lists indexed by timer ID: (mode, interval, cooldown timer started when it ends)
+        timers = (
+            (MODE_CONTINUOUS, self.HOUR_INTERVAL, TIMER_NONE),                        # Hour
+            (MODE_CONTINUOUS, self.MOVE_INTERVAL, TIMER_NONE),                        # Move
+            (MODE_CONTINUOUS, 10, TIMER_NONE),                                        # PowerMonitor
+            (MODE_STEPPING, self.POWER_REBOOT_INTERNAL, TIMER_NONE),                  # PowerReboot
+            (MODE_ONCE, 3, TIMER_NONE),                                               # SelectRoom
+            (MODE_ONCE, 5, TIMER_NONE),                                               # PlayerAction
+            (MODE_STEPPING, 8, TIMER_NONE),                                           # Door
+            (MODE_STEPPING, 10, TIMER_SCAN_COOLDOWN),                                 # Scan
+            (MODE_STEPPING, 10, TIMER_AUDIO_COOLDOWN),                                # Audio
+            (MODE_STEPPING, 10, TIMER_ZAP_COOLDOWN),                                  # Zap
+            (MODE_STEPPING, self.SCAN_COOLDOWN, TIMER_NONE),                          # ScanCooldown
+            (MODE_STEPPING, self.AUDIO_COOLDOWN, TIMER_NONE),                         # AudioCooldown
+            (MODE_STEPPING, self.ZAP_COOLDOWN, TIMER_NONE),                           # ZapCooldown
+            (MODE_CONTINUOUS, 3, TIMER_NONE) if alwaysShown else (MODE_STEPPING, 25, TIMER_NONE),  # ShowAnomaly
+        )
+        self.timerModes = [mode for mode, _, _ in timers]
+        self.timerIntervals = [interval for _, interval, _ in timers]
+        self.timerCooldowns = [cooldown for _, _, cooldown in timers]
+        self.timerCallbacks = [getattr(self, name) for name in TIMER_NAMES]
+        self.timerCounts = [0] * TIMERS  # countpool, or the tick a continuous timer fires on
+        self.activeTimers = []  # IDs of the counting non-continuous timers, in ID order
+        self.timerWheel = {}    # tick -> IDs of the continuous timers firing on it
+        self.timerCursor = TIMERS
+        self.seed(seed)
+        self.reset()
+
+    # ===== random numbers =====
+
+    # xorshift32, so that a seed gives the same night on the device and on a desktop
+    def seed(self, value):
+        self.rngState = (value & 0xFFFFFFFF) or 0x2545F491
+
+    def randint(self, a, b):
+        x = self.rngState
+        x ^= (x << 13) & 0xFFFFFFFF
+        x ^= x >> 17
+        x ^= (x << 5) & 0xFFFFFFFF
+        self.rngState = x
+        return a + x % (b - a + 1)
+
+    def chance(self, threshold):
+        return self.randint(1, 100) <= threshold
+
+    # ===== reset =====
+
+    def reset(self):
+        self.AI = max(0, self.AI_START_LEVEL + (self.AI_FINAL_LEVEL - self.AI_START_LEVEL
+                                               - round((self.AI_FINAL_LEVEL - self.AI_START_LEVEL) / 5) * 5))
+        self.gameStatus = 'Ongoing'
+        self.tick = 0
+        self.hour = 0
+        self.selectedRoom = TARGET_ROOM
+        self.detectionRoom = -1
+        self.moveMode = 'Normal'
+        self.pressedKey = ''
+        self.doorClosed = False
+        self.powerOut = False
+        self.systemPower = 0
+        self.justLaughed = -self.LAUGH_INTERVAL
+        self.activeTimers.clear()
+        self.timerWheel.clear()
+        self.timerCursor = TIMERS
+        for timer in range(TIMERS):
+            self.setCountpool(timer, self.timerIntervals[timer] if self.timerModes[timer] == MODE_CONTINUOUS else 0)
+        self.anomalyRoom = RESET_ROOMS[self.randint(0, len(RESET_ROOMS)-1)]
+        self.events.clear()
+
+    # ===== snapshots =====
+
+    # copy the whole game state into a fixed-size array('i') record;
+    # pass an earlier record to fill it in place without allocating
+    def snapshot(self, record=None):
+        if record is None:
+            record = array('i', [0]) * (SNAPSHOT_FIELDS + TIMERS)
+        record[0] = self.rngState >> 16
+        record[1] = self.rngState & 0xFFFF
+        record[2] = self.tick
+        record[3] = self.hour
+        record[4] = self.AI
+        record[5] = GAME_STATUSES.index(self.gameStatus)
+        record[6] = self.selectedRoom
+        record[7] = self.detectionRoom
+        record[8] = self.anomalyRoom
+        record[9] = MOVE_MODES.index(self.moveMode)
+        record[10] = PRESSED_KEYS.index(self.pressedKey)
+        record[11] = self.doorClosed
+        record[12] = self.powerOut
+        record[13] = self.systemPower
+        record[14] = self.justLaughed
+        for timer in range(TIMERS):
+            record[SNAPSHOT_FIELDS + timer] = self.countpool(timer)
+        return record
+
+    # bring the game back to a snapshot() record (or its bytes)
+    def restore(self, record):
+        if not isinstance(record, array):
+            record = array('i', record)
+        self.rngState = (record[0] << 16) | record[1]
+        self.tick = record[2]
+        self.hour = record[3]
+        self.AI = record[4]
+        self.gameStatus = GAME_STATUSES[record[5]]
+        self.selectedRoom = record[6]
+        self.detectionRoom = record[7]
+        self.anomalyRoom = record[8]
+        self.moveMode = MOVE_MODES[record[9]]
+        self.pressedKey = PRESSED_KEYS[record[10]]
+        self.doorClosed = bool(record[11])
+        self.powerOut = bool(record[12])
+        self.systemPower = record[13]
+        self.justLaughed = record[14]
+        self.activeTimers.clear()
+        self.timerWheel.clear()
+        self.timerCursor = TIMERS
+        for timer in range(TIMERS):
+            self.setCountpool(timer, record[SNAPSHOT_FIELDS + timer])
+        self.events.clear()
+
+    # ===== runtime =====
+
+    # run one tick with the key pressed during it (or None);
+    # the returned list is reused, so consume it before the next step
+    def step(self, key=None):
+        self.events.clear()
+        self.tick += 1
+        self.timerCursor = -1
+        if key:
+            self.pressedKey = key
+            self.invokeCallbackAndCountdown(KEY_ACTIONS[key])
+        self.countdownProcess()
+        return self.events
+
+    def run(self, maxTicks=1000000):
+        step = self.step
+        while self.gameStatus == 'Ongoing' and self.tick < maxTicks:
+            step()
+        return self.gameStatus
+
+    # the number of ticks from the next one on that would change nothing but the cooldown bars and the
+    # power bar if no key is pressed: no continuous timer is due but the power monitor, the counting
+    # timers are on none of their TIMER_LOUD_COUNTS, and the power bar holds and stays in powerRange
+    # (a range; None stops at the next power monitor tick)
+    def quietTicks(self, powerRange=None):
+        if self.powerOut:
+            return 0
+        counts = self.timerCounts
+        quiet = 1 << 30
+        for timer in self.activeTimers:
+            louds = TIMER_LOUD_COUNTS[timer]
+            if louds is None:
+                return 0
+            count = counts[timer]
+            for loud in louds:
+                if loud < count:
+                    if count - loud - 1 < quiet:
+                        if count - loud == 1:
+                            return 0
+                        quiet = count - loud - 1
+                    break
+        tick = self.tick
+        wheel = self.timerWheel
+        end = min(wheel)
+        monitor = counts[TIMER_POWER_MONITOR]
+        if powerRange is not None and end == monitor and len(wheel[end]) == 1:
+            end = quiet + tick + 1
+            for due in wheel:
+                if monitor < due < end:
+                    end = due
+            # the power bar after every power monitor tick before the end, as PowerMonitor() sets it
+            period = self.timerIntervals[TIMER_POWER_MONITOR] + 1
+            change = self.DOOR_POWER_CHANGE_LEVEL if self.doorClosed else -self.DOOR_POWER_CHANGE_LEVEL
+            power = self.systemPower
+            while monitor < end:
+                power = max(0, min(self.POWER_LIMIT, power + change))
+                if power == self.POWER_LIMIT or power not in powerRange:
+                    end = monitor
+                    break
+                monitor += period
+        return max(0, min(quiet, end - tick - 1))
+
+    # run `ticks` quiet ticks (at most quietTicks()) at once; returns the last value of every bar
+    # they changed as the events stepping them would have ended with
+    def skip(self, ticks):
+        tick = self.tick = self.tick + ticks
+        counts = self.timerCounts
+        events = self.events
+        events.clear()
+        monitor = counts[TIMER_POWER_MONITOR]
+        if monitor <= tick:
+            period = self.timerIntervals[TIMER_POWER_MONITOR] + 1
+            runs = (tick - monitor) // period + 1
+            change = self.DOOR_POWER_CHANGE_LEVEL if self.doorClosed else -self.DOOR_POWER_CHANGE_LEVEL
+            self.systemPower = max(0, self.systemPower + change * runs)
+            self.setCountpool(TIMER_POWER_MONITOR, monitor + runs * period - tick - 1)
+            events.append((EVENT_BAR, BAR_POWER, self.systemPower))
+        active = self.activeTimers
+        for timer in active:
+            counts[timer] = max(0, counts[timer] - ticks)
+        for timer, bar in zip(COOLDOWN_TIMERS, COOLDOWN_BARS):
+            if counts[timer]:
+                events.append((EVENT_BAR, bar, counts[timer]))
+        active[:] = [timer for timer in active if counts[timer]]
+        return events
+
+    def invokeCallbackAndCountdown(self, timer):
+        if self.countpool(timer) == 0:
+            cooldown = self.timerCooldowns[timer]
+            if cooldown != TIMER_NONE and self.countpool(cooldown) > 0:
+                self.playAudio(VOICE_PLAYER_ACTION, 'error')
+            else:
+                self.setCountpool(timer, self.timerIntervals[timer])
+                if self.timerModes[timer] != MODE_ONCE_AT_END:
+                    self.timerCallbacks[timer]()
+
+    # only the continuous timers due this tick and the counting timers are visited,
+    # in ID order; a timer started by an earlier one in the same tick is visited too
+    def countdownProcess(self):
+        tick = self.tick
+        due = self.timerWheel.pop(tick, ())
+        active = self.activeTimers
+        modes = self.timerModes
+        counts = self.timerCounts
+        callbacks = self.timerCallbacks
+        last = -1
+        nextDue = 0
+        while True:
+            timer = TIMERS
+            for i in active:
+                if i > last:
+                    timer = i
+                    break
+            if nextDue < len(due) and due[nextDue] < timer:
+                timer = due[nextDue]
+                nextDue += 1
+                if counts[timer] != tick:
+                    continue  # moved by a timer before it in this tick
+                self.timerCursor = last = timer
+                self.setCountpool(timer, self.timerIntervals[timer])
+                callbacks[timer]()
+                continue
+            if timer == TIMERS:
+                break
+            self.timerCursor = last = timer
+            mode = modes[timer]
+            counts[timer] -= 1
+            if mode == MODE_STEPPING:
+                callbacks[timer]()
+            if counts[timer] == 0:
+                if timer in active:
+                    active.remove(timer)
+                if mode == MODE_ONCE_AT_END:
+                    callbacks[timer]()
+                if self.timerCooldowns[timer] != TIMER_NONE:
+                    self.invokeCallbackAndCountdown(self.timerCooldowns[timer])
+        self.timerCursor = TIMERS
+
+    # ===== timer bookkeeping =====
+
+    # timerCursor is the timer ID countdownProcess() has reached in this tick
+    def countpool(self, timer):
+        if self.timerModes[timer] == MODE_CONTINUOUS:
+            return max(0, self.timerCounts[timer] - self.tick - (timer <= self.timerCursor))
+        return self.timerCounts[timer]
+
+    def setCountpool(self, timer, value):
+        counts = self.timerCounts
+        if self.timerModes[timer] == MODE_CONTINUOUS:
+            wheel = self.timerWheel
+            slot = wheel.get(counts[timer])
+            if slot and timer in slot:
+                slot.remove(timer)
+                if not slot:
+                    del wheel[counts[timer]]
+            counts[timer] = due = self.tick + value + (timer <= self.timerCursor)
+            slot = wheel.get(due)
+            if slot is None:
+                wheel[due] = [timer]
+            else:
+                slot.append(timer)
+                slot.sort()
+            return
+        counts[timer] = value
+        active = self.activeTimers
+        if value == 0:
+            if timer in active:
+                active.remove(timer)
+        elif timer not in active:
+            active.append(timer)
+            active.sort()
+
+    # ===== helpers =====
+
+    def getCountdownAndInterval(self, timer):
+        return self.countpool(timer), self.timerIntervals[timer]
+
+    def resetCountDown(self, timer, value=0):
+        self.setCountpool(timer, value)
+
+    def playAudio(self, voice, name):
+        self.events.append((EVENT_AUDIO, voice, name))
+
+    def setMoveMode(self, modes):
+        self.moveMode = modes[self.randint(0, len(modes)-1)]
+        if self.alwaysShown and self.actionLog:
+            self.log(f'{ANOMALY_NAME} switchs to move mode: {self.moveMode}')
+
+    def moveModeChange(self):
+        moveMode = self.moveMode
+        anomalyRoom = self.anomalyRoom
+        if self.powerOut and moveMode in ('Normal', 'Lure', 'Escape'):
+            self.setMoveMode(('Door', 'Air Vent'))
+        elif ((moveMode == 'Lure' and anomalyRoom == AUDIO_ROOM) or (moveMode == 'Escape' and anomalyRoom in RESET_ROOMS)) \
+                and self.chance(self.MOVE_MODE_RESET_CHANCE):
+            self.setMoveMode(('Normal',))
+            return True
+        elif moveMode == 'Normal' and anomalyRoom not in (WINDOW_ROOM, DOOR_ROOM, AIR_VENT_ROOM) \
+                and self.chance(self.MOVE_MODE_MORE_ACTIVE_CHANCE):
+            self.setMoveMode(('Door', 'Air Vent'))
+
+    def movePolicyIndex(self):
+        bucket = self.systemPower * MOVE_POLICY_POWER_BUCKETS // (self.POWER_LIMIT + 1)
+        return (((self.anomalyRoom * len(MOVE_MODES) + MOVE_MODE_INDEX[self.moveMode]) * MOVE_POLICY_HOURS
+                 + self.hour) * 2 + self.doorClosed) * MOVE_POLICY_POWER_BUCKETS + bucket
+
+    def pickExit(self, connectedRooms):
+        movePolicy = self.movePolicy
+        if movePolicy:
+            i = self.movePolicyIndex()
+            choice = (movePolicy[i >> 2] >> ((i & 3) << 1)) & 3
+            if choice < len(connectedRooms):
+                return connectedRooms[choice]
+        return connectedRooms[self.randint(0, len(connectedRooms)-1)]
+
+    # ===== callbacks =====
+
+    def Hour(self):
+        if self.hour == 6:
+            return
+        self.hour += 1
+        if self.hour == 6:
+            self.gameStatus = 'Survived'
+            return
+        self.AI = min(100, self.AI + round((self.AI_FINAL_LEVEL - self.AI_START_LEVEL) / 5))
+        self.events.append((EVENT_HOUR, self.hour, self.AI))
+        if self.log:
+            self.log(f'Time: {self.hour} AM, AI level: {self.AI}/100')
+
+    def Move(self):
+        if self.notMoving:
+            return
+        if self.anomalyRoom == TARGET_ROOM and self.gameStatus != 'Died':
+            self.gameStatus = 'Died'
+            return
+        if (not self.powerOut or self.moveMode not in ('Escape', 'Lure') or self.anomalyRoom not in (DOOR_ROOM, AIR_VENT_ROOM)) \
+                and not self.chance(self.AI):
+            return
+        self.moveModeChange()
+        connectedRooms = MOVE_PERF[self.moveMode][self.anomalyRoom]
+        if len(connectedRooms) == 0:
+            return
+        newDirection = self.pickExit(connectedRooms)
+        if self.moveMode == 'Door' and self.anomalyRoom == DOOR_ROOM and newDirection == TARGET_ROOM and self.doorClosed:
+            if self.log:
+                self.log(f'{ANOMALY_NAME} is blocked by the security door! (knocking sound heard)')
+            self.playAudio(VOICE_ANOMALY_ACTION, 'knock')
+            self.setMoveMode(('Normal', 'Air Vent', 'Escape'))
+            return
+        self.events.append((EVENT_MOVE, self.anomalyRoom, newDirection))
+        self.anomalyRoom = anomalyRoom = newDirection
+        if self.actionLog and anomalyRoom != TARGET_ROOM:
+            self.log(f'{ANOMALY_NAME} moves to {ROOM_NAMES[anomalyRoom]} (room {anomalyRoom}), mode: {self.moveMode}')
+        if anomalyRoom == TARGET_ROOM:
+            self.playAudio(VOICE_ANOMALY_LAUGH, f'laugh{self.randint(1, 2)}')
+            self.playAudio(VOICE_ANOMALY_ACTION, 'walk')
+            if self.actionLog:
+                self.log(f'Help me, Markimoo, you are my only hope... ({ANOMALY_NAME} has reached the target)')
+        elif anomalyRoom in WALK_SOUND_ROOMS:
+            self.playAudio(VOICE_ANOMALY_ACTION, 'walk')
+            if self.log:
+                self.log(f'{ANOMALY_NAME} walking sound heard')
+        elif anomalyRoom == AIR_VENT_ROOM:
+            self.playAudio(VOICE_ANOMALY_ACTION, 'airvent')
+            if self.log:
+                self.log(f'{ANOMALY_NAME} crawling in the air vent heard')
+        if anomalyRoom in SCANNABLE_ROOMS and self.moveMode in ('Door', 'Air Vent'):
+            if (self.tick - self.justLaughed) >= self.LAUGH_INTERVAL:
+                self.playAudio(VOICE_ANOMALY_LAUGH, f'laugh{self.randint(1, 2)}')
+                if self.log:
+                    self.log(f'{ANOMALY_NAME} laughing sound heard')
+                self.justLaughed = self.tick
+
+    def PowerMonitor(self):
+        if self.powerOut:
+            return
+        if self.doorClosed:
+            self.systemPower += self.DOOR_POWER_CHANGE_LEVEL
+        else:
+            self.systemPower -= self.DOOR_POWER_CHANGE_LEVEL
+        self.systemPower = max(0, min(self.POWER_LIMIT, self.systemPower))
+        self.events.append((EVENT_BAR, BAR_POWER, self.systemPower))
+        if self.systemPower == self.POWER_LIMIT:
+            if self.log:
+                self.log('Power out!')
+            self.events.append((EVENT_POWER_OUT, None, None))
+            if self.doorClosed:
+                self.playAudio(VOICE_PLAYER_EFFECT_2, 'door')
+                self.doorClosed = False
+            self.playAudio(VOICE_BACKGROUND, 'powerdown')
+            self.powerOut = True
+            self.systemPower = 0
+            self.events.append((EVENT_BAR, BAR_POWER, 0))
+            if self.moveMode not in ('Door', 'Air Vent'):
+                self.setMoveMode(('Door', 'Air Vent'))
+            self.invokeCallbackAndCountdown(TIMER_POWER_REBOOT)
+
+    def PowerReboot(self):
+        countdown = self.timerCounts[TIMER_POWER_REBOOT]
+        self.events.append((EVENT_POWER_REBOOT, countdown, None))
+        if self.actionLog and countdown % 10 == 0:
+            self.log(f'Power reboot countdown: {int(countdown/10)}')
+        if countdown == 0:
+            self.powerOut = False
+            self.events.append((EVENT_POWER_RESTORED, None, None))
+
+    def SelectRoom(self):
+        selectedRoom = self.selectedRoom
+        newRoom = selectRoom(selectedRoom, self.pressedKey)
+        if newRoom != selectedRoom:
+            self.selectedRoom = newRoom
+            self.events.append((EVENT_SELECT, selectedRoom, newRoom))
+            self.events.append(_LABELS)
+            self.pressedKey = ''
+            self.playAudio(VOICE_PLAYER_ACTION, 'tap')
+
+    def PlayerAction(self):
+        if self.powerOut or self.anomalyRoom == TARGET_ROOM:
+            self.playAudio(VOICE_PLAYER_EFFECT, 'error')
+        elif self.pressedKey == 'Special':
+            if self.selectedRoom == TARGET_ROOM:
+                self.invokeCallbackAndCountdown(TIMER_DOOR)
+            elif self.selectedRoom == AIR_VENT_ROOM:
+                self.invokeCallbackAndCountdown(TIMER_ZAP)
+            elif self.selectedRoom == AUDIO_ROOM:
+                self.invokeCallbackAndCountdown(TIMER_AUDIO)
+        elif self.pressedKey == 'Scan':
+            if self.selectedRoom in SCANNABLE_ROOMS:
+                self.detectionRoom = self.selectedRoom
+                self.invokeCallbackAndCountdown(TIMER_SCAN)
+        self.pressedKey = ''
+
+    def Door(self):
+        if self.powerOut:
+            self.resetCountDown(TIMER_DOOR)
+        countdown = self.timerCounts[TIMER_DOOR]
+        maxCountDown = self.timerIntervals[TIMER_DOOR]
+        if countdown == maxCountDown-2:
+            self.doorClosed = not self.doorClosed
+            self.playAudio(VOICE_PLAYER_EFFECT_2, 'door')
+            self.events.append(_LABELS)
+
+    def Scan(self):
+        if self.powerOut:
+            self.resetCountDown(TIMER_SCAN)
+        countdown = self.timerCounts[TIMER_SCAN]
+        maxCountDown = self.timerIntervals[TIMER_SCAN]
+        detectionRoom = self.detectionRoom
+        detected = (self.anomalyRoom == detectionRoom)
+        if countdown == maxCountDown:
+            if detected:
+                self.invokeCallbackAndCountdown(TIMER_SHOW_ANOMALY)
+        elif countdown == maxCountDown-2:
+            if detected:
+                self.playAudio(VOICE_PLAYER_EFFECT_2, 'windowscare')
+            self.playAudio(VOICE_PLAYER_EFFECT, 'scan')
+            self.systemPower += self.SCAN_POWER_CHANGE_LEVEL
+        if countdown == 0:
+            self.detectionRoom = -1
+        elif countdown in (maxCountDown-2, maxCountDown-4, maxCountDown-6):
+            self.events.append((EVENT_ROOM_FILL, detectionRoom, FILL_DANGER if detected else FILL_CLEAR))
+        elif countdown in (maxCountDown-3, maxCountDown-5, maxCountDown-7):
+            self.events.append((EVENT_ROOM_FILL, detectionRoom, FILL_IDLE))
+
+    def Audio(self):
+        if self.powerOut:
+            self.resetCountDown(TIMER_AUDIO)
+            self.events.append((EVENT_ICON, ICON_AUDIO, False))
+        countdown = self.timerCounts[TIMER_AUDIO]
+        maxCountDown = self.timerIntervals[TIMER_AUDIO]
+        if countdown == maxCountDown-2:
+            self.playAudio(VOICE_PLAYER_EFFECT_2, f'lure{self.randint(1, 3)}')
+            if self.log:
+                self.log('Lure audio played')
+            if self.anomalyRoom not in (TARGET_ROOM, AIR_VENT_ROOM):
+                if self.chance(self.LURED_CHANCE):
+                    self.setMoveMode(('Lure',))
+                    if self.actionLog:
+                        self.log(f'{ANOMALY_NAME} is attracted by the audio lure!')
+            self.systemPower += self.AUDIO_POWER_CHANGE_LEVEL
+        if countdown in (maxCountDown, maxCountDown-6):
+            self.events.append((EVENT_ICON, ICON_AUDIO, True))
+        elif countdown in (maxCountDown-5, 1):
+            self.events.append((EVENT_ICON, ICON_AUDIO, False))
+
+    def Zap(self):
+        if self.powerOut:
+            self.resetCountDown(TIMER_ZAP)
+            self.events.append((EVENT_ICON, ICON_ZAP, False))
+        countdown = self.timerCounts[TIMER_ZAP]
+        maxCountDown = self.timerIntervals[TIMER_ZAP]
+        if countdown == maxCountDown-2:
+            self.playAudio(VOICE_PLAYER_EFFECT_2, 'zap')
+            if self.anomalyRoom == AIR_VENT_ROOM:
+                self.playAudio(VOICE_ANOMALY_ACTION, 'zapscream')
+                self.events.append((EVENT_MOVE, AIR_VENT_ROOM, WINDOW_ROOM))
+                self.anomalyRoom = WINDOW_ROOM
+                self.setMoveMode(('Escape', 'Door'))
+                if self.actionLog:
+                    self.log(f'{ANOMALY_NAME} get zapped in the air vent!')
+            self.systemPower += self.ZAP_POWER_CHANGE_LEVEL
+        if countdown in (maxCountDown, maxCountDown-6):
+            self.events.append((EVENT_ICON, ICON_ZAP, True))
+        elif countdown in (maxCountDown-5, 1):
+            self.events.append((EVENT_ICON, ICON_ZAP, False))
+
+    def cooldown(self, timer, bar):
+        if self.powerOut:
+            self.resetCountDown(timer)
+        countdown = self.timerCounts[timer]
+        maxCountDown = self.timerIntervals[timer]
+        self.events.append((EVENT_BAR, bar, countdown))
+        if countdown == maxCountDown or countdown == 0:
+            self.events.append(_LABELS)
+
+    def ScanCooldown(self):
+        self.cooldown(TIMER_SCAN_COOLDOWN, BAR_SCAN)
+
+    def AudioCooldown(self):
+        self.cooldown(TIMER_AUDIO_COOLDOWN, BAR_AUDIO)
+
+    def ZapCooldown(self):
+        self.cooldown(TIMER_ZAP_COOLDOWN, BAR_ZAP)
+
+    def ShowAnomaly(self):
+        if self.alwaysShown:
+            self.events.append((EVENT_ICON, ICON_ANOMALY, True))
+        else:
+            if self.powerOut:
+                self.resetCountDown(TIMER_SHOW_ANOMALY)
+            countdown = self.timerCounts[TIMER_SHOW_ANOMALY]
+            maxCountDown = self.timerIntervals[TIMER_SHOW_ANOMALY]
+            if countdown == maxCountDown:
+                self.events.append((EVENT_ICON, ICON_ANOMALY, True))
+            elif countdown == 0:
+                self.events.append((EVENT_ICON, ICON_ANOMALY, False))
+
+
+# ===== traces =====
+
+# one letter per PRESSED_KEYS entry (Special, sCan, Up, Down, Left, Right)
+TRACE_KEYS = ' SCUDLR'
+TRACE_PREFIX = 'Trace: '
+TRACE_MAX_RUNS = const(512)  # key runs kept per night, about 2.5 KB on the device
+
+TRACE_ALWAYS_SHOWN = const(1)
+TRACE_NOT_MOVING = const(2)
+TRACE_MOVE_POLICY = const(4)
+TRACE_TRUNCATED = const(8)   # the night had more than TRACE_MAX_RUNS key runs, the later ones are missing
+
+
+class Trace:
+
+    # a night as the random state it started from and the runs of ticks a key was held on
+    # (first tick, key, number of ticks); the digest folds in every Move() and power value,
+    # to check a replay against the recording
+    def __init__(self):
+        self.ticks = array('H')
+        self.keys = bytearray()
+        self.lengths = array('H')
+        self.seed = 0
+        self.flags = 0
+        self.policy = 0  # movePolicyHash() of the move policy, with TRACE_MOVE_POLICY
+        self.status = 'Ongoing'
+        self.endTick = 0
+        self.moves = 0
+        self.digest = 0
+
+    # call right before engine.reset() starts the night
+    def start(self, engine):
+        self.ticks = array('H')
+        self.keys = bytearray()
+        self.lengths = array('H')
+        self.seed = engine.rngState
+        self.flags = ((TRACE_ALWAYS_SHOWN if engine.alwaysShown else 0) | (TRACE_NOT_MOVING if engine.notMoving else 0)
+                      | (TRACE_MOVE_POLICY if engine.movePolicy is not None else 0))
+        self.policy = engine.movePolicyHash
+        self.status = 'Ongoing'
+        self.endTick = 0
+        self.moves = 0
+        self.digest = 0
+
+    # call after every engine.step(key) with the key and the events it returned;
+    # a key held over consecutive ticks lengthens its run instead of adding one
+    def record(self, tick, key, events):
+        if key:
+            index = PRESSED_KEYS.index(key)
+            last = len(self.ticks) - 1
+            if last >= 0 and self.keys[last] == index and self.ticks[last] + self.lengths[last] == tick:
+                self.lengths[last] += 1
+            elif last + 1 < TRACE_MAX_RUNS:
+                self.ticks.append(tick)
+                self.keys.append(index)
+                self.lengths.append(1)
+            else:
+                self.flags |= TRACE_TRUNCATED
+        digest = self.digest
+        for kind, a, b in events:
+            if kind == EVENT_MOVE:
+                self.moves += 1
+                digest = (digest * 33 + tick + b) & 0xFFFFFF  # 24 bits keep it a small int on the device
+            elif kind == EVENT_BAR and a == BAR_POWER:
+                digest = (digest * 33 + 128 + b) & 0xFFFFFF
+        self.digest = digest
+
+    def finish(self, engine):
+        self.status = engine.gameStatus
+        self.endTick = engine.tick
+
+    # play the night back on an engine made with the same flags, recording the replay into result
+    def replay(self, engine, result=None):
+        if result is None:
+            result = Trace()
+        engine.seed(self.seed)
+        result.start(engine)
+        engine.reset()
+        ticks = self.ticks
+        keys = self.keys
+        lengths = self.lengths
+        count = len(ticks)
+        endTick = self.endTick
+        step = engine.step
+        record = result.record
+        i = 0
+        while engine.gameStatus == 'Ongoing' and engine.tick < endTick:
+            tick = engine.tick + 1
+            key = None
+            if i < count and ticks[i] <= tick:
+                key = PRESSED_KEYS[keys[i]]
+                if tick == ticks[i] + lengths[i] - 1:
+                    i += 1
+            record(tick, key, step(key))
+        result.finish(engine)
+        return result
+
+    def matches(self, other):
+        return (self.status, self.endTick, self.moves, self.digest) == (other.status, other.endTick, other.moves, other.digest)
+
+    # one line, written piece by piece: every run is its key letter, after the ticks since the end of
+    # the previous run unless 1, and followed by (length) when the key was held for more than one tick
+    def write(self, write):
+        write(f'{TRACE_PREFIX}seed={self.seed} flags={self.flags} status={self.status} ticks={self.endTick} '
+              f'moves={self.moves} digest={self.digest:06x} ')
+        if self.flags & TRACE_MOVE_POLICY:
+            write(f'policy={self.policy:06x} ')
+        write('keys=')
+        last = 0
+        for i in range(len(self.ticks)):
+            tick = self.ticks[i]
+            length = self.lengths[i]
+            if tick - last != 1:
+                write(str(tick - last))
+            write(TRACE_KEYS[self.keys[i]])
+            if length > 1:
+                write(f'({length})')
+            last = tick + length - 1
+        write('\n')
+
+    @classmethod
+    def parse(cls, line):
+        trace = cls()
+        for pair in line.split(TRACE_PREFIX, 1)[1].split():
+            name, _, value = pair.partition('=')
+            if name == 'seed':
+                trace.seed = int(value)
+            elif name == 'flags':
+                trace.flags = int(value)
+            elif name == 'status':
+                trace.status = value
+            elif name == 'ticks':
+                trace.endTick = int(value)
+            elif name == 'moves':
+                trace.moves = int(value)
+            elif name == 'digest':
+                trace.digest = int(value, 16)
+            elif name == 'policy':
+                trace.policy = int(value, 16)
+            elif name == 'keys':
+                last = 0
+                digits = ''
+                for character in value:
+                    if character.isdigit():
+                        digits += character
+                    elif character == ')':
+                        trace.lengths[-1] = int(digits)
+                        last += int(digits) - 1
+                        digits = ''
+                    elif character != '(':
+                        last += int(digits) if digits else 1
+                        digits = ''
+                        trace.ticks.append(last)
+                        trace.keys.append(TRACE_KEYS.index(character))
+                        trace.lengths.append(1)
+        return trace
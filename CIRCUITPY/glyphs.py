@@ -0,0 +1,10 @@
+'''
+Project Foobear: characters drawn with each font
+
+Generated by tools/subsetfont.py, do not edit: run it again after changing any text on screen.
+'''
+
+# ter-u12b.pcf
+FONT_12_GLYPHS = ' !ACDHLMORSVabcefgilmnorstvwy'
+# ter-u22b.pcf
+FONT_22_GLYPHS = ' !).0123456789:ABDEFIMOPSUWYZabcdefghijklmnoprstuvwy'
@@ -0,0 +1,114 @@
+'''
+Project Foobear: main screen layout
+
+Generated by tools/genlayout.py, do not edit: change the generator and run it again.
+'''
+
+ROOM_W = 65
+ROOM_H = 40
+ROOM_INTERVAL = 15
+
+# (x, y, width, height) by room
+ROOM_RECTS = (
+    (25, 75, 65, 40),
+    (105, 75, 65, 40),
+    (185, 75, 65, 40),
+    (25, 130, 65, 40),
+    (105, 130, 65, 40),
+    (185, 130, 65, 40),
+    (25, 185, 65, 40),
+    (105, 185, 65, 40),
+    (185, 185, 65, 40),
+    (272, 140, 22, 75),
+)
+
+# (x, y) by room
+ROOM_CENTERS = (
+    (57, 95),
+    (137, 95),
+    (217, 95),
+    (57, 150),
+    (137, 150),
+    (217, 150),
+    (57, 205),
+    (137, 205),
+    (217, 205),
+    (283, 178),
+)
+
+# (x, y) of the room name labels
+ROOM_LABEL_POS = (
+    (31, 81),
+    (107, 81),
+    (191, 81),
+    (37, 136),
+    (117, 136),
+    (197, 136),
+    (33, 191),
+    (123, 191),
+    (197, 191),
+    (259, 128),
+)
+
+# (x0, y0, x1, y1)
+CORRIDOR_LINES = (
+    (90, 95, 105, 95),
+    (170, 95, 185, 95),
+    (90, 150, 105, 150),
+    (170, 150, 185, 150),
+    (90, 205, 105, 205),
+    (170, 205, 185, 205),
+    (57, 115, 57, 130),
+    (137, 115, 137, 130),
+    (217, 115, 217, 130),
+    (57, 170, 57, 185),
+    (137, 170, 137, 185),
+    (250, 150, 272, 150),
+    (250, 205, 272, 205),
+)
+DOOR_RECT = (181, 190, 8, 30)
+WINDOW_RECT = (193, 174, 49, 8)
+BUTTON_LABEL_PADDING = 4
+BUTTON_LABEL_Y = 45
+SCAN_LABEL_X = 35
+
+# by action button text
+ACTION_LABEL_X = {
+    'Action': 185,
+    'Door': 195,
+    'Audio': 190,
+    'Zap': 201,
+}
+
+# by hour
+HOUR_LABEL_X = (115, 115, 115, 115, 115, 115, 115)
+
+# (x, y, width, height) of the cooldown and power bars
+SCAN_BAR_RECT = (10, 34, 8, 22)
+AUDIO_BAR_RECT = (10, 75, 8, 40)
+ZAP_BAR_RECT = (302, 159, 8, 38)
+POWER_BAR_RECT = (242, 185, 8, 40)
+
+# hidden icons are moved off the screen
+ICON_DEFAULT_X = -30
+ICON_DEFAULT_Y = -30
+ANOMALY_ICON_R = 8
+
+# (x, y) of the '!' on the anomaly icon by room
+ANOMALY_LABEL_POS = (
+    (54, 95),
+    (134, 95),
+    (214, 95),
+    (54, 150),
+    (134, 150),
+    (214, 150),
+    (54, 205),
+    (134, 205),
+    (214, 205),
+    (280, 178),
+)
+ANOMALY_LABEL_HIDDEN_POS = (-38, -38)
+
+# (x0, y0, x1, y1, x2, y2)
+AUDIO_ICON_POINTS = (21, 87, 21, 103, 29, 95)
+ZAP_ICON_POINTS = (298, 170, 298, 186, 285, 178)
@@ -0,0 +1,161 @@
+'''
+Project Foobear: train FooBear's move policy against the bots
+
+FooBear normally picks its next room uniformly from MOVE_PERF. This tool
+learns which exit to take in each (room, move mode, hour, door, power bucket)
+situation to hunt down the reference bots of tools/bots.py faster, with a
+policy gradient: every batch plays nights on engine.py with a softmax choice
+per situation, and moves the choices of nights that ended early (for the bot)
+up and those of long nights down. The result is written as the packed
+MOVE_POLICY_SIZE bytes table that Engine(movePolicy=...) and code.py load.
+
+    python tools/adversary.py --iterations 40
+    python tools/adversary.py --bots scan-7-and-9 --evaluate 1000 --out /tmp/moves.bin
+'''
+
+import argparse
+import concurrent.futures
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+DEVICE_DIR = os.path.join(os.path.dirname(TOOLS_DIR), 'CIRCUITPY')
+POLICY_PATH = os.path.join(DEVICE_DIR, 'movepolicy.bin')
+
+sys.path.insert(0, DEVICE_DIR)
+
+from engine import Engine, MOVE_POLICY_ENTRIES, MOVE_POLICY_RANDOM
+from bots import BOTS, Observation, playNight
+
+DEFAULT_BOTS = ('scan-7-and-9', 'door-camper', 'lure-spammer')
+MAX_EXITS = 3
+NIGHT_TICKS = 6 * (Engine.HOUR_INTERVAL + 1)
+
+
+# ===== training =====
+
+class LearningEngine(Engine):
+
+    # samples the exit from softmax(logits) and records every choice it makes
+    def __init__(self, logits, sampler, **kwargs):
+        super().__init__(**kwargs)
+        self.logits = logits
+        self.sampler = sampler
+        self.choices = []
+
+    def pickExit(self, connectedRooms):
+        n = len(connectedRooms)
+        if n == 1:
+            return connectedRooms[0]
+        i = self.movePolicyIndex()
+        weights = np.exp(self.logits[i, :n] - self.logits[i, :n].max())
+        choice = self.sampler.choices(range(n), weights.tolist())[0]
+        self.choices.append((i, choice, n))
+        return connectedRooms[choice]
+
+
+def playBatch(logits, names, nights, seed):
+    sampler = random.Random(seed)
+    engine = LearningEngine(logits, sampler)
+    obs = Observation()
+    bots = {name: BOTS[name]() for name in names}
+    results = []
+    for n in range(nights):
+        name = names[n % len(names)]
+        engine.seed(seed * 1000003 + n + 1)
+        engine.reset()
+        engine.choices = []
+        playNight(engine, bots[name], obs)
+        # FooBear's reward: the share of the night the bot did not get through
+        reward = 1.0 - min(engine.tick, NIGHT_TICKS) / NIGHT_TICKS
+        results.append((name, reward, engine.choices))
+    return results
+
+
+def train(names, iterations, nights, learningRate=2.0, seed=0, jobs=1, log=print):
+    logits = np.zeros((MOVE_POLICY_ENTRIES, MAX_EXITS))
+    visits = np.zeros(MOVE_POLICY_ENTRIES, dtype=np.int64)
+    share = -(-nights // jobs)
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as pool:
+        for it in range(iterations):
+            start = time.perf_counter()
+            futures = [pool.submit(playBatch, logits, names, share, seed * 7919 + it * jobs + j) for j in range(jobs)]
+            results = [r for future in futures for r in future.result()]
+            baseline = {name: np.mean([reward for n, reward, _ in results if n == name]) for name in names}
+            grad = np.zeros_like(logits)
+            for name, reward, choices in results:
+                advantage = reward - baseline[name]
+                for i, choice, n in choices:
+                    p = np.exp(logits[i, :n] - logits[i, :n].max())
+                    p /= p.sum()
+                    step = -p
+                    step[choice] += 1.0
+                    grad[i, :n] += advantage * step
+                    visits[i] += 1
+            logits += learningRate * grad / len(results)
+            mean = np.mean([reward for _, reward, _ in results])
+            log(f'iteration {it + 1}/{iterations}: FooBear reward {mean:.4f} '
+                f'({len(results)} nights, {time.perf_counter() - start:.1f} s)')
+    return logits, visits
+
+
+# ===== export =====
+
+# argmax exit of every situation seen in training, random elsewhere
+def packPolicy(logits, visits, minVisits=20):
+    choices = np.where(visits >= minVisits, logits.argmax(axis=1), MOVE_POLICY_RANDOM)
+    choices = np.concatenate([choices, np.full(-len(choices) % 4, MOVE_POLICY_RANDOM)]).astype(np.uint8)
+    packed = choices[0::4] | (choices[1::4] << 2) | (choices[2::4] << 4) | (choices[3::4] << 6)
+    return bytes(packed.astype(np.uint8))
+
+
+def evaluate(name, nights, seed=0, movePolicy=None):
+    engine = Engine(movePolicy=movePolicy)
+    bot = BOTS[name]()
+    obs = Observation()
+    survived = 0
+    ticks = 0
+    for n in range(nights):
+        engine.seed(seed * 1000003 + n + 1)
+        engine.reset()
+        status, _ = playNight(engine, bot, obs)
+        survived += status == 'Survived'
+        ticks += min(engine.tick, NIGHT_TICKS)
+    return survived / nights, ticks / nights / NIGHT_TICKS
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train FooBear's move policy against the reference bots.")
+    parser.add_argument('--bots', default=','.join(DEFAULT_BOTS),
+                        help=f'comma separated bots to train against (default {",".join(DEFAULT_BOTS)})')
+    parser.add_argument('--iterations', type=int, default=40, help='policy gradient steps (default 40)')
+    parser.add_argument('--nights', type=int, default=600, help='nights per step (default 600)')
+    parser.add_argument('--learning-rate', type=float, default=2.0, help='step size (default 2.0)')
+    parser.add_argument('--evaluate', type=int, default=500, help='nights per bot for the final comparison')
+    parser.add_argument('--seed', type=int, default=0, help='random seed (default 0)')
+    parser.add_argument('--jobs', type=int, default=1, help='worker processes (default 1)')
+    parser.add_argument('--out', default=POLICY_PATH, help='policy file (default CIRCUITPY/movepolicy.bin)')
+    args = parser.parse_args()
+    names = [name.strip() for name in args.bots.split(',') if name.strip()]
+    for name in names:
+        if name not in BOTS:
+            raise SystemExit(f'unknown bot {name!r}, expected one of {", ".join(sorted(BOTS))}')
+    start = time.perf_counter()
+    logits, visits = train(names, args.iterations, args.nights, args.learning_rate, args.seed, args.jobs)
+    policy = packPolicy(logits, visits)
+    with open(args.out, 'wb') as f:
+        f.write(policy)
+    print(f'Trained in {time.perf_counter() - start:.1f} s, {len(policy)} bytes written to {args.out}')
+    print(f'{"bot":>14}  {"survival (uniform -> learned)":>30}  night survived (uniform -> learned)')
+    for name in names:
+        before = evaluate(name, args.evaluate, args.seed + 1)
+        after = evaluate(name, args.evaluate, args.seed + 1, policy)
+        print(f'{name:>14}  {before[0]:>14.3f} -> {after[0]:<13.3f}  {before[1]:.3f} -> {after[1]:.3f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,197 @@
+'''
+Project Foobear: fit the audio clips into a flash budget
+
+Reads every clip of CIRCUITPY/audio (16 bit 22.05 kHz mono), trims the silence
+at both ends, cuts ambience down to a seamless loop (code.py plays it with
+loop=True), then encodes all clips in one sample format: of the formats that
+keep the total under --budget bytes and every clip above --min-snr, the one
+with the best mean quality. audiomixer only plays samples in the format of the
+Mixer, hence a single format; code.py takes the Mixer settings from
+ambience.wav. The quality of each clip is the SNR (dB) of the encoded clip,
+decoded back to 16 bit 22.05 kHz, against the trimmed original.
+
+The originals in CIRCUITPY/audio stay the source: the optimized clips go to
+--out, to be copied to the audio folder of the CIRCUITPY drive.
+
+    python tools/audiopack.py --budget 1500000
+    python tools/audiopack.py --format 16000/8 --out /tmp/audio
+'''
+
+import argparse
+import os
+import time
+import wave
+
+import numpy as np
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(TOOLS_DIR)
+AUDIO_DIR = os.path.join(ROOT_DIR, 'CIRCUITPY', 'audio')
+OUT_DIR = os.path.join(ROOT_DIR, '.cache', 'audio')
+
+SOURCE_RATE = 22050
+WAV_HEADER = 44
+FORMATS = ((22050, 16), (16000, 16), (22050, 8), (11025, 16), (16000, 8), (11025, 8))  # (sample rate, bits)
+SILENCE_DB = -50     # trimmed below this level (dBFS) at the start and end of a clip
+SILENCE_MARGIN = 0.01  # seconds kept around the sound
+LOOPS = {'ambience': (8.0, 16.0)}  # clip -> (shortest, longest) loop in seconds
+CROSSFADE = 0.25     # seconds of the loop end faded into its start
+MAX_SNR = 99.0       # reported for (nearly) lossless clips
+
+
+# ===== wav files =====
+
+def readWav(path):
+    with wave.open(path, 'rb') as w:
+        if w.getnchannels() != 1 or w.getsampwidth() != 2 or w.getframerate() != SOURCE_RATE:
+            raise SystemExit(f'{path}: expected 16 bit {SOURCE_RATE} Hz mono')
+        return np.frombuffer(w.readframes(w.getnframes()), dtype='<i2').astype(np.float64)
+
+
+def writeWav(path, rate, bits, data):
+    with wave.open(path, 'wb') as w:
+        w.setnchannels(1)
+        w.setsampwidth(bits // 8)
+        w.setframerate(rate)
+        w.writeframes(data.tobytes())
+
+
+# ===== processing =====
+
+def trimSilence(x):
+    level = 32768 * 10 ** (SILENCE_DB / 20)
+    loud = np.nonzero(np.abs(x) > level)[0]
+    if not len(loud):
+        return x[:1]
+    margin = round(SILENCE_MARGIN * SOURCE_RATE)
+    return x[max(0, loud[0] - margin):loud[-1] + 1 + margin]
+
+
+# the loop length whose next CROSSFADE seconds look most like the start of the clip,
+# returned as (loop, correlation); the tail is then faded into the head so the seam is inaudible
+def findLoop(x, shortest, longest):
+    fade = round(CROSSFADE * SOURCE_RATE)
+    lo = round(shortest * SOURCE_RATE)
+    hi = min(round(longest * SOURCE_RATE), len(x) - fade)
+    if hi < lo:
+        return None, 0.0
+    head = x[:fade]
+    segment = x[lo:hi + fade]
+    n = 1 << (len(segment) + fade).bit_length()
+    dots = np.fft.irfft(np.fft.rfft(segment, n) * np.conj(np.fft.rfft(head, n)), n)[:hi - lo + 1]
+    energy = np.concatenate(([0.0], np.cumsum(segment ** 2)))
+    norms = np.sqrt((energy[fade:fade + hi - lo + 1] - energy[:hi - lo + 1]) * np.dot(head, head)) + 1e-9
+    best = int(np.argmax(dots / norms))
+    return lo + best, float(dots[best] / norms[best])
+
+
+def makeLoop(x, loop):
+    fade = round(CROSSFADE * SOURCE_RATE)
+    y = x[:loop].copy()
+    ramp = np.linspace(0.0, 1.0, fade, endpoint=False)
+    y[:fade] = x[:fade] * ramp + x[loop:loop + fade] * (1.0 - ramp)
+    return y
+
+
+def resample(x, length):
+    if length == len(x):
+        return x
+    spectrum = np.fft.rfft(x)
+    bins = length // 2 + 1
+    if bins <= len(spectrum):
+        spectrum = spectrum[:bins]
+    else:
+        spectrum = np.concatenate((spectrum, np.zeros(bins - len(spectrum), dtype=spectrum.dtype)))
+    return np.fft.irfft(spectrum, length) * (length / len(x))
+
+
+# (encoded samples, the same decoded back to 16 bit 22.05 kHz floats)
+def encode(x, rate, bits, rng):
+    y = resample(x, max(1, round(len(x) * rate / SOURCE_RATE)))
+    if bits == 16:
+        data = np.clip(np.round(y), -32768, 32767).astype('<i2')
+        decoded = data.astype(np.float64)
+    else:
+        dither = rng.random(len(y)) - rng.random(len(y))  # triangular, +-1 LSB
+        data = np.clip(np.round(y / 256 + dither) + 128, 0, 255).astype(np.uint8)  # 8 bit WAVs are unsigned
+        decoded = (data.astype(np.float64) - 128) * 256
+    return data, resample(decoded, len(x))
+
+
+def snr(reference, decoded):
+    noise = np.sum((reference - decoded) ** 2)
+    return min(MAX_SNR, 10 * np.log10(np.sum(reference ** 2) / noise)) if noise > 0 else MAX_SNR
+
+
+def prepare(names):
+    clips = {}
+    for name in names:
+        x = trimSilence(readWav(os.path.join(AUDIO_DIR, f'{name}.wav')))
+        loop = None
+        if name in LOOPS:
+            length, correlation = findLoop(x, *LOOPS[name])
+            if length is not None:
+                x = makeLoop(x, length)
+                loop = (length / SOURCE_RATE, correlation)
+        clips[name] = (x, loop)
+    return clips
+
+
+def pack(clips, rate, bits, seed=0):
+    rng = np.random.default_rng(seed)
+    results = {}
+    for name, (x, _) in clips.items():
+        data, decoded = encode(x, rate, bits, rng)
+        results[name] = (data, WAV_HEADER + data.nbytes, snr(x, decoded))
+    return results
+
+
+# ===== main =====
+
+def main():
+    parser = argparse.ArgumentParser(description='Trim, loop and re-encode the audio clips within a byte budget.')
+    parser.add_argument('--budget', type=int, default=1500000, help='total bytes of all clips (default 1500000)')
+    parser.add_argument('--min-snr', type=float, default=10.0, help='worst clip SNR allowed in dB (default 10)')
+    parser.add_argument('--format', help='force a sample format as RATE/BITS, e.g. 16000/8')
+    parser.add_argument('--out', default=OUT_DIR, help='output folder (default .cache/audio)')
+    parser.add_argument('--seed', type=int, default=0, help='dither seed (default 0)')
+    args = parser.parse_args()
+    start = time.perf_counter()
+    names = sorted(f[:-4] for f in os.listdir(AUDIO_DIR) if f.endswith('.wav'))
+    originalBytes = {name: os.path.getsize(os.path.join(AUDIO_DIR, f'{name}.wav')) for name in names}
+    clips = prepare(names)
+    if args.format:
+        rate, _, bits = args.format.partition('/')
+        formats = [(int(rate), int(bits))]
+    else:
+        formats = FORMATS
+    candidates = []
+    print(f'{"format":>10}  {"bytes":>9}  {"worst SNR":>9}  {"mean SNR":>8}')
+    for rate, bits in formats:
+        results = pack(clips, rate, bits, args.seed)
+        total = sum(size for _, size, _ in results.values())
+        snrs = [value for _, _, value in results.values()]
+        print(f'{rate:>6}/{bits:<3}  {total:>9}  {min(snrs):>9.1f}  {np.mean(snrs):>8.1f}')
+        if args.format or (total <= args.budget and min(snrs) >= args.min_snr):
+            candidates.append((np.mean(snrs), rate, bits, results))
+    if not candidates:
+        raise SystemExit(f'no sample format fits in {args.budget} bytes with every clip above {args.min_snr} dB')
+    _, rate, bits, results = max(candidates, key=lambda c: c[0])
+    os.makedirs(args.out, exist_ok=True)
+    print(f'\nChosen format: {rate} Hz {bits} bit (Mixer: sample_rate={rate}, bits_per_sample={bits}, '
+          f'samples_signed={bits > 8})')
+    print(f'{"clip":>12}  {"bytes":>8} -> {"bytes":<8}  {"seconds":>7}  {"SNR dB":>6}  notes')
+    for name in names:
+        data, size, value = results[name]
+        x, loop = clips[name]
+        writeWav(os.path.join(args.out, f'{name}.wav'), rate, bits, data)
+        notes = f'loop {loop[0]:.2f} s (seam correlation {loop[1]:.2f})' if loop else ''
+        print(f'{name:>12}  {originalBytes[name]:>8} -> {size:<8}  {len(x) / SOURCE_RATE:>7.2f}  {value:>6.1f}  {notes}')
+    before = sum(originalBytes.values())
+    after = sum(size for _, size, _ in results.values())
+    print(f'Total: {before} -> {after} bytes, {before - after} saved ({(before - after) / before:.0%}), '
+          f'written to {args.out} in {time.perf_counter() - start:.1f} s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,305 @@
+'''
+Project Foobear: microbenchmarks of the per-tick hot paths
+
+Times the engine calls a tick is made of (countdownProcess, Move,
+moveModeChange, SelectRoom, invokeCallbackAndCountdown, a whole step) and the
+code.py side of a tick (setLabelsAndColors, and step + handleEvents +
+refreshIfDirty as the main loop runs them), the latter on code.py itself
+started in the emulator. Every benchmark starts its batches from game states
+saved along a bot's night, so the timings cover the states a real night goes
+through. The mean time per operation (and ops/s) comes from whole batches;
+the 50th, 90th and 99th percentiles and the maximum come from timing every
+operation on its own (less the clock's own overhead), so the slow ticks show.
+Absolute numbers are CPython on this machine, not the device: compare runs
+with each other.
+
+    python tools/bench.py                                   # all benchmarks
+    python tools/bench.py --filter Move --seconds 2
+    python tools/bench.py --save .cache/bench.json          # store a baseline
+    python tools/bench.py --baseline .cache/bench.json --max-regression 0.1
+
+With --baseline it exits with 1 if the mean time of a benchmark grows by
+more than --max-regression (a fraction) over the baseline.
+'''
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import sys
+import time
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+DEVICE_DIR = os.path.join(os.path.dirname(TOOLS_DIR), 'CIRCUITPY')
+
+sys.path.insert(0, DEVICE_DIR)
+
+from engine import Engine, KEY_ACTIONS, ROOM_NAMES
+from bots import BOTS, Observation
+import emulate
+
+STATE_INTERVAL = 50     # ticks between the saved game states
+BATCH_SECONDS = 0.002   # a timed batch runs at least this long
+KEYS = tuple(KEY_ACTIONS)
+DIRECTIONS = ('Up', 'Down', 'Left', 'Right')
+
+
+# ===== game states =====
+
+# snapshot() records along a night played by a bot, taken while the night is still on
+def gameStates(engine, seed=1, bot='scan-7-and-9'):
+    engine.seed(seed)
+    engine.reset()
+    player = BOTS[bot]()
+    player.reset()
+    obs = Observation()
+    states = []
+    key = None
+    while engine.gameStatus == 'Ongoing':
+        if engine.tick % STATE_INTERVAL == 0:
+            states.append(engine.snapshot())
+        obs.update(engine, engine.step(key))
+        key = player.act(obs)
+    engine.restore(states[0])
+    return states
+
+
+# a key or None for every tick, pressed about as often as a player does
+def keySequence(count=4096, seed=1):
+    rng = random.Random(seed)
+    return [rng.choice(KEYS) if rng.random() < 0.2 else None for _ in range(count)]
+
+
+# code.py running in the emulator, stopped on the first tick of the night
+def startDevice():
+    def setup(host):
+        until = host.until
+        host.until = lambda host: until(host) or getattr(host.namespace.get('engine'), 'tick', 0) >= 1
+    emulation = emulate.run(setup=setup)
+    host = emulation.host
+    host.until = None
+    host.policy = None
+    return host.namespace
+
+
+# ===== benchmarks =====
+
+class Benchmark:
+
+    # make() returns op(i), which runs the i-th operation of a batch;
+    # the engine is restored to one of the states before every batch
+    def __init__(self, name, make, engine, states):
+        self.name = name
+        self.make = make
+        self.engine = engine
+        self.states = states
+
+
+def engineBenchmarks(engine, keys):
+    states = gameStates(engine)
+
+    def countdownProcess():
+        def op(i):
+            engine.tick += 1
+            engine.countdownProcess()
+            engine.events.clear()
+        return op
+
+    def move():
+        def op(i):
+            engine.Move()
+            engine.events.clear()
+        return op
+
+    def moveModeChange():
+        def op(i):
+            engine.moveModeChange()
+        return op
+
+    def selectRoom():
+        def op(i):
+            engine.pressedKey = DIRECTIONS[i & 3]
+            engine.SelectRoom()
+            engine.events.clear()
+        return op
+
+    def invokeCallbackAndCountdown():
+        def op(i):
+            key = KEYS[i % len(KEYS)]
+            engine.pressedKey = key
+            engine.invokeCallbackAndCountdown(KEY_ACTIONS[key])
+            engine.events.clear()
+        return op
+
+    def step():
+        def op(i):
+            engine.step(keys[i & 4095])
+        return op
+
+    return [
+        Benchmark('countdownProcess', countdownProcess, engine, states),
+        Benchmark('Move', move, engine, states),
+        Benchmark('moveModeChange', moveModeChange, engine, states),
+        Benchmark('SelectRoom', selectRoom, engine, states),
+        Benchmark('invokeCallbackAndCountdown', invokeCallbackAndCountdown, engine, states),
+        Benchmark('engine.step', step, engine, states),
+    ]
+
+
+def deviceBenchmarks(ns, keys):
+    engine = ns['engine']
+    states = gameStates(engine)
+    rooms = len(ROOM_NAMES)
+
+    def setLabelsAndColors():
+        setLabels = ns['setLabelsAndColors']
+
+        def op(i):
+            engine.selectedRoom = i % rooms
+            setLabels()
+        return op
+
+    def tick():
+        step = engine.step
+        handleEvents = ns['handleEvents']
+        refreshIfDirty = ns['refreshIfDirty']
+        collect = ns['gc'].collect
+        interval = ns['GC_INTERVAL']
+
+        def op(i):
+            handleEvents(step(keys[i & 4095]))
+            if engine.tick % interval == 0:
+                collect()
+            refreshIfDirty()
+        return op
+
+    return [
+        Benchmark('setLabelsAndColors', setLabelsAndColors, engine, states),
+        Benchmark('tick', tick, engine, states),
+    ]
+
+
+# ===== timing =====
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, round(fraction * (len(ordered) - 1)))]
+
+
+# the time perf_counter_ns() itself adds to a single timed operation
+def timerOverhead(count=10000):
+    clock = time.perf_counter_ns
+    samples = []
+    for _ in range(count):
+        start = clock()
+        samples.append(clock() - start)
+    return percentile(samples, 0.5)
+
+
+# half of `seconds` on batches of n operations, each from the next saved state, for the mean time
+# (the throughput); the other half on the same batches with every operation timed on its own, for
+# the percentiles, so that a slow operation shows in the tail instead of being averaged away
+def measure(benchmark, seconds, overhead):
+    op = benchmark.make()
+    engine = benchmark.engine
+    states = benchmark.states
+    clock = time.perf_counter_ns
+    batch = 1
+    while True:
+        engine.restore(states[0])
+        start = clock()
+        for i in range(batch):
+            op(i)
+        if clock() - start >= BATCH_SECONDS * 1e9 or batch >= 1 << 16:
+            break
+        batch *= 2
+    means = []
+    end = time.perf_counter() + seconds / 2
+    while time.perf_counter() < end or len(means) < 5:
+        engine.restore(states[len(means) % len(states)])
+        start = clock()
+        for i in range(batch):
+            op(i)
+        means.append((clock() - start) / batch)
+    times = []
+    runs = 0
+    end = time.perf_counter() + seconds / 2
+    while time.perf_counter() < end or runs < 5:
+        engine.restore(states[runs % len(states)])
+        for i in range(batch):
+            start = clock()
+            op(i)
+            times.append(clock() - start - overhead)
+        runs += 1
+    mean = percentile(means, 0.5)
+    return {
+        'opsPerSec': 1e9 / mean,
+        'meanNs': mean,
+        'p50Ns': percentile(times, 0.5),
+        'p90Ns': percentile(times, 0.9),
+        'p99Ns': percentile(times, 0.99),
+        'maxNs': max(times),
+        'samples': len(times),
+        'batch': batch,
+    }
+
+
+def printResults(results, baseline=None):
+    header = f'{"benchmark":>28}  {"ops/s":>10}  {"mean ns":>9}  {"p50 ns":>9}  {"p90 ns":>9}  {"p99 ns":>9}  {"max ns":>9}'
+    print(header + ('  vs baseline' if baseline else ''))
+    for name, result in results.items():
+        line = (f'{name:>28}  {result["opsPerSec"]:>10.0f}  {result["meanNs"]:>9.0f}  {result["p50Ns"]:>9.0f}  '
+                f'{result["p90Ns"]:>9.0f}  {result["p99Ns"]:>9.0f}  {result["maxNs"]:>9.0f}')
+        if baseline and name in baseline:
+            line += f'  {result["meanNs"] / baselineMean(baseline[name]) - 1:>+11.1%}'
+        print(line)
+
+
+# results saved before the per-operation percentiles only have the median batch mean, as p50Ns
+def baselineMean(result):
+    return result.get('meanNs', result['p50Ns'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time the per-tick hot paths of engine.py and code.py.')
+    parser.add_argument('--filter', help='only run benchmarks whose name contains this')
+    parser.add_argument('--seconds', type=float, default=0.5, help='time spent on each benchmark (default 0.5)')
+    parser.add_argument('--save', help='write the results to this JSON file')
+    parser.add_argument('--baseline', help='compare with the results saved in this JSON file')
+    parser.add_argument('--max-regression', type=float, default=0.1,
+                        help='with --baseline, fail if a mean time grows by more than this fraction (default 0.1)')
+    args = parser.parse_args()
+    keys = keySequence()
+    overhead = timerOverhead()
+    results = {}
+    with contextlib.redirect_stdout(io.StringIO()):  # code.py logs FooBear's moves
+        benchmarks = engineBenchmarks(Engine(), keys) + deviceBenchmarks(startDevice(), keys)
+        for benchmark in benchmarks:
+            if not args.filter or args.filter in benchmark.name:
+                results[benchmark.name] = measure(benchmark, args.seconds, overhead)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['benchmarks']
+    printResults(results, baseline)
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, 'w') as f:
+            json.dump({'python': platform.python_version(), 'machine': platform.machine(), 'benchmarks': results},
+                      f, indent=2)
+        print(f'Results written to {args.save}')
+    if baseline:
+        slower = [name for name, result in results.items()
+                  if name in baseline and result['meanNs'] > baselineMean(baseline[name]) * (1 + args.max_regression)]
+        for name in slower:
+            print(f'Regression: {name} is {results[name]["meanNs"] / baselineMean(baseline[name]) - 1:.1%} slower '
+                  f'(limit {args.max_regression:.0%})')
+        if slower:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+'''
+Project Foobear: read and compare the boot reports of code.py
+
+code.py prints one "Boot phase:" line per startup phase (time in ms, heap
+kept in bytes and free heap after a gc.collect()) and a "Boot total:" line on
+the serial console. Save the console output of a boot to a file (the Mu
+serial panel, or e.g. `tio /dev/ttyACM0 --log-file boot.log`), then:
+
+    python tools/bootreport.py boot.log                   # show the report
+    python tools/bootreport.py before.log after.log       # compare two builds
+    python tools/bootreport.py before.log after.log --max-ms 50 --max-bytes 2048
+
+When comparing, it exits with 1 if the total boot time grows by more than
+--max-ms or the heap kept by more than --max-bytes, so it can guard a build.
+A log holding several boots uses the last one; --json prints the parsed report.
+'''
+
+import argparse
+import json
+import sys
+
+PHASE_PREFIX = 'Boot phase: '
+TOTAL_PREFIX = 'Boot total: '
+
+
+def parseFields(text):
+    fields = {}
+    for pair in text.split():
+        key, _, value = pair.partition('=')
+        try:
+            fields[key] = float(value) if '.' in value else int(value)
+        except ValueError:
+            fields[key] = value
+    return fields
+
+
+# every boot in the log as {'phases': {name: {'ms', 'heapBytes', 'free'}}, 'total': {'ms', 'phases', 'free'}}
+def parseReports(lines):
+    reports = []
+    current = None
+    for line in lines:
+        line = line.strip()
+        if PHASE_PREFIX in line:
+            fields = parseFields(line.split(PHASE_PREFIX, 1)[1])
+            if current is None or current['total'] is not None:
+                current = {'phases': {}, 'total': None}
+                reports.append(current)
+            current['phases'][fields.pop('name')] = fields
+        elif TOTAL_PREFIX in line and current is not None:
+            current['total'] = parseFields(line.split(TOTAL_PREFIX, 1)[1])
+    return reports
+
+
+def loadReport(path):
+    with open(path, errors='replace') as f:
+        reports = parseReports(f)
+    if not reports:
+        raise SystemExit(f'{path}: no boot report found')
+    report = reports[-1]
+    if report['total'] is None:
+        raise SystemExit(f'{path}: the last boot report is incomplete (no "{TOTAL_PREFIX.strip()}" line)')
+    return report
+
+
+def heapKept(report):
+    return sum(phase['heapBytes'] for phase in report['phases'].values())
+
+
+def printReport(report):
+    print(f'{"phase":>30}  {"ms":>8}  {"heap bytes":>10}  {"free":>7}')
+    for name, phase in report['phases'].items():
+        print(f'{name:>30}  {phase["ms"]:>8.1f}  {phase["heapBytes"]:>10}  {phase["free"]:>7}')
+    total = report['total']
+    print(f'{"total":>30}  {total["ms"]:>8.1f}  {heapKept(report):>10}  {total["free"]:>7}')
+
+
+def printComparison(before, after):
+    print(f'{"phase":>30}  {"ms":>19}  {"heap bytes":>23}')
+    names = list(before['phases']) + [name for name in after['phases'] if name not in before['phases']]
+    for name in names:
+        old = before['phases'].get(name)
+        new = after['phases'].get(name)
+        if old is None or new is None:
+            state = 'added' if old is None else 'removed'
+            phase = new or old
+            print(f'{name:>30}  {state:>7} {phase["ms"]:>11.1f}  {state:>7} {phase["heapBytes"]:>15}')
+            continue
+        print(f'{name:>30}  {old["ms"]:>7.1f} {new["ms"] - old["ms"]:>+11.1f}  '
+              f'{old["heapBytes"]:>7} {new["heapBytes"] - old["heapBytes"]:>+15}')
+    oldMs, newMs = before['total']['ms'], after['total']['ms']
+    oldHeap, newHeap = heapKept(before), heapKept(after)
+    print(f'{"total":>30}  {oldMs:>7.1f} {newMs - oldMs:>+11.1f}  {oldHeap:>7} {newHeap - oldHeap:>+15}')
+    return newMs - oldMs, newHeap - oldHeap
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Show or compare boot reports from the serial console of code.py.')
+    parser.add_argument('logs', nargs='+', help='one log to show, or two (before and after) to compare')
+    parser.add_argument('--max-ms', type=float, help='fail if the boot time grows by more than this')
+    parser.add_argument('--max-bytes', type=int, help='fail if the heap kept grows by more than this')
+    parser.add_argument('--json', action='store_true', help='print the parsed report(s) as JSON')
+    args = parser.parse_args()
+    if len(args.logs) > 2:
+        parser.error('expected one or two logs')
+    reports = [loadReport(path) for path in args.logs]
+    if args.json:
+        print(json.dumps(reports if len(reports) > 1 else reports[0], indent=2))
+        return
+    if len(reports) == 1:
+        printReport(reports[0])
+        return
+    msDelta, heapDelta = printComparison(*reports)
+    failures = []
+    if args.max_ms is not None and msDelta > args.max_ms:
+        failures.append(f'boot time grew by {msDelta:.1f} ms (limit {args.max_ms} ms)')
+    if args.max_bytes is not None and heapDelta > args.max_bytes:
+        failures.append(f'heap kept grew by {heapDelta} bytes (limit {args.max_bytes} bytes)')
+    for failure in failures:
+        print(f'Regression: {failure}')
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
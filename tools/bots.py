@@ -0,0 +1,356 @@
+'''
+Project Foobear: bot players
+
+A bot sees what a player sees - the hour, the power bar, the cooldown bars,
+the door, the focused room, scan results and the sounds of each tick (knock,
+walk, airvent, laugh...) - and answers with the key to press, which goes into
+Engine.step() just like nextKey() on the device. FooBear's room and
+move mode stay hidden.
+
+    python tools/bots.py --nights 2000
+    python tools/bots.py --bot door-camper --nights 500 --jobs 4
+
+Ticks on which the bot presses nothing and the engine only moves the
+cooldown and power bars are skipped in one go; --every-tick steps them one by
+one, which gives the same nights. Night i of a run gets the same seed whatever
+--jobs is. On one core this plays about 2500 nights/s with idle, 1200 with
+door-camper, 900 with lure-spammer and 200 with scan-7-and-9: the scanning bot
+still steps about 400 ticks a night (scans, door moves, key presses), so it
+stays well below a thousand nights per second.
+'''
+
+import argparse
+import concurrent.futures
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'CIRCUITPY'))
+
+from engine import (Engine, selectRoom, TARGET_ROOM, AIR_VENT_ROOM, AUDIO_ROOM, DOOR_ROOM, EVENT_AUDIO,
+                    EVENT_BAR, EVENT_ROOM_FILL, EVENT_ICON, EVENT_HOUR, EVENT_MOVE, EVENT_POWER_OUT,
+                    EVENT_POWER_RESTORED, BAR_SCAN, BAR_AUDIO, BAR_ZAP, BAR_POWER, FILL_IDLE, FILL_DANGER,
+                    ICON_ANOMALY)
+
+CAUSES = ('door', 'air vent', 'power out')
+FOREVER = 1 << 30  # Bot.idleTicks() of a bot that waits for something to happen
+ANY_POWER = range(FOREVER)  # Bot.powerRange() of a bot that does not look at the power bar
+
+
+# ===== observations =====
+
+class Observation:
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.tick = 0
+        self.hour = 0
+        self.power = 0
+        self.powerOut = False
+        self.doorClosed = False
+        self.selectedRoom = TARGET_ROOM
+        self.scanCooldown = 0
+        self.audioCooldown = 0
+        self.zapCooldown = 0
+        self.scan = None          # (room, detected) when a scan result shows up this tick
+        self.anomalySeen = None   # room of the anomaly icon while it is shown
+        self.cues = []            # audio clips started this tick
+
+    def update(self, engine, events):
+        self.tick = engine.tick
+        self.doorClosed = engine.doorClosed
+        self.selectedRoom = engine.selectedRoom
+        self.scan = None
+        cues = self.cues = []
+        for kind, a, b in events:
+            if kind == EVENT_AUDIO:
+                cues.append(b)
+            elif kind == EVENT_BAR:
+                if a == BAR_POWER:
+                    self.power = b
+                elif a == BAR_SCAN:
+                    self.scanCooldown = b
+                elif a == BAR_AUDIO:
+                    self.audioCooldown = b
+                elif a == BAR_ZAP:
+                    self.zapCooldown = b
+            elif kind == EVENT_ROOM_FILL and b != FILL_IDLE:
+                self.scan = (a, b == FILL_DANGER)
+            elif kind == EVENT_ICON and a == ICON_ANOMALY:
+                self.anomalySeen = engine.anomalyRoom if b else None
+            elif kind == EVENT_HOUR:
+                self.hour = a
+            elif kind == EVENT_POWER_OUT:
+                self.powerOut = True
+            elif kind == EVENT_POWER_RESTORED:
+                self.powerOut = False
+
+
+# ===== bots =====
+
+# first key on the shortest way to move the room focus from one room to another
+def _routes():
+    routes = {}
+    for start in range(10):
+        first = {start: None}
+        queue = [start]
+        while queue:
+            room = queue.pop(0)
+            for key in ('Up', 'Down', 'Left', 'Right'):
+                newRoom = selectRoom(room, key)
+                if newRoom not in first:
+                    first[newRoom] = first[room] or key
+                    queue.append(newRoom)
+        for end, key in first.items():
+            routes[start, end] = key
+    return routes
+
+
+ROUTES = _routes()
+
+
+class Bot:
+
+    name = 'idle'
+
+    def reset(self):
+        self.busy = 0
+        self.waited = False
+
+    # key to press this tick, or None
+    def act(self, obs):
+        return None
+
+    # after act() returned None: how many more calls of it are sure to return None as long as only the
+    # tick and the cooldown bars (above 0) change, so that the harness can skip them (0 to play every tick)
+    def idleTicks(self, obs):
+        return self.busy if self.waited else FOREVER
+
+    # after act() returned None: the power bar values it would return None for too, all else being equal
+    def powerRange(self, obs):
+        return ANY_POWER
+
+    # counts down the ticks given to the game after a key press; True while there are some left
+    def wait(self):
+        self.waited = self.busy > 0
+        if self.waited:
+            self.busy -= 1
+        return self.waited
+
+    # the harness skipped that many calls of act()
+    def skip(self, ticks):
+        self.busy = max(0, self.busy - ticks)
+
+    # press a key and give the game some ticks to react before the next decision
+    def press(self, key, ticks):
+        self.busy = ticks
+        return key
+
+    def goTo(self, obs, room):
+        return self.press(ROUTES[obs.selectedRoom, room], 3)
+
+
+class ScanDoorAndVent(Bot):
+
+    # room 9 has no scanner: the crawling sound gives the air vent away and gets zapped,
+    # the lobby (7) is scanned whenever steps are heard or a move may have happened
+    name = 'scan-7-and-9'
+
+    def reset(self):
+        super().reset()
+        self.lastScan = -100
+        self.zapWanted = False
+        self.doorWanted = False
+
+    def act(self, obs):
+        if 'airvent' in obs.cues:
+            self.zapWanted = True
+        if 'knock' in obs.cues:
+            self.doorWanted = False
+        if obs.scan and obs.scan[0] == DOOR_ROOM:
+            self.doorWanted = obs.scan[1]
+        if 'walk' in obs.cues:
+            self.lastScan = -100
+        if self.wait():
+            return None
+        if obs.powerOut:
+            return None
+        if self.zapWanted and obs.zapCooldown == 0 and obs.power < 50:
+            if obs.selectedRoom != AIR_VENT_ROOM:
+                return self.goTo(obs, AIR_VENT_ROOM)
+            self.zapWanted = False
+            return self.press('Special', 12)
+        wantClosed = self.doorWanted and obs.power < 85
+        if wantClosed != obs.doorClosed:
+            if obs.selectedRoom != TARGET_ROOM:
+                return self.goTo(obs, TARGET_ROOM)
+            return self.press('Special', 9)
+        if not obs.doorClosed and obs.tick - self.lastScan >= 40 and obs.scanCooldown == 0 and obs.power < 50:
+            if obs.selectedRoom != DOOR_ROOM:
+                return self.goTo(obs, DOOR_ROOM)
+            self.lastScan = obs.tick
+            return self.press('Scan', 12)
+        return None
+
+    def idleTicks(self, obs):
+        if self.waited:
+            return self.busy
+        if obs.tick - self.lastScan >= 40:
+            return FOREVER
+        return self.lastScan + 39 - obs.tick  # until the lobby scan comes due
+
+    def powerRange(self, obs):
+        if obs.power < 50:
+            return range(50)
+        return range(50, 85) if obs.power < 85 else range(85, FOREVER)
+
+
+class DoorCamper(Bot):
+
+    # sits on the control room and keeps the door shut as long as the power allows
+    name = 'door-camper'
+
+    def act(self, obs):
+        if self.wait():
+            return None
+        if obs.powerOut:
+            return None
+        if obs.selectedRoom != TARGET_ROOM:
+            return self.goTo(obs, TARGET_ROOM)
+        if (not obs.doorClosed and obs.power <= 30) or (obs.doorClosed and obs.power >= 85):
+            return self.press('Special', 9)
+        return None
+
+    def powerRange(self, obs):
+        return range(85) if obs.doorClosed else range(31, FOREVER)
+
+
+class LureSpammer(Bot):
+
+    # plays the Bluetooth speaker whenever it is charged
+    name = 'lure-spammer'
+
+    def act(self, obs):
+        if self.wait():
+            return None
+        if obs.powerOut:
+            return None
+        if obs.selectedRoom != AUDIO_ROOM:
+            return self.goTo(obs, AUDIO_ROOM)
+        if obs.audioCooldown == 0:
+            return self.press('Special', 12)
+        return None
+
+
+BOTS = {bot.name: bot for bot in (Bot, ScanDoorAndVent, DoorCamper, LureSpammer)}
+
+
+# ===== harness =====
+
+class Stats:
+
+    def __init__(self, name):
+        self.name = name
+        self.nights = 0
+        self.survived = 0
+        self.ticks = 0
+        self.seconds = 0.0
+        self.causes = dict.fromkeys(CAUSES, 0)
+
+    def merge(self, other):
+        self.nights += other.nights
+        self.survived += other.survived
+        self.ticks += other.ticks
+        self.seconds = max(self.seconds, other.seconds)
+        for cause, count in other.causes.items():
+            self.causes[cause] += count
+
+    @property
+    def survivalRate(self):
+        return self.survived / self.nights if self.nights else 0.0
+
+
+# ticks on which the bot would press nothing and the engine would only move the cooldown bars and
+# the power bar are skipped in one go (Engine.skip()), which gives the same nights as stepping every tick
+def playNight(engine, bot, obs, fastForward=True):
+    bot.reset()
+    obs.reset()
+    step = engine.step
+    act = bot.act
+    update = obs.update
+    key = None
+    cause = None
+    while engine.gameStatus == 'Ongoing':
+        events = step(key)
+        update(engine, events)
+        for kind, a, b in events:
+            if kind == EVENT_MOVE and b == TARGET_ROOM:
+                cause = 'power out' if engine.powerOut else ('door' if a == DOOR_ROOM else 'air vent')
+        key = act(obs)
+        while key is None and fastForward and engine.gameStatus == 'Ongoing':
+            # act() is called again after the last skipped tick; the ones before it return None
+            ticks = min(engine.quietTicks(bot.powerRange(obs)), bot.idleTicks(obs) + 1)
+            if not ticks:
+                break
+            update(engine, engine.skip(ticks))
+            bot.skip(ticks - 1)
+            key = act(obs)
+    return engine.gameStatus, cause
+
+
+# night i of a run is played from the same random state whichever worker gets it
+def runBot(name, nights, seed=0, params=None, fastForward=True, first=0):
+    engine = Engine(params=params)
+    bot = BOTS[name]()
+    obs = Observation()
+    stats = Stats(name)
+    start = time.perf_counter()
+    for i in range(first, first + nights):
+        engine.seed(seed * 1000003 + i + 1)
+        engine.reset()
+        status, cause = playNight(engine, bot, obs, fastForward)
+        stats.nights += 1
+        stats.ticks += engine.tick
+        if status == 'Survived':
+            stats.survived += 1
+        elif cause:
+            stats.causes[cause] += 1
+    stats.seconds = time.perf_counter() - start
+    return stats
+
+
+def benchmark(name, nights, seed=0, params=None, jobs=1, fastForward=True):
+    if jobs <= 1:
+        return runBot(name, nights, seed, params, fastForward)
+    stats = Stats(name)
+    start = time.perf_counter()
+    share = -(-nights // jobs)
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = [pool.submit(runBot, name, min(share, nights - first), seed, params, fastForward, first)
+                   for first in range(0, nights, share)]
+        for future in futures:
+            stats.merge(future.result())
+    stats.seconds = time.perf_counter() - start
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Play nights with bot players and report throughput.')
+    parser.add_argument('--bot', choices=sorted(BOTS) + ['all'], default='all', help='bot to run (default all)')
+    parser.add_argument('--nights', type=int, default=1000, help='nights per bot (default 1000)')
+    parser.add_argument('--seed', type=int, default=0, help='random seed (default 0)')
+    parser.add_argument('--jobs', type=int, default=1, help='worker processes (default 1)')
+    parser.add_argument('--every-tick', action='store_true', help='step every tick instead of skipping the quiet ones')
+    args = parser.parse_args()
+    names = sorted(BOTS) if args.bot == 'all' else [args.bot]
+    print(f'{"bot":>14}  {"survival":>8}  {"games/s":>8}  {"ticks/s":>9}  death causes')
+    for name in names:
+        stats = benchmark(name, args.nights, args.seed, jobs=args.jobs, fastForward=not args.every_tick)
+        print(f'{name:>14}  {stats.survivalRate:>8.3f}  {stats.nights / stats.seconds:>8.0f}  '
+              f'{stats.ticks / stats.seconds:>9.0f}  {stats.causes}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,184 @@
+'''
+Project Foobear: differential checks of the engine's timer code and snapshots
+
+Plays nights with random key presses on engine.py and, tick by tick, on a
+second engine that must stay in step with it: the events and the snapshot()
+record of both must be the same after every tick.
+
+  wheel     the second engine counts its timers down the way the game did
+            before the timer wheel: every timer of the table visited in ID
+            order on every tick, with one countpool each
+  snapshot  the second engine plays a night of its own, and at random ticks
+            is restored from the bytes of a snapshot() of the first one and
+            follows it for a while
+
+The nights alternate alwaysShown (which makes ShowAnomaly a continuous timer)
+and run with every parameter set of PARAMETER_SETS.
+
+    python tools/checkengine.py
+    python tools/checkengine.py --nights 150 --seed 7
+
+Any difference is printed with its night and tick, and the command exits
+with 1.
+'''
+
+import argparse
+import os
+import random
+import sys
+import time
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+DEVICE_DIR = os.path.join(os.path.dirname(TOOLS_DIR), 'CIRCUITPY')
+
+sys.path.insert(0, DEVICE_DIR)
+
+from engine import Engine, KEY_ACTIONS, MODE_CONTINUOUS, MODE_ONCE_AT_END, MODE_STEPPING, TIMER_NONE, TIMERS
+
+PARAMETER_SETS = {
+    'default': {},
+    'no-cooldowns': {'SCAN_COOLDOWN': 0, 'AUDIO_COOLDOWN': 0, 'ZAP_COOLDOWN': 0},
+    'short-intervals': {'HOUR_INTERVAL': 60, 'MOVE_INTERVAL': 5, 'POWER_REBOOT_INTERNAL': 3},
+}
+KEYS = tuple(KEY_ACTIONS)
+KEY_CHANCE = 0.08  # chance that a key run starts on a tick
+SWITCH_CHANCE = 0.05  # chance that the second engine of the snapshot check starts or stops following
+
+
+# the countdown the timer wheel replaced; timerCounts holds the countpool of every timer
+class ReferenceEngine(Engine):
+    def countdownProcess(self):
+        counts = self.timerCounts
+        for timer in range(TIMERS):
+            mode = self.timerModes[timer]
+            if counts[timer] == 0 and mode == MODE_CONTINUOUS:
+                self.invokeCallbackAndCountdown(timer)
+            elif counts[timer] > 0:
+                counts[timer] -= 1
+                if mode == MODE_STEPPING:
+                    self.timerCallbacks[timer]()
+                if counts[timer] == 0:
+                    if mode == MODE_ONCE_AT_END:
+                        self.timerCallbacks[timer]()
+                    if self.timerCooldowns[timer] != TIMER_NONE:
+                        self.invokeCallbackAndCountdown(self.timerCooldowns[timer])
+
+    def countpool(self, timer):
+        return self.timerCounts[timer]
+
+    def setCountpool(self, timer, value):
+        self.timerCounts[timer] = value
+
+
+# the key of every tick of a night: runs of one key held for 1-8 ticks, between idle stretches
+def randomKeys(rng):
+    run = 0
+    key = None
+    while True:
+        if run:
+            run -= 1
+        elif rng.random() < KEY_CHANCE:
+            key = rng.choice(KEYS)
+            run = rng.randint(0, 7)
+        else:
+            key = None
+        yield key
+
+
+def newEngines(night, params):
+    alwaysShown = bool(night % 2)
+    return (Engine(night, alwaysShown=alwaysShown, params=params),
+            ReferenceEngine(night, alwaysShown=alwaysShown, params=params))
+
+
+# the first difference between the two engines after a tick, or None
+def difference(engine, reference, events, expected):
+    if events != expected:
+        return f'events {events} != {expected}'
+    record = engine.snapshot()
+    expectedRecord = reference.snapshot()
+    if record != expectedRecord:
+        field = next(i for i in range(len(record)) if record[i] != expectedRecord[i])
+        return f'snapshot field {field}: {record[field]} != {expectedRecord[field]}'
+    return None
+
+
+def checkWheel(nights, seed, params):
+    ticks = 0
+    for night in range(seed, seed + nights):
+        engine, reference = newEngines(night, params)
+        keys = randomKeys(random.Random(night))
+        while engine.gameStatus == 'Ongoing':
+            key = next(keys)
+            events = list(engine.step(key))
+            problem = difference(engine, reference, events, list(reference.step(key)))
+            if problem:
+                return ticks, f'night {night}, tick {engine.tick}: {problem}'
+        ticks += engine.tick
+    return ticks, None
+
+
+# between the stretches in which it follows the first engine from a restore(), the second engine plays
+# a night of its own, so state that restore() misses shows up
+def checkSnapshots(nights, seed, params):
+    ticks = 0
+    for night in range(seed, seed + nights):
+        engine, _ = newEngines(night, params)
+        restored = Engine(~night, alwaysShown=engine.alwaysShown, params=params)
+        keys = randomKeys(random.Random(night))
+        ownKeys = randomKeys(random.Random(~night))
+        switches = random.Random(night + (1 << 32))
+        following = False
+        record = engine.snapshot()
+        while engine.gameStatus == 'Ongoing':
+            if switches.random() < SWITCH_CHANCE:
+                following = not following
+                if following:
+                    engine.snapshot(record)
+                    restored.restore(bytes(record))
+                    if restored.snapshot() != record:
+                        return ticks, f'night {night}, tick {engine.tick}: snapshot() after restore() differs'
+            key = next(keys)
+            events = list(engine.step(key))
+            if following:
+                problem = difference(engine, restored, events, list(restored.step(key)))
+                if problem:
+                    return ticks, f'night {night}, tick {engine.tick}: {problem}'
+            else:
+                restored.step(next(ownKeys))
+                if restored.gameStatus != 'Ongoing':
+                    restored.reset()
+        ticks += engine.tick
+    return ticks, None
+
+
+CHECKS = {
+    'wheel': checkWheel,
+    'snapshot': checkSnapshots,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check the timer wheel and the snapshots of engine.py.')
+    parser.add_argument('--nights', type=int, default=150, help='nights per parameter set (default 150)')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the first night (default 0)')
+    parser.add_argument('--check', choices=sorted(CHECKS), action='append',
+                        help='run only this check (repeat; default: all)')
+    args = parser.parse_args()
+    failures = []
+    for check in args.check or CHECKS:
+        for name, params in PARAMETER_SETS.items():
+            start = time.perf_counter()
+            ticks, problem = CHECKS[check](args.nights, args.seed, params)
+            print(f'{name:>16}  {check:>8}  {args.nights} nights  {ticks:>8} ticks  '
+                  f'{time.perf_counter() - start:>6.1f} s  {"MISMATCH" if problem else "ok"}')
+            if problem:
+                print(f'      {problem}')
+                failures.append(f'{check} with {name}')
+    if failures:
+        print(f'Regression: {", ".join(failures)}')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
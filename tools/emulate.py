@@ -0,0 +1,124 @@
+'''
+Project Foobear: run code.py on a desktop
+
+Runs CIRCUITPY/code.py unmodified under CPython, with the stand-in hardware
+modules in tools/shim and a virtual clock: sleeps and busy-wait loops cost no
+wall time, so a whole night (title screen included) finishes in well under a
+second.
+
+    python tools/emulate.py --nights 3 --seed 7
+'''
+
+import argparse
+import contextlib
+import io
+import os
+import random
+import sys
+import time
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+DEVICE_DIR = os.path.join(os.path.dirname(TOOLS_DIR), 'CIRCUITPY')
+SHIM_DIR = os.path.join(TOOLS_DIR, 'shim')
+
+for path in (DEVICE_DIR, SHIM_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from emulation import host, StopEmulation
+
+
+# ===== input policies =====
+
+# hold C on the title screen and never touch anything during the night
+def pressStart(host):
+    engine = host.namespace.get('engine')
+    if engine is not None and engine.tick == 0 and engine.gameStatus == 'Ongoing':
+        return ('BUTTON_3',)
+    return ()
+
+
+# ===== runner =====
+
+class Emulation:
+
+    def __init__(self, nights=1, maxSeconds=3600):
+        self.nights = nights
+        self.maxNs = maxSeconds * 1000000000
+        self.outcomes = []
+        self.lastStatus = None
+
+    # stop once the requested nights are over and the next title screen shows up
+    def until(self, host):
+        engine = host.namespace.get('engine')
+        if engine is not None:
+            status = engine.gameStatus
+            if status != self.lastStatus:
+                if self.lastStatus == 'Ongoing' and engine.tick > 0:
+                    self.outcomes.append(status)
+                self.lastStatus = status
+                if status == 'Ongoing' and len(self.outcomes) >= self.nights:
+                    return True
+        if host.now >= self.maxNs:
+            self.outcomes.append('Timeout')
+            return True
+        return False
+
+
+def run(nights=1, seed=0, pollMs=20, policy=pressStart, quiet=True, maxSeconds=3600, setup=None, render=False):
+    emulation = Emulation(nights, maxSeconds)
+    host.reset(pollStep=pollMs * 1000000, policy=policy, until=emulation.until, render=render)
+    random.seed(seed)
+    path = os.path.join(DEVICE_DIR, 'code.py')
+    with open(path) as f:
+        code = compile(f.read(), path, 'exec')
+    host.namespace = {'__name__': '__main__', '__file__': path}
+    console = io.StringIO()
+    saved = host.install()
+    cwd = os.getcwd()
+    os.chdir(DEVICE_DIR)
+    start = time.perf_counter()
+    try:
+        if setup:
+            setup(host)
+        with contextlib.redirect_stdout(console) if quiet else contextlib.nullcontext():
+            exec(code, host.namespace)
+    except StopEmulation:
+        pass
+    finally:
+        emulation.wallTime = time.perf_counter() - start
+        os.chdir(cwd)
+        host.uninstall(saved)
+    emulation.console = console.getvalue()
+    emulation.host = host
+    return emulation
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run code.py with emulated hardware and a virtual clock.')
+    parser.add_argument('--nights', type=int, default=1, help='number of nights to play (default 1)')
+    parser.add_argument('--seed', type=int, default=0, help='random seed (default 0)')
+    parser.add_argument('--poll-ms', type=int, default=20,
+                        help='virtual time added by each time.monotonic_ns() read (default 20)')
+    parser.add_argument('--max-seconds', type=int, default=3600, help='virtual time limit (default 3600)')
+    parser.add_argument('--verbose', action='store_true', help='show the console output of code.py')
+    parser.add_argument('--render', action='store_true', help='draw every refresh and report the changed pixels')
+    args = parser.parse_args()
+    emulation = run(nights=args.nights, seed=args.seed, pollMs=args.poll_ms, quiet=not args.verbose,
+                    maxSeconds=args.max_seconds, render=args.render)
+    print(f'Outcomes: {", ".join(emulation.outcomes)}')
+    print(f'Virtual time: {host.now / 1000000000:.1f} s, wall time: {emulation.wallTime:.3f} s')
+    print(f'Display refreshes: {host.refreshes}, audio clips played: {len(host.audioLog)}')
+    if args.render and host.frames:
+        areas = [sum(w * h for _, _, w, h in boxes) for _, boxes, _ in host.frames]
+        changed = [count for _, _, count in host.frames]
+        print(f'Changed pixels per refresh: mean {sum(changed) / len(changed):.0f}, max {max(changed)}; '
+              f'refreshed area: mean {sum(areas) / len(areas):.0f}, max {max(areas)} pixels '
+              f'in up to {max(len(boxes) for _, boxes, _ in host.frames)} boxes')
+        print(f'SPI pixel data: {sum(areas) * 2} bytes (RGB565) instead of {len(areas) * host.framebuffer.size * 2} for full frames')
+    if 'Timeout' in emulation.outcomes:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,244 @@
+'''
+Project Foobear: generate the main screen layout of code.py
+
+The main screen is a fixed grid of rooms with corridors, labels, cooldown bars
+and icons around it. This tool does all of that geometry once on the desktop -
+room rects, corridors, label positions from the glyph metrics of the PCF fonts,
+the anomaly icon position for every room - and writes the results as plain
+tuples to CIRCUITPY/layout.py, so that code.py only looks coordinates up.
+Run it again after changing the grid below, the room names or the fonts.
+
+    python tools/genlayout.py
+    python tools/genlayout.py --check   # exits with 1 if CIRCUITPY/layout.py is out of date
+'''
+
+import argparse
+import os
+import struct
+import sys
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+DEVICE_DIR = os.path.join(os.path.dirname(TOOLS_DIR), 'CIRCUITPY')
+LAYOUT_PATH = os.path.join(DEVICE_DIR, 'layout.py')
+FONT_DIR = os.path.join(os.path.dirname(TOOLS_DIR), 'fonts')  # the full fonts; CIRCUITPY/font has subsets
+
+sys.path.insert(0, DEVICE_DIR)
+
+from engine import ROOM_NAMES, TARGET_ROOM, AIR_VENT_ROOM, AUDIO_ROOM, WINDOW_ROOM
+
+ROOM_W = 65
+ROOM_H = 40
+ROOM_INTERVAL = 15
+LEFT_PAD = 25
+TOP_PAD = 75
+ICON_DEFAULT_X = -ROOM_INTERVAL * 2
+ICON_DEFAULT_Y = -ROOM_INTERVAL * 2
+BUTTON_LABEL_PADDING = 4
+SMALL_FONT = 'ter-u12b.pcf'
+LARGE_FONT = 'ter-u22b.pcf'
+ACTION_TEXTS = ('Action', 'Door', 'Audio', 'Zap')
+HOURS = 7
+
+
+# ===== fonts =====
+
+_PCF_ACCELERATORS = 1 << 1
+_PCF_METRICS = 1 << 2
+_PCF_BDF_ENCODINGS = 1 << 5
+_PCF_BDF_ACCELERATORS = 1 << 8
+_PCF_COMPRESSED_METRICS = 0x100
+
+
+class PCFMetrics:
+
+    # only the parts of a PCF file that adafruit_display_text needs to measure a label
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            data = self.data = f.read()
+        magic, count = struct.unpack_from('<4sI', data)
+        if magic != b'\x01fcp':
+            raise ValueError(f'{path} is not a PCF font')
+        tables = {}
+        for i in range(count):
+            kind, _, _, offset = struct.unpack_from('<IIII', data, 8 + 16 * i)
+            tables[kind] = offset
+        accelerators = tables.get(_PCF_BDF_ACCELERATORS, tables.get(_PCF_ACCELERATORS))
+        self.ascent, self.descent = struct.unpack_from('>II', data, accelerators + 12)
+        self.encodings = tables[_PCF_BDF_ENCODINGS]
+        self.metrics = tables[_PCF_METRICS]
+        (self.metricsFormat,) = struct.unpack_from('<I', data, self.metrics)
+
+    # (width, height, dx, dy, shift_x) like adafruit_bitmap_font's Glyph, or None if missing
+    def glyph(self, codePoint):
+        minByte2, maxByte2, minByte1, maxByte1 = struct.unpack_from('>hhhh', self.data, self.encodings + 4)
+        byte1, byte2 = codePoint >> 8, codePoint & 0xFF
+        if not (minByte1 <= byte1 <= maxByte1 and minByte2 <= byte2 <= maxByte2):
+            return None
+        entry = (byte1 - minByte1) * (maxByte2 - minByte2 + 1) + byte2 - minByte2
+        (index,) = struct.unpack_from('>H', self.data, self.encodings + 14 + 2 * entry)
+        if index == 0xFFFF:
+            return None
+        if self.metricsFormat & _PCF_COMPRESSED_METRICS:
+            values = struct.unpack_from('5B', self.data, self.metrics + 6 + 5 * index)
+            lsb, rsb, width, ascent, descent = (v - 0x80 for v in values)
+        else:
+            lsb, rsb, width, ascent, descent, _ = struct.unpack_from('>5hH', self.data, self.metrics + 8 + 12 * index)
+        return rsb - lsb, ascent + descent, lsb, -descent, width
+
+
+# (width, height) of a single line Label, as adafruit_display_text measures it left to right
+def labelSize(font, text):
+    yOffset = font.ascent // 2
+    x = right = top = bottom = 0
+    for character in text:
+        glyph = font.glyph(ord(character))
+        if glyph is None:
+            continue
+        width, height, dx, dy, shiftX = glyph
+        bottom = max(bottom, -dy + yOffset)
+        top = min(top, -height - dy + yOffset)
+        right = max(right, x + shiftX, x + width + dx)
+        x += shiftX
+    return right, bottom - top
+
+
+# ===== layout =====
+
+def centerX(rect, width):
+    return rect[0] + round(rect[2]/2 - width/2)
+
+
+def buildLayout(small, large):
+    rooms = []
+    for j in range(3):
+        for i in range(3):
+            rooms.append((LEFT_PAD + (ROOM_W + ROOM_INTERVAL) * i, TOP_PAD + (ROOM_H + ROOM_INTERVAL) * j, ROOM_W, ROOM_H))
+    window = rooms[WINDOW_ROOM]
+    rooms.append((window[0] + window[2] + round(ROOM_INTERVAL*1.5), window[1] + round(window[3]/4),
+                  round(ROOM_W/3), round(ROOM_H*1.5) + ROOM_INTERVAL))
+    vent = rooms[AIR_VENT_ROOM]
+    target = rooms[TARGET_ROOM]
+    audio = rooms[AUDIO_ROOM]
+    centers = [(x + round(w/2), y + round(h/2)) for x, y, w, h in rooms]
+
+    corridors = []
+    for i in (0, 1, 3, 4, 6, 7):
+        x, y, w, h = rooms[i]
+        corridors.append((x + w, y + round(h/2), x + w + ROOM_INTERVAL, y + round(h/2)))
+    for i in range(5):
+        x, y, w, h = rooms[i]
+        corridors.append((x + round(w/2), y + h, x + round(w/2), y + h + ROOM_INTERVAL))
+    for i in (5, 8):
+        x, y, w, h = rooms[i]
+        corridors.append((x + w, y + round(h/2), vent[0], y + round(h/2)))
+
+    roomLabels = []
+    for i, rect in enumerate(rooms):
+        width, _ = labelSize(small, ROOM_NAMES[i])
+        roomLabels.append((centerX(rect, width), rect[1] - 12 if i == AIR_VENT_ROOM else rect[1] + 6))
+
+    buttonY = rooms[0][1] - ROOM_INTERVAL*2
+    scanWidth, scanHeight = labelSize(large, 'Scan')
+    actionX = {text: centerX(rooms[2], labelSize(large, text)[0]) for text in ACTION_TEXTS}
+    hourX = tuple(centerX(rooms[1], labelSize(large, f'{hour} AM')[0]) for hour in range(HOURS))
+
+    radius = round(ROOM_INTERVAL/2)
+    markWidth, _ = labelSize(small, '!')
+    triBase = ROOM_INTERVAL
+    triH = round(triBase * (3 ** 0.5) / 2)
+    triCenToBase = round(triBase * (3 ** 0.5) / 6)
+    audioMidY = audio[1] + round(audio[3]/2)
+    ventMidY = vent[1] + round(vent[3]/2)
+    ventRight = vent[0] + vent[2]
+
+    return (
+        ('ROOM_W', ROOM_W, None),
+        ('ROOM_H', ROOM_H, None),
+        ('ROOM_INTERVAL', ROOM_INTERVAL, None),
+        ('ROOM_RECTS', tuple(rooms), '(x, y, width, height) by room'),
+        ('ROOM_CENTERS', tuple(centers), '(x, y) by room'),
+        ('ROOM_LABEL_POS', tuple(roomLabels), '(x, y) of the room name labels'),
+        ('CORRIDOR_LINES', tuple(corridors), '(x0, y0, x1, y1)'),
+        ('DOOR_RECT', (target[0] - round(ROOM_INTERVAL/4), target[1] + round(target[3]/8),
+                       round(ROOM_INTERVAL/2), round(target[3]*3/4)), None),
+        ('WINDOW_RECT', (target[0] + round(target[2]/8), target[1] - round(ROOM_INTERVAL*3/4),
+                         round(target[2]*3/4), round(ROOM_INTERVAL/2)), None),
+        ('BUTTON_LABEL_PADDING', BUTTON_LABEL_PADDING, None),
+        ('BUTTON_LABEL_Y', buttonY, None),
+        ('SCAN_LABEL_X', centerX(rooms[0], scanWidth), None),
+        ('ACTION_LABEL_X', actionX, 'by action button text'),
+        ('HOUR_LABEL_X', hourX, 'by hour'),
+        ('SCAN_BAR_RECT', (rooms[0][0] - ROOM_INTERVAL, round(buttonY - scanHeight/2),
+                           round(ROOM_INTERVAL/2), scanHeight), '(x, y, width, height) of the cooldown and power bars'),
+        ('AUDIO_BAR_RECT', (audio[0] - ROOM_INTERVAL, audio[1], round(ROOM_INTERVAL/2), ROOM_H), None),
+        ('ZAP_BAR_RECT', (ventRight + round(ROOM_INTERVAL/2), vent[1] + round(vent[3]/4),
+                          round(ROOM_INTERVAL/2), round(vent[3]/2)), None),
+        ('POWER_BAR_RECT', (target[0] + target[2] - round(ROOM_INTERVAL/2), target[1],
+                            round(ROOM_INTERVAL/2), target[3]), None),
+        ('ICON_DEFAULT_X', ICON_DEFAULT_X, 'hidden icons are moved off the screen'),
+        ('ICON_DEFAULT_Y', ICON_DEFAULT_Y, None),
+        ('ANOMALY_ICON_R', radius, None),
+        ('ANOMALY_LABEL_POS', tuple((x - round(markWidth/2), y) for x, y in centers),
+         "(x, y) of the '!' on the anomaly icon by room"),
+        ('ANOMALY_LABEL_HIDDEN_POS', (ICON_DEFAULT_X - radius, ICON_DEFAULT_Y - radius), None),
+        ('AUDIO_ICON_POINTS', (audio[0] - triCenToBase, audioMidY - round(triBase/2),
+                               audio[0] - triCenToBase, audioMidY + round(triBase/2),
+                               audio[0] + triCenToBase, audioMidY), '(x0, y0, x1, y1, x2, y2)'),
+        ('ZAP_ICON_POINTS', (ventRight + triCenToBase, ventMidY - round(triBase/2),
+                             ventRight + triCenToBase, ventMidY + round(triBase/2),
+                             ventRight - (triH - triCenToBase), ventMidY), None),
+    )
+
+
+# ===== output =====
+
+def formatValue(value):
+    if isinstance(value, dict):
+        return '{\n' + ''.join(f'    {k!r}: {v!r},\n' for k, v in value.items()) + '}'
+    if isinstance(value, tuple) and value and isinstance(value[0], tuple):
+        return '(\n' + ''.join(f'    {v!r},\n' for v in value) + ')'
+    return repr(value)
+
+
+def render(layout):
+    lines = [
+        "'''",
+        'Project Foobear: main screen layout',
+        '',
+        'Generated by tools/genlayout.py, do not edit: change the generator and run it again.',
+        "'''",
+        '',
+    ]
+    for name, value, comment in layout:
+        if comment:
+            lines.append('')
+            lines.append(f'# {comment}')
+        lines.append(f'{name} = {formatValue(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate CIRCUITPY/layout.py from the room grid and the fonts.')
+    parser.add_argument('--check', action='store_true', help='only report whether layout.py is up to date')
+    parser.add_argument('--out', default=LAYOUT_PATH, help='output file (default CIRCUITPY/layout.py)')
+    args = parser.parse_args()
+    small = PCFMetrics(os.path.join(FONT_DIR, SMALL_FONT))
+    large = PCFMetrics(os.path.join(FONT_DIR, LARGE_FONT))
+    source = render(buildLayout(small, large))
+    if args.check:
+        try:
+            with open(args.out) as f:
+                current = f.read()
+        except OSError:
+            current = None
+        if current != source:
+            raise SystemExit(f'{args.out} is out of date, run python tools/genlayout.py')
+        print(f'{args.out} is up to date')
+        return
+    with open(args.out, 'w') as f:
+        f.write(source)
+    print(f'{len(source)} bytes written to {args.out}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+'''
+Project Foobear: exact Markov chain of FooBear's movement
+
+With no player input FooBear's position only changes on Move() ticks, and the
+next (room, move mode) only depends on the current one and the AI level. This
+builds that 50x50 transition matrix for each hour's AI level and computes the
+exact distribution of the move on which FooBear reaches the control room,
+the survival probability of an idle night and, per AI level, the expected
+number of moves to reach the target (absorbing chain analysis).
+
+    python tools/markov.py
+    python tools/markov.py --check 1000000   # compare with tools/montecarlo.py
+'''
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'CIRCUITPY'))
+
+from engine import MOVE_MODES, MOVE_PERF, RESET_ROOMS, TARGET_ROOM, AUDIO_ROOM, DOOR_ROOM, WINDOW_ROOM, AIR_VENT_ROOM
+from montecarlo import NORMAL, DOOR, AIR_VENT, ESCAPE, LURE, ROOMS, getParams, simulate
+
+STATES = ROOMS * len(MOVE_MODES)
+TARGET_STATES = [mode * ROOMS + TARGET_ROOM for mode in range(len(MOVE_MODES))]
+TRANSIENT_STATES = [s for s in range(STATES) if s not in TARGET_STATES]
+
+
+def stateIndex(room, mode):
+    return mode * ROOMS + room
+
+
+# move modes after moveModeChange() with the power on, as (mode, probability)
+def modeChange(mode, room, p):
+    if (mode == LURE and room == AUDIO_ROOM) or (mode == ESCAPE and room in RESET_ROOMS):
+        reset = p['MOVE_MODE_RESET_CHANCE'] / 100
+        return ((NORMAL, reset), (mode, 1 - reset))
+    if mode == NORMAL and room not in (WINDOW_ROOM, DOOR_ROOM, AIR_VENT_ROOM):
+        active = p['MOVE_MODE_MORE_ACTIVE_CHANCE'] / 100
+        return ((DOOR, active / 2), (AIR_VENT, active / 2), (NORMAL, 1 - active))
+    return ((mode, 1.0),)
+
+
+def transitionMatrix(ai, p):
+    matrix = np.zeros((STATES, STATES))
+    move = min(100, max(0, ai)) / 100
+    for mode in range(len(MOVE_MODES)):
+        for room in range(ROOMS):
+            s = stateIndex(room, mode)
+            if room == TARGET_ROOM:
+                matrix[s, s] = 1.0
+                continue
+            matrix[s, s] += 1 - move
+            for newMode, prob in modeChange(mode, room, p):
+                exits = MOVE_PERF[MOVE_MODES[newMode]][room]
+                if not exits:
+                    matrix[s, stateIndex(room, newMode)] += move * prob
+                for newRoom in exits:
+                    matrix[s, stateIndex(newRoom, newMode)] += move * prob / len(exits)
+    return matrix
+
+
+def startDistribution():
+    v = np.zeros(STATES)
+    for room in RESET_ROOMS:
+        v[stateIndex(room, NORMAL)] = 1 / len(RESET_ROOMS)
+    return v
+
+
+def aiLevels(p):
+    step = round((p['AI_FINAL_LEVEL'] - p['AI_START_LEVEL']) / 5)
+    ai = max(0, p['AI_START_LEVEL'] + (p['AI_FINAL_LEVEL'] - p['AI_START_LEVEL'] - step * 5))
+    return [min(100, ai + step * hour) for hour in range(6)]
+
+
+# ===== solvers =====
+
+class Night:
+
+    def __init__(self, params=None):
+        self.p = p = getParams(params)
+        self.movePeriod = p['MOVE_INTERVAL'] + 1
+        self.hourPeriod = p['HOUR_INTERVAL'] + 1
+        self.moveTicks = list(range(self.movePeriod, 6 * self.hourPeriod, self.movePeriod))
+        self.levels = aiLevels(p)
+        self.matrices = [transitionMatrix(ai, p) for ai in self.levels]
+        # arrival[j]: probability of reaching the control room on move j (tick moveTicks[j])
+        v = startDistribution()
+        reached = 0.0
+        self.arrival = np.zeros(len(self.moveTicks))
+        for j, tick in enumerate(self.moveTicks):
+            v = v @ self.matrices[tick // self.hourPeriod]
+            total = v[TARGET_STATES].sum()
+            self.arrival[j] = total - reached
+            reached = total
+        self.final = v
+
+    # FooBear kills on the move after it arrives, if that move is still before 6 AM
+    @property
+    def deathProbability(self):
+        return self.arrival[:-1].sum()
+
+    @property
+    def survivalProbability(self):
+        return 1 - self.deathProbability
+
+    def deathTickDistribution(self):
+        return {self.moveTicks[j+1]: prob for j, prob in enumerate(self.arrival[:-1])}
+
+    def deathHours(self):
+        hours = np.zeros(6)
+        for tick, prob in self.deathTickDistribution().items():
+            hours[tick // self.hourPeriod] += prob
+        return hours
+
+    def meanDeathTick(self):
+        distribution = self.deathTickDistribution()
+        return sum(tick * prob for tick, prob in distribution.items()) / max(self.deathProbability, 1e-300)
+
+
+# expected moves until the control room is reached with a fixed AI level
+def expectedMoves(ai, p, start=None):
+    matrix = transitionMatrix(ai, p)
+    q = matrix[np.ix_(TRANSIENT_STATES, TRANSIENT_STATES)]
+    try:
+        steps = np.linalg.solve(np.eye(len(TRANSIENT_STATES)) - q, np.ones(len(TRANSIENT_STATES)))
+    except np.linalg.LinAlgError:
+        return float('inf')
+    v = (startDistribution() if start is None else start)[TRANSIENT_STATES]
+    return float(v @ steps / v.sum())
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Exact time-to-target distribution of an idle night.')
+    parser.add_argument('--check', type=int, default=0, metavar='N',
+                        help='compare with N idle nights of tools/montecarlo.py')
+    parser.add_argument('--seed', type=int, default=0, help='random seed for --check (default 0)')
+    args = parser.parse_args()
+    start = time.perf_counter()
+    night = Night()
+    moves = [expectedMoves(ai, night.p) for ai in night.levels]
+    elapsed = time.perf_counter() - start
+    print(f'Solved in {elapsed * 1000:.1f} ms')
+    print('hour  AI  P(death in hour)  expected moves to target (from start)')
+    for hour, (ai, prob, expected) in enumerate(zip(night.levels, night.deathHours(), moves)):
+        print(f'{hour:>4} {ai:>3}  {prob:>16.6f}  {expected:>10.2f} ({expected * night.movePeriod / 10:.0f} s)')
+    print(f'Idle survival probability: {night.survivalProbability:.6g}')
+    print(f'Mean death tick: {night.meanDeathTick():.1f}')
+    if args.check:
+        result = simulate(args.check, 'idle', args.seed)
+        sampled = result.deathHours / result.nights
+        exact = night.deathHours()
+        error = np.abs(sampled - exact)
+        bound = 4 * np.sqrt(np.maximum(exact * (1 - exact), 1e-12) / result.nights)
+        print(f'Monte Carlo deaths per hour: {np.round(sampled, 6).tolist()}')
+        print(f'Exact deaths per hour:       {np.round(exact, 6).tolist()}')
+        print(f'Survival: Monte Carlo {result.survivalRate:.6f}, exact {night.survivalProbability:.6g}')
+        print('Monte Carlo agrees with the exact solution' if (error <= bound + 1e-9).all()
+              else 'Monte Carlo differs from the exact solution by more than 4 standard errors')
+
+
+if __name__ == '__main__':
+    main()
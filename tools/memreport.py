@@ -0,0 +1,185 @@
+'''
+Project Foobear: read the memory reports of code.py and plot their trend
+
+At the end of every night code.py prints one "Memory phase:" line per phase of
+the night (title, hour0 to hour5, powerOut, end) with the lowest free heap seen
+in it and the largest free block, then a "Memory night:" line with the heap
+left once the end screen is gone. Typing mem in the serial console prints the
+phase lines of the running night. Save the console output of a session with
+several nights played in a row, then:
+
+    python tools/memreport.py session.log                        # phase table and night trend
+    python tools/memreport.py session.log --csv memory.csv --plot memory.png
+    python tools/memreport.py session.log --max-leak 256
+
+The heap left after each night should stay flat: --max-leak exits with 1 if it
+shrinks by more than that many bytes per night (least squares slope), so a
+soak test can catch objects kept from one `while True` loop to the next.
+Fragmentation is 1 - largest free block / free heap, at the phase's smallest
+largest block; the block is only probed when a phase ends on a screen change
+(title, power out, end) or on mem, so the hours that end on an hour change
+show (-). --plot needs matplotlib.
+'''
+
+import argparse
+import csv
+import sys
+
+from bootreport import parseFields
+
+PHASE_PREFIX = 'Memory phase: '
+NIGHT_PREFIX = 'Memory night: '
+PHASES = ('title', 'hour0', 'hour1', 'hour2', 'hour3', 'hour4', 'hour5', 'powerOut', 'end')
+BAR_WIDTH = 40
+
+
+# every night in log order as {'phases': {name: {'minFree', 'largestBlock', 'free', 'samples'}}, 'night': {...}};
+# the night is None for a night still running when the log ends (phases from a mem command)
+def parseNights(lines):
+    nights = []
+    current = {'phases': {}, 'night': None}
+    for line in lines:
+        line = line.strip()
+        if PHASE_PREFIX in line:
+            fields = parseFields(line.split(PHASE_PREFIX, 1)[1])
+            del fields['night']
+            current['phases'][fields.pop('name')] = fields  # a later dump of the same phase is more complete
+        elif NIGHT_PREFIX in line:
+            current['night'] = parseFields(line.split(NIGHT_PREFIX, 1)[1])
+            nights.append(current)
+            current = {'phases': {}, 'night': None}
+    if current['phases']:
+        nights.append(current)
+    return nights
+
+
+# None for a phase whose largest free block was not probed (it ended on an hour change)
+def fragmentation(fields):
+    if 'largestBlock' not in fields:
+        return None
+    return 1 - fields['largestBlock'] / fields['free'] if fields['free'] else 0.0
+
+
+# bytes of heap lost per night, from a least squares line through the heap left after each night
+def leakPerNight(nights):
+    values = [night['night']['free'] for night in nights if night['night']]
+    if len(values) < 2:
+        return 0.0
+    meanX = (len(values) - 1) / 2
+    meanY = sum(values) / len(values)
+    slope = (sum((x - meanX) * (y - meanY) for x, y in enumerate(values))
+             / sum((x - meanX) ** 2 for x in range(len(values))))
+    return -slope
+
+
+def phaseNames(nights):
+    seen = {name for night in nights for name in night['phases']}
+    return [name for name in PHASES if name in seen] + sorted(seen.difference(PHASES))
+
+
+def printPhaseTable(nights):
+    names = phaseNames(nights)
+    print('Lowest free heap by phase (bytes; worst fragmentation in brackets):')
+    print(f'{"phase":>10}' + ''.join(f'  {f"night {i + 1}":>16}' for i in range(len(nights))))
+    for name in names:
+        row = f'{name:>10}'
+        for night in nights:
+            fields = night['phases'].get(name)
+            if fields is None:
+                row += f'  {"-":>16}'
+            elif fragmentation(fields) is None:
+                row += f'  {fields["minFree"]:>9} {"(-)":>6}'
+            else:
+                row += f'  {fields["minFree"]:>9} ({fragmentation(fields):>4.0%})'
+        print(row)
+
+
+def printTrend(nights):
+    done = [night['night'] for night in nights if night['night']]
+    if not done:
+        print('No night finished yet')
+        return
+    print('Heap left after each night:')
+    low = min(night['free'] for night in done)
+    high = max(night['free'] for night in done)
+    first = done[0]['free']
+    for i, night in enumerate(done):
+        width = BAR_WIDTH if high == low else 1 + round((night['free'] - low) / (high - low) * (BAR_WIDTH - 1))
+        print(f'  night {i + 1:>3}  {night["free"]:>7}  {night["free"] - first:>+7}  '
+              f'largest {night["largestBlock"]:>7}  {"#" * width}')
+
+
+def writeCsv(path, nights):
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(('night', 'phase', 'minFree', 'largestBlock', 'free', 'fragmentation', 'samples'))
+        for i, night in enumerate(nights):
+            for name in phaseNames([night]):
+                fields = night['phases'][name]
+                share = fragmentation(fields)
+                writer.writerow((i + 1, name, fields['minFree'], fields.get('largestBlock', ''), fields.get('free', ''),
+                                 '' if share is None else f'{share:.4f}', fields['samples']))
+            if night['night']:
+                fields = night['night']
+                writer.writerow((i + 1, 'night', fields['free'], fields['largestBlock'], fields['free'],
+                                 f'{fragmentation(fields):.4f}', ''))
+
+
+def plot(path, nights):
+    try:
+        import matplotlib
+        matplotlib.use('Agg')
+        import matplotlib.pyplot as plt
+    except ImportError:
+        raise SystemExit('--plot needs matplotlib (pip install matplotlib)')
+    figure, (heap, blocks) = plt.subplots(2, 1, sharex=True, figsize=(8, 6))
+    numbers = range(1, len(nights) + 1)
+    for name in phaseNames(nights):
+        values = [night['phases'][name]['minFree'] if name in night['phases'] else None for night in nights]
+        heap.plot(numbers, [float('nan') if v is None else v for v in values], marker='.', label=name)
+    left = [night['night']['free'] if night['night'] else float('nan') for night in nights]
+    largest = [night['night']['largestBlock'] if night['night'] else float('nan') for night in nights]
+    heap.plot(numbers, left, 'k-', linewidth=2, label='after night')
+    heap.set_ylabel('lowest free heap (bytes)')
+    heap.legend(fontsize='small', ncol=3)
+    blocks.plot(numbers, left, 'k-', label='free heap')
+    blocks.plot(numbers, largest, 'r-', label='largest free block')
+    blocks.set_ylabel('after night (bytes)')
+    blocks.set_xlabel('night')
+    blocks.legend(fontsize='small')
+    figure.tight_layout()
+    figure.savefig(path)
+    print(f'Plot written to {path}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Show the memory reports of code.py and their trend over nights.')
+    parser.add_argument('logs', nargs='+', help='serial console logs, read in order as one session')
+    parser.add_argument('--csv', help='also write every phase of every night to this CSV file')
+    parser.add_argument('--plot', help='also plot the trend to this image file (needs matplotlib)')
+    parser.add_argument('--max-leak', type=float, help='fail if the heap left shrinks by more than this per night')
+    args = parser.parse_args()
+    lines = []
+    for path in args.logs:
+        with open(path, errors='replace') as f:
+            lines.extend(f)
+    nights = parseNights(lines)
+    if not nights:
+        raise SystemExit('no memory report found')
+    printPhaseTable(nights)
+    print()
+    printTrend(nights)
+    leak = leakPerNight(nights)
+    print(f'Trend: {leak:+.1f} bytes lost per night')
+    if args.csv:
+        writeCsv(args.csv, nights)
+        print(f'CSV written to {args.csv}')
+    if args.plot:
+        plot(args.plot, nights)
+    if args.max_leak is not None and leak > args.max_leak:
+        print(f'Regression: the heap shrinks by {leak:.1f} bytes per night (limit {args.max_leak} bytes)')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,302 @@
+'''
+Project Foobear: vectorized Monte Carlo of FooBear's movement
+
+Runs many independent nights at once as NumPy arrays (anomaly room, move mode,
+power, door, power-out and cooldown timers), one vectorized step per Move()
+tick. Between two moves nothing but the power monitor changes the state, so the
+power of all nights is advanced in closed form instead of tick by tick.
+
+With the 'idle' player (nobody touches anything) the model follows engine.py
+exactly. The 'oracle' player knows where FooBear is and acts right after each
+move (door, zap, lure); its actions take effect at the move tick instead of a
+couple of ticks later, which is close enough for balance work. Nobody scans
+and no sounds are played, so SCAN_COOLDOWN, SCAN_POWER_CHANGE_LEVEL and
+LAUGH_INTERVAL cannot be changed here.
+
+    python tools/montecarlo.py --nights 1000000 --policy oracle
+'''
+
+import argparse
+import math
+import os
+import sys
+import time
+
+import numpy as np
+
+DEVICE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'CIRCUITPY')
+sys.path.insert(0, DEVICE_DIR)
+
+from engine import (Engine, MOVE_MODES, MOVE_PERF, RESET_ROOMS, TARGET_ROOM, AIR_VENT_ROOM, AUDIO_ROOM,
+                    DOOR_ROOM, WINDOW_ROOM, WALK_SOUND_ROOMS, GAME_PARAMETERS)
+
+
+# ===== tables =====
+
+NORMAL, DOOR, AIR_VENT, ESCAPE, LURE = range(len(MOVE_MODES))
+ROOMS = 10
+POWER_MONITOR_PERIOD = 11  # PowerMonitor is a continuous timer with interval 10
+
+ONGOING, DIED, SURVIVED = range(3)
+CAUSES = ('door', 'air vent', 'power out')
+CAUSE_NONE, CAUSE_DOOR, CAUSE_AIR_VENT, CAUSE_POWER_OUT = range(4)
+
+MAX_EXITS = max(len(rooms) for perf in MOVE_PERF.values() for rooms in perf.values())
+EXIT_COUNT = np.zeros((len(MOVE_MODES), ROOMS), dtype=np.int64)
+EXITS = np.zeros((len(MOVE_MODES), ROOMS, MAX_EXITS), dtype=np.int8)
+for _mode, _name in enumerate(MOVE_MODES):
+    for _room, _exits in MOVE_PERF[_name].items():
+        EXIT_COUNT[_mode, _room] = len(_exits)
+        EXITS[_mode, _room, :len(_exits)] = _exits
+
+
+# game parameters the model leaves out: its players see FooBear and never scan, and it plays no sounds
+UNMODELED_PARAMETERS = ('SCAN_COOLDOWN', 'SCAN_POWER_CHANGE_LEVEL', 'LAUGH_INTERVAL')
+
+
+def getParams(params=None):
+    values = {name: getattr(Engine, name) for name in GAME_PARAMETERS}
+    for name, value in (params or {}).items():
+        if name not in values:
+            raise KeyError(f'unknown game parameter: {name}')
+        if name in UNMODELED_PARAMETERS:
+            raise KeyError(f'{name} is not simulated by the model (its players never scan and hear no sounds)')
+        values[name] = value
+    return values
+
+
+# ===== nights =====
+
+class Nights:
+
+    def __init__(self, n, rng, p):
+        self.n = n
+        self.room = np.asarray(RESET_ROOMS, dtype=np.int8)[rng.integers(0, len(RESET_ROOMS), n)]
+        self.mode = np.full(n, NORMAL, dtype=np.int8)
+        self.status = np.full(n, ONGOING, dtype=np.int8)
+        self.cause = np.full(n, CAUSE_NONE, dtype=np.int8)
+        self.deathTick = np.zeros(n, dtype=np.int32)
+        self.power = np.zeros(n, dtype=np.int32)
+        self.doorClosed = np.zeros(n, dtype=bool)
+        self.powerOut = np.zeros(n, dtype=bool)
+        self.powerOutUntil = np.zeros(n, dtype=np.int32)
+        self.powerOuts = np.zeros(n, dtype=np.int16)
+        self.zapReady = np.zeros(n, dtype=np.int32)
+        self.audioReady = np.zeros(n, dtype=np.int32)
+
+
+def pick(rng, mask, choices):
+    return np.asarray(choices, dtype=np.int8)[rng.integers(0, len(choices), int(mask.sum()))]
+
+
+def advancePower(s, rng, tPrev, t, p):
+    # power reboots finishing in this interval
+    rebooted = s.powerOut & (s.powerOutUntil <= t)
+    s.powerOut[rebooted] = False
+    start = np.where(rebooted, s.powerOutUntil, tPrev)
+    monitors = t // POWER_MONITOR_PERIOD - start // POWER_MONITOR_PERIOD
+    monitors[s.powerOut] = 0
+    step = p['DOOR_POWER_CHANGE_LEVEL']
+    limit = p['POWER_LIMIT']
+    live = (s.status == ONGOING) & (monitors > 0)
+    # door closed: power rises by one step per monitor tick until it hits the limit
+    closed = live & s.doorClosed
+    needed = np.maximum(1, -((s.power - limit) // step))
+    overClosed = closed & (needed <= monitors)
+    s.power = np.where(closed, np.minimum(limit, s.power + step * monitors), s.power)
+    # door open: only an action spend above the limit can overload the first monitor tick
+    opened = live & ~s.doorClosed
+    overOpen = opened & (s.power - step >= limit)
+    s.power = np.where(opened, np.maximum(0, s.power - step * monitors), s.power)
+    over = overClosed | overOpen
+    if over.any():
+        firstMonitor = (start // POWER_MONITOR_PERIOD + np.where(overClosed, needed, 1)) * POWER_MONITOR_PERIOD
+        s.powerOut[over] = True
+        s.powerOuts[over] += 1
+        s.powerOutUntil[over] = firstMonitor[over] + p['POWER_REBOOT_INTERNAL']
+        s.power[over] = 0
+        s.doorClosed[over] = False
+        calm = over & ((s.mode != DOOR) & (s.mode != AIR_VENT))
+        s.mode[calm] = pick(rng, calm, (DOOR, AIR_VENT))
+        # a reboot shorter than the move interval is over before the next move
+        done = over & (s.powerOutUntil <= t)
+        s.powerOut[done] = False
+
+
+def move(s, rng, t, ai, p):
+    ongoing = s.status == ONGOING
+    arrived = ongoing & (s.room == TARGET_ROOM)
+    s.status[arrived] = DIED
+    s.deathTick[arrived] = t
+    active = ongoing & ~arrived
+    room, mode = s.room, s.mode
+    forced = s.powerOut & ((mode == ESCAPE) | (mode == LURE)) & ((room == DOOR_ROOM) | (room == AIR_VENT_ROOM))
+    active &= forced | (rng.integers(1, 101, s.n) <= ai)
+    # moveModeChange()
+    roll = rng.integers(1, 101, s.n)
+    hunt = active & s.powerOut & ((mode == NORMAL) | (mode == LURE) | (mode == ESCAPE))
+    calm = active & ~hunt & (((mode == LURE) & (room == AUDIO_ROOM))
+                             | ((mode == ESCAPE) & np.isin(room, RESET_ROOMS))) \
+        & (roll <= p['MOVE_MODE_RESET_CHANCE'])
+    hunt |= active & (mode == NORMAL) & (room != WINDOW_ROOM) & (room != DOOR_ROOM) & (room != AIR_VENT_ROOM) \
+        & (roll <= p['MOVE_MODE_MORE_ACTIVE_CHANCE'])
+    mode[calm] = NORMAL
+    mode[hunt] = pick(rng, hunt, (DOOR, AIR_VENT))
+    # pick the next room
+    count = EXIT_COUNT[mode, room]
+    active &= count > 0
+    index = (rng.random(s.n) * count).astype(np.int64)
+    newRoom = EXITS[mode, room, np.minimum(index, MAX_EXITS-1)]
+    blocked = active & (mode == DOOR) & (room == DOOR_ROOM) & (newRoom == TARGET_ROOM) & s.doorClosed
+    mode[blocked] = pick(rng, blocked, (NORMAL, AIR_VENT, ESCAPE))
+    moved = active & ~blocked
+    entered = moved & (newRoom == TARGET_ROOM)
+    s.cause[entered] = np.where(s.powerOut[entered], CAUSE_POWER_OUT,
+                                np.where(room[entered] == DOOR_ROOM, CAUSE_DOOR, CAUSE_AIR_VENT))
+    room[moved] = newRoom[moved]
+
+
+# ===== player policies =====
+
+def idle(s, rng, t, p):
+    pass
+
+
+# knows where FooBear is and reacts right after every move
+def oracle(s, rng, t, p):
+    canAct = (s.status == ONGOING) & ~s.powerOut & (s.room != TARGET_ROOM)
+    room, mode = s.room, s.mode
+    wantClosed = (room == DOOR_ROOM) & (mode == DOOR)
+    s.doorClosed[canAct] = wantClosed[canAct]
+    zap = canAct & (room == AIR_VENT_ROOM) & (s.zapReady <= t)
+    room[zap] = WINDOW_ROOM
+    mode[zap] = pick(rng, zap, (ESCAPE, DOOR))
+    s.power[zap] += p['ZAP_POWER_CHANGE_LEVEL']
+    s.zapReady[zap] = t + 10 + p['ZAP_COOLDOWN']
+    lure = canAct & ~zap & ((mode == DOOR) | (mode == AIR_VENT)) & np.isin(room, WALK_SOUND_ROOMS) \
+        & (room != DOOR_ROOM) & (s.audioReady <= t)
+    lured = lure & (rng.integers(1, 101, s.n) <= p['LURED_CHANCE'])
+    mode[lured] = LURE
+    s.power[lure] += p['AUDIO_POWER_CHANGE_LEVEL']
+    s.audioReady[lure] = t + 10 + p['AUDIO_COOLDOWN']
+
+
+POLICIES = {
+    'idle': idle,
+    'oracle': oracle,
+}
+
+
+# ===== simulation =====
+
+class Result:
+
+    def __init__(self):
+        self.nights = 0
+        self.survived = 0
+        self.causes = np.zeros(len(CAUSES) + 1, dtype=np.int64)
+        self.deathHours = np.zeros(6, dtype=np.int64)
+        self.powerOuts = 0
+
+    def add(self, s, p):
+        self.nights += s.n
+        self.survived += int((s.status != DIED).sum())
+        self.causes += np.bincount(s.cause, minlength=len(CAUSES) + 1)
+        died = s.status == DIED
+        self.deathHours += np.bincount(s.deathTick[died] // (p['HOUR_INTERVAL'] + 1), minlength=6)[:6]
+        self.powerOuts += int(s.powerOuts.sum())
+
+    @property
+    def survivalRate(self):
+        return self.survived / self.nights if self.nights else 0.0
+
+    # Wilson score interval
+    def confidence(self, z=1.96):
+        n, rate = self.nights, self.survivalRate
+        if n == 0:
+            return 0.0, 0.0
+        center = (rate + z * z / (2 * n)) / (1 + z * z / n)
+        half = z * math.sqrt(rate * (1 - rate) / n + z * z / (4 * n * n)) / (1 + z * z / n)
+        return center - half, center + half
+
+    def deathCauses(self):
+        return {name: int(self.causes[i+1]) for i, name in enumerate(CAUSES)}
+
+
+def simulateChunk(n, rng, p, policy):
+    s = Nights(n, rng, p)
+    movePeriod = p['MOVE_INTERVAL'] + 1
+    hourPeriod = p['HOUR_INTERVAL'] + 1
+    nightEnd = 6 * hourPeriod
+    aiStep = round((p['AI_FINAL_LEVEL'] - p['AI_START_LEVEL']) / 5)
+    ai = max(0, p['AI_START_LEVEL'] + (p['AI_FINAL_LEVEL'] - p['AI_START_LEVEL'] - aiStep * 5))
+    tPrev = 0
+    for t in range(movePeriod, nightEnd, movePeriod):
+        advancePower(s, rng, tPrev, t, p)
+        level = min(100, ai + aiStep * (t // hourPeriod))
+        move(s, rng, t, level, p)
+        policy(s, rng, t, p)
+        tPrev = t
+    s.status[s.status == ONGOING] = SURVIVED
+    return s
+
+
+def simulate(nights, policy='idle', seed=0, params=None, chunk=100000):
+    p = getParams(params)
+    rng = np.random.default_rng(seed)
+    result = Result()
+    done = 0
+    while done < nights:
+        n = min(chunk, nights - done)
+        result.add(simulateChunk(n, rng, p, POLICIES[policy]), p)
+        done += n
+    return result
+
+
+# ===== cross-check against engine.py =====
+
+def simulateEngine(nights, seed=0, params=None):
+    engine = Engine(seed=seed + 1, params=params)
+    survived = 0
+    deathTicks = []
+    for i in range(nights):
+        engine.seed(seed * 1000003 + i + 1)
+        engine.reset()
+        if engine.run() == 'Survived':
+            survived += 1
+        else:
+            deathTicks.append(engine.tick)
+    return survived / nights, np.asarray(deathTicks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Vectorized Monte Carlo of FooBear nights.')
+    parser.add_argument('--nights', type=int, default=1000000, help='number of nights (default 1000000)')
+    parser.add_argument('--policy', choices=sorted(POLICIES), default='idle', help='player policy (default idle)')
+    parser.add_argument('--seed', type=int, default=0, help='random seed (default 0)')
+    parser.add_argument('--chunk', type=int, default=100000, help='nights per vectorized batch (default 100000)')
+    parser.add_argument('--check', type=int, default=0, metavar='N',
+                        help='also run N idle nights on engine.py and compare death times and survival')
+    args = parser.parse_args()
+    start = time.perf_counter()
+    result = simulate(args.nights, args.policy, args.seed, chunk=args.chunk)
+    elapsed = time.perf_counter() - start
+    low, high = result.confidence()
+    print(f'{result.nights} nights ({args.policy}) in {elapsed:.2f} s, {result.nights / elapsed * 60:,.0f} nights/min')
+    print(f'Survival rate: {result.survivalRate:.4f} (95% CI {low:.4f}-{high:.4f})')
+    print(f'Death causes: {result.deathCauses()}')
+    print(f'Deaths per hour: {result.deathHours.tolist()}, power outs: {result.powerOuts}')
+    if args.check:
+        if args.policy != 'idle':
+            print('--check compares the idle policy only')
+        checked = simulateChunk(args.check * 10, np.random.default_rng(args.seed), getParams(), idle)
+        ticks = checked.deathTick[checked.status == DIED]
+        rate, engineTicks = simulateEngine(args.check, args.seed)
+        for name, sample in (('montecarlo', ticks), ('engine.py', engineTicks)):
+            error = 1.96 * sample.std() / math.sqrt(len(sample)) if len(sample) else 0.0
+            mean = sample.mean() if len(sample) else 0.0
+            print(f'{name}: mean death tick {mean:.1f} (+/- {error:.1f})')
+        print(f'engine.py survival rate over {args.check} nights: {rate:.4f}')
+
+if __name__ == '__main__':
+    main()
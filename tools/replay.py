@@ -0,0 +1,159 @@
+'''
+Project Foobear: replay recorded nights on the engine
+
+With TRACE_NIGHTS on, code.py prints a "Trace:" line at the end of every
+night: the random state the night started from, every key press with its tick
+and a digest of FooBear's moves and the power values. Replaying a trace on
+engine.py gives the same night at full CPU speed, so a death on the device can
+be reproduced (and stepped through) on a desktop. Save the console output to a
+file and:
+
+    python tools/replay.py session.log                 # replay and check every trace
+    python tools/replay.py session.log --repeat 200    # time the replays
+    python tools/replay.py --record 100 --bot door-camper --out traces.txt
+
+A replay that ends with another outcome, tick count or digest than its
+recording exits with 1, so a file of traces is a regression test for the tick
+code; --record makes one from bot nights. A key held down is recorded as one
+run, and a night with more than TRACE_MAX_RUNS runs is flagged as truncated
+and skipped. Traces recorded with the learned move policy are replayed with
+--policy (default CIRCUITPY/movepolicy.bin); they carry a checksum of their
+table, and one recorded with another table is skipped instead of reported as
+a mismatch.
+'''
+
+import argparse
+import os
+import sys
+import time
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+DEVICE_DIR = os.path.join(os.path.dirname(TOOLS_DIR), 'CIRCUITPY')
+POLICY_PATH = os.path.join(DEVICE_DIR, 'movepolicy.bin')
+TICKS_PER_SECOND = 10
+
+sys.path.insert(0, DEVICE_DIR)
+
+from engine import (Engine, Trace, TRACE_PREFIX, TRACE_ALWAYS_SHOWN, TRACE_NOT_MOVING, TRACE_MOVE_POLICY,
+                    TRACE_TRUNCATED, movePolicyHash)
+from bots import BOTS, Observation
+
+
+def loadTraces(paths):
+    traces = []
+    for path in paths:
+        with open(path, errors='replace') as f:
+            traces.extend(Trace.parse(line.strip()) for line in f if TRACE_PREFIX in line)
+    return traces
+
+
+def loadPolicy(path):
+    try:
+        with open(path, 'rb') as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+# an engine set up like the one that recorded the trace
+def makeEngine(trace, policy):
+    if trace.flags & TRACE_MOVE_POLICY and policy is None:
+        raise SystemExit('the trace was recorded with a learned move policy, pass it with --policy')
+    return Engine(alwaysShown=bool(trace.flags & TRACE_ALWAYS_SHOWN), notMoving=bool(trace.flags & TRACE_NOT_MOVING),
+                  movePolicy=policy if trace.flags & TRACE_MOVE_POLICY else None)
+
+
+# ===== recording =====
+
+def recordBotNights(name, nights, seed=0, policy=None):
+    engine = Engine(movePolicy=policy)
+    bot = BOTS[name]()
+    obs = Observation()
+    trace = Trace()
+    for i in range(nights):
+        engine.seed(seed * 1000003 + i + 1)
+        trace.start(engine)
+        engine.reset()
+        bot.reset()
+        obs.reset()
+        key = None
+        while engine.gameStatus == 'Ongoing':
+            events = engine.step(key)
+            trace.record(engine.tick, key, events)
+            obs.update(engine, events)
+            key = bot.act(obs)
+        trace.finish(engine)
+        yield trace
+
+
+# ===== replay =====
+
+def replayAll(traces, policy, repeat=1):
+    print(f'{"#":>4}  {"seed":>10}  {"recorded":>14}  {"replayed":>14}  {"keys":>5}  {"ms":>7}  {"x real time":>11}  check')
+    failures = 0
+    policyHash = movePolicyHash(policy) if policy is not None else None
+    totalTicks = 0
+    totalSeconds = 0.0
+    for i, trace in enumerate(traces):
+        if trace.flags & TRACE_TRUNCATED:
+            print(f'{i + 1:>4}  {trace.seed:>10}  {trace.status:>8} {trace.endTick:>5}  skipped, the key runs were truncated')
+            continue
+        # traces from before the checksum have policy 0 and are replayed with whatever --policy is
+        if trace.flags & TRACE_MOVE_POLICY and trace.policy and policyHash is not None and trace.policy != policyHash:
+            print(f'{i + 1:>4}  {trace.seed:>10}  {trace.status:>8} {trace.endTick:>5}  skipped, recorded with move '
+                  f'policy {trace.policy:06x}, --policy is {policyHash:06x}')
+            continue
+        engine = makeEngine(trace, policy)
+        result = Trace()
+        start = time.perf_counter()
+        for _ in range(repeat):
+            trace.replay(engine, result)
+        seconds = (time.perf_counter() - start) / repeat
+        match = trace.matches(result)
+        failures += not match
+        totalTicks += result.endTick
+        totalSeconds += seconds
+        speedup = result.endTick / TICKS_PER_SECOND / seconds if seconds else 0
+        print(f'{i + 1:>4}  {trace.seed:>10}  {trace.status:>8} {trace.endTick:>5}  {result.status:>8} {result.endTick:>5}  '
+              f'{len(trace.ticks):>5}  {seconds * 1000:>7.2f}  {speedup:>11.0f}  {"ok" if match else "MISMATCH"}')
+        if not match:
+            print(f'      recorded moves={trace.moves} digest={trace.digest:06x}, '
+                  f'replayed moves={result.moves} digest={result.digest:06x}')
+    if totalSeconds:
+        print(f'Replayed {len(traces)} nights, {totalTicks} ticks: {totalTicks / totalSeconds:.0f} ticks/s, '
+              f'{totalTicks / TICKS_PER_SECOND / totalSeconds:.0f}x real time')
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay the night traces printed by code.py, or record bot nights.')
+    parser.add_argument('logs', nargs='*', help='console logs or trace files')
+    parser.add_argument('--policy', default=POLICY_PATH, help='learned move policy (default CIRCUITPY/movepolicy.bin)')
+    parser.add_argument('--repeat', type=int, default=1, help='replay each trace this many times for timing (default 1)')
+    parser.add_argument('--record', type=int, metavar='NIGHTS', help='record this many bot nights instead')
+    parser.add_argument('--bot', choices=sorted(BOTS), default='scan-7-and-9', help='bot to record (default scan-7-and-9)')
+    parser.add_argument('--seed', type=int, default=0, help='random seed of the recorded nights (default 0)')
+    parser.add_argument('--out', help='write the recorded traces to this file (default: print them)')
+    args = parser.parse_args()
+    policy = loadPolicy(args.policy)
+    if args.record:
+        out = open(args.out, 'w') if args.out else sys.stdout
+        for trace in recordBotNights(args.bot, args.record, args.seed, policy):
+            trace.write(out.write)
+        if args.out:
+            out.close()
+            print(f'{args.record} traces written to {args.out}')
+        return
+    if not args.logs:
+        parser.error('expected a log to replay, or --record')
+    traces = loadTraces(args.logs)
+    if not traces:
+        raise SystemExit('no trace found')
+    failures = replayAll(traces, policy, args.repeat)
+    if failures:
+        print(f'Regression: {failures} of {len(traces)} replays differ from their recording')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
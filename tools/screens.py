@@ -0,0 +1,173 @@
+'''
+Project Foobear: golden screenshots of the title, main and power out screens
+
+Plays a scripted night of code.py in the emulator with the framebuffer on and
+grabs three screens as they are refreshed: the title screen once it says
+"Press any key", the main screen (splashMain) a few seconds into the night and
+the power out screen. Each is compared with its golden PNG in tools/golden; a
+screen that differs is written with a diff image (changed pixels in magenta)
+to --out, and the command exits with 1.
+
+    python tools/screens.py            # compare with the goldens
+    python tools/screens.py --update   # accept the current screens as the goldens
+
+Run --update after an intended change to the look of a screen and commit the
+new PNGs with it.
+'''
+
+import argparse
+import os
+import struct
+import sys
+import zlib
+
+import numpy as np
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+GOLDEN_DIR = os.path.join(TOOLS_DIR, 'golden')
+OUT_DIR = os.path.join(os.path.dirname(TOOLS_DIR), '.cache', 'screens')
+
+import emulate
+from emulation import StopEmulation
+import framebuffer
+
+SEED = 0
+MAIN_TICK = 50      # the main screen is grabbed on the first refresh from this tick
+DOOR_TICK = 10      # the door is closed on this tick and left closed until the power runs out
+SCREENS = ('title', 'main', 'powerOut')
+
+
+# ===== PNG files =====
+
+def _chunk(kind, data):
+    return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+
+def writePNG(path, rgb):
+    height, width, _ = rgb.shape
+    rows = np.concatenate((np.zeros((height, 1), dtype=np.uint8), rgb.reshape(height, width * 3)), axis=1)
+    with open(path, 'wb') as f:
+        f.write(b'\x89PNG\r\n\x1a\n' + _chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+                + _chunk(b'IDAT', zlib.compress(rows.tobytes(), 9)) + _chunk(b'IEND', b''))
+
+
+# reads the 8 bit RGB PNGs written by writePNG() only
+def readPNG(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    position = 8
+    header = None
+    pixels = b''
+    while position < len(data):
+        (length,) = struct.unpack_from('>I', data, position)
+        kind = data[position + 4:position + 8]
+        body = data[position + 8:position + 8 + length]
+        if kind == b'IHDR':
+            header = struct.unpack('>IIBBBBB', body)
+        elif kind == b'IDAT':
+            pixels += body
+        position += 12 + length
+    if header is None or header[2:] != (8, 2, 0, 0, 0):
+        raise SystemExit(f'{path}: not written by this tool, run it with --update')
+    width, height = header[:2]
+    rows = np.frombuffer(zlib.decompress(pixels), dtype=np.uint8).reshape(height, width * 3 + 1)
+    if rows[:, 0].any():
+        raise SystemExit(f'{path}: not written by this tool, run it with --update')
+    return rows[:, 1:].reshape(height, width, 3)
+
+
+# ===== capture =====
+
+def labelTexts(group):
+    for layer in group:
+        if hasattr(layer, 'text'):
+            yield layer.text, layer.color
+        elif hasattr(layer, '__iter__'):
+            yield from labelTexts(layer)
+
+
+# C to leave the title screen, then close the door on DOOR_TICK until the power runs out
+def closeDoor(host):
+    engine = host.namespace.get('engine')
+    if engine is None or engine.gameStatus != 'Ongoing':
+        return ()
+    if engine.tick == 0:
+        return ('BUTTON_3',)
+    if engine.tick == DOOR_TICK:
+        return ('BUTTON_1',)
+    return ()
+
+
+def captureScreens():
+    screens = {}
+
+    def onRefresh(host, display):
+        group = display.root_group
+        engine = host.namespace.get('engine')
+        if group is None or engine is None:
+            return
+        texts = list(labelTexts(group))
+        if 'title' not in screens and any(text == 'Press any key' and color for text, color in texts):
+            screens['title'] = host.framebuffer.copy()
+        elif 'main' not in screens and group is host.namespace.get('splashMain') and engine.tick >= MAIN_TICK:
+            screens['main'] = host.framebuffer.copy()
+        elif 'powerOut' not in screens and any(text.startswith('Power overloaded') for text, _ in texts):
+            screens['powerOut'] = host.framebuffer.copy()
+        if len(screens) == len(SCREENS):
+            raise StopEmulation()
+
+    emulate.run(seed=SEED, policy=closeDoor, setup=lambda host: setattr(host, 'onRefresh', onRefresh), render=True)
+    missing = [name for name in SCREENS if name not in screens]
+    if missing:
+        raise SystemExit(f'the scripted night ended before showing: {", ".join(missing)}')
+    return screens
+
+
+# ===== comparison =====
+
+def diffImage(golden, actual):
+    changed = (golden != actual).any(axis=2)
+    image = golden // 3
+    image[changed] = (255, 0, 255)
+    return image, changed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the title, main and power out screens with their goldens.')
+    parser.add_argument('--update', action='store_true', help='write the current screens as the goldens')
+    parser.add_argument('--out', default=OUT_DIR, help='folder for the screens that differ (default .cache/screens)')
+    args = parser.parse_args()
+    screens = captureScreens()
+    if args.update:
+        os.makedirs(GOLDEN_DIR, exist_ok=True)
+        for name in SCREENS:
+            writePNG(os.path.join(GOLDEN_DIR, f'{name}.png'), framebuffer.toRGB(screens[name]))
+        print(f'{len(SCREENS)} goldens written to {GOLDEN_DIR}')
+        return
+    failures = 0
+    for name in SCREENS:
+        actual = framebuffer.toRGB(screens[name])
+        path = os.path.join(GOLDEN_DIR, f'{name}.png')
+        if not os.path.exists(path):
+            raise SystemExit(f'{path} not found, run python tools/screens.py --update')
+        golden = readPNG(path)
+        if golden.shape == actual.shape and np.array_equal(golden, actual):
+            print(f'{name:>10}  ok')
+            continue
+        failures += 1
+        os.makedirs(args.out, exist_ok=True)
+        writePNG(os.path.join(args.out, f'{name}.png'), actual)
+        if golden.shape != actual.shape:
+            print(f'{name:>10}  size {actual.shape[1]}x{actual.shape[0]} instead of {golden.shape[1]}x{golden.shape[0]}')
+            continue
+        image, changed = diffImage(golden, actual)
+        writePNG(os.path.join(args.out, f'{name}-diff.png'), image)
+        boxes, count = framebuffer.changedBoxes(np.zeros_like(changed), changed)
+        print(f'{name:>10}  {count} pixels differ in {boxes}')
+    if failures:
+        print(f'{failures} of {len(SCREENS)} screens differ from their goldens, see {args.out}')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+'''
+Project Foobear: stand-in for adafruit_bitmap_font.bitmap_font
+
+The game only uses fixed-width Terminus fonts, so the glyph size is taken from
+the file name (ter-u12b.pcf -> 6x12). The glyph bitmaps are only read from the
+PCF file when the framebuffer draws a label.
+'''
+
+import os
+import re
+import struct
+
+import numpy as np
+
+_PCF_METRICS = 1 << 2
+_PCF_BITMAPS = 1 << 3
+_PCF_BDF_ENCODINGS = 1 << 5
+_PCF_COMPRESSED_METRICS = 0x100
+_PCF_BIT_MASK = 1 << 3
+
+
+class Glyph:
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.dx = 0
+        self.dy = 0
+        self.shift_x = width
+        self.shift_y = 0
+
+
+class PCFBitmaps:
+
+    # the glyph metrics and bitmaps of a PCF font, read one character at a time
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            data = self.data = f.read()
+        (count,) = struct.unpack_from('<I', data, 4)
+        tables = {}
+        for i in range(count):
+            kind, fmt, _, offset = struct.unpack_from('<IIII', data, 8 + 16 * i)
+            tables[kind] = (fmt, offset)
+        self.encodings = tables[_PCF_BDF_ENCODINGS][1]
+        self.metricsFormat, self.metrics = tables[_PCF_METRICS]
+        self.bitmapFormat, self.bitmaps = tables[_PCF_BITMAPS]
+        if not self.bitmapFormat & _PCF_BIT_MASK:
+            raise ValueError(f'{path}: only most significant bit first PCF bitmaps are supported')
+        (glyphs,) = struct.unpack_from('>I', data, self.bitmaps + 4)
+        self.firstBitmap = self.bitmaps + 4 * (6 + glyphs)
+        self.cache = {}
+
+    # (bool mask, dx, dy, shift_x) like adafruit_bitmap_font draws it, or None if missing
+    def glyph(self, codePoint):
+        if codePoint in self.cache:
+            return self.cache[codePoint]
+        data = self.data
+        minByte2, maxByte2, minByte1, maxByte1 = struct.unpack_from('>hhhh', data, self.encodings + 4)
+        byte1, byte2 = codePoint >> 8, codePoint & 0xFF
+        glyph = None
+        if minByte1 <= byte1 <= maxByte1 and minByte2 <= byte2 <= maxByte2:
+            entry = (byte1 - minByte1) * (maxByte2 - minByte2 + 1) + byte2 - minByte2
+            (index,) = struct.unpack_from('>H', data, self.encodings + 14 + 2 * entry)
+            if index != 0xFFFF:
+                if self.metricsFormat & _PCF_COMPRESSED_METRICS:
+                    values = struct.unpack_from('5B', data, self.metrics + 6 + 5 * index)
+                    lsb, rsb, width, ascent, descent = (v - 0x80 for v in values)
+                else:
+                    lsb, rsb, width, ascent, descent, _ = struct.unpack_from('>5hH', data, self.metrics + 8 + 12 * index)
+                pad = 1 << (self.bitmapFormat & 3)
+                rowBytes = -(-(rsb - lsb) // (8 * pad)) * pad
+                (offset,) = struct.unpack_from('>I', data, self.bitmaps + 8 + 4 * index)
+                start = self.firstBitmap + offset
+                rows = np.frombuffer(data, dtype=np.uint8, count=rowBytes * (ascent + descent), offset=start)
+                mask = np.unpackbits(rows.reshape(ascent + descent, rowBytes), axis=1)[:, :rsb - lsb].astype(bool)
+                glyph = (mask, lsb, -descent, width)
+        self.cache[codePoint] = glyph
+        return glyph
+
+
+class Font:
+
+    def __init__(self, path):
+        if not os.path.exists(path):
+            raise OSError(2, 'No such file/directory', path)
+        self.path = path
+        match = re.search(r'ter-u(\d+)', path)
+        self.height = int(match.group(1)) if match else 12
+        self.width = self.height // 2
+        self._glyph = Glyph(self.width, self.height)
+        self._bitmaps = None
+
+    def get_bounding_box(self):
+        return self.width, self.height, 0, -2
+
+    def load_glyphs(self, code_points):
+        pass
+
+    def get_glyph(self, code_point):
+        return self._glyph
+
+    def bitmaps(self):
+        if self._bitmaps is None:
+            self._bitmaps = PCFBitmaps(self.path)
+        return self._bitmaps
+
+
+def load_font(filename, bitmap=None):
+    return Font(filename)
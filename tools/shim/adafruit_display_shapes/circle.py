@@ -0,0 +1,39 @@
+'''
+Project Foobear: stand-in for adafruit_display_shapes.circle
+'''
+
+import displayio
+import framebuffer
+
+
+class Circle(displayio.TileGrid):
+
+    def __init__(self, x0, y0, r, *, fill=None, outline=None, stroke=1):
+        super().__init__(None, pixel_shader=None, x=x0-r, y=y0-r)
+        self.r = r
+        self.fill = fill
+        self.outline = outline
+        self.stroke = stroke
+
+    def _draw(self, canvas):
+        if self.hidden:
+            return
+        inside, ring = framebuffer.circleMasks(self.r, self.stroke)
+        canvas.blit(self.x, self.y, inside, self.fill)
+        canvas.blit(self.x, self.y, ring, self.outline)
+
+    @property
+    def x0(self):
+        return self.x + self.r
+
+    @x0.setter
+    def x0(self, x0):
+        self.x = x0 - self.r
+
+    @property
+    def y0(self):
+        return self.y + self.r
+
+    @y0.setter
+    def y0(self, y0):
+        self.y = y0 - self.r
@@ -0,0 +1,24 @@
+'''
+Project Foobear: stand-in for adafruit_display_shapes.line
+'''
+
+import displayio
+import framebuffer
+
+
+class Line(displayio.TileGrid):
+
+    def __init__(self, x0, y0, x1, y1, color):
+        super().__init__(None, pixel_shader=None, x=min(x0, x1), y=min(y0, y1))
+        self.x0 = x0
+        self.y0 = y0
+        self.x1 = x1
+        self.y1 = y1
+        self.color = color
+
+    def _draw(self, canvas):
+        if self.hidden:
+            return
+        left, top = min(self.x0, self.x1), min(self.y0, self.y1)
+        canvas.blit(self.x, self.y, framebuffer.lineMask(self.x0 - left, self.y0 - top, self.x1 - left, self.y1 - top),
+                    self.color)
@@ -0,0 +1,23 @@
+'''
+Project Foobear: stand-in for adafruit_display_shapes.rect
+'''
+
+import displayio
+import framebuffer
+
+
+class Rect(displayio.TileGrid):
+
+    def __init__(self, x, y, width, height, *, fill=None, outline=None, stroke=1):
+        super().__init__(None, pixel_shader=None, x=x, y=y)
+        self.width = width
+        self.height = height
+        self.fill = fill
+        self.outline = outline
+        self.stroke = stroke
+
+    def _draw(self, canvas):
+        if self.hidden:
+            return
+        canvas.fill(self.x, self.y, self.width, self.height, self.fill)
+        canvas.blit(self.x, self.y, framebuffer.outlineMask(self.width, self.height, self.stroke), self.outline)
@@ -0,0 +1,22 @@
+'''
+Project Foobear: stand-in for adafruit_display_shapes.triangle
+'''
+
+import displayio
+import framebuffer
+
+
+class Triangle(displayio.TileGrid):
+
+    def __init__(self, x0, y0, x1, y1, x2, y2, *, fill=None, outline=None):
+        super().__init__(None, pixel_shader=None, x=min(x0, x1, x2), y=min(y0, y1, y2))
+        self.points = ((x0, y0), (x1, y1), (x2, y2))
+        self.fill = fill
+        self.outline = outline
+
+    def _draw(self, canvas):
+        if self.hidden:
+            return
+        inside, edges = framebuffer.triangleMasks(self.points)
+        canvas.blit(self.x, self.y, inside, self.fill)
+        canvas.blit(self.x, self.y, edges, self.outline)
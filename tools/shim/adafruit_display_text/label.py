@@ -0,0 +1,77 @@
+'''
+Project Foobear: stand-in for adafruit_display_text.label
+'''
+
+import displayio
+import framebuffer
+
+
+class Label(displayio.Group):
+
+    def __init__(self, font, *, text='', color=0xFFFFFF, background_color=None, scale=1, x=0, y=0,
+                 padding_top=0, padding_bottom=0, padding_left=0, padding_right=0, **kwargs):
+        super().__init__(scale=scale, x=x, y=y)
+        self.font = font
+        self.color = color
+        self.background_color = background_color
+        self.padding_top = padding_top
+        self.padding_bottom = padding_bottom
+        self.padding_left = padding_left
+        self.padding_right = padding_right
+        self.text = text
+
+    @property
+    def text(self):
+        return self._text
+
+    @text.setter
+    def text(self, text):
+        self._text = text
+        lines = text.split('\n')
+        self._width = max(len(line) for line in lines) * self.font.width
+        self._height = len(lines) * self.font.height
+
+    @property
+    def width(self):
+        return self._width
+
+    @property
+    def height(self):
+        return self._height
+
+    @property
+    def bounding_box(self):
+        return 0, -self._height // 2, self._width, self._height
+
+    # like adafruit_display_text: the first line is centered on y at half the ascent of "M j'",
+    # lines are 1.25 font heights apart and the background box spans them plus the padding
+    def _draw(self, canvas):
+        if self.hidden:
+            return
+        canvas = canvas.child(self.x, self.y, self.scale)
+        bitmaps = self.font.bitmaps()
+        metrics = [glyph for glyph in map(bitmaps.glyph, map(ord, "M j'")) if glyph]
+        ascent = max(mask.shape[0] + dy for mask, _, dy, _ in metrics)
+        descent = max(-dy for _, _, dy, _ in metrics)
+        lineStep = int(1.25 * self.font.get_bounding_box()[1])
+        yOffset = ascent // 2
+        glyphs = []
+        x = y = right = 0
+        for character in self._text:
+            if character == '\n':
+                x = 0
+                y += lineStep
+                continue
+            glyph = bitmaps.glyph(ord(character))
+            if glyph is None:
+                continue
+            mask, dx, dy, shiftX = glyph
+            glyphs.append((x + dx, y + yOffset - mask.shape[0] - dy, mask))
+            right = max(right, x + shiftX, x + mask.shape[1] + dx)
+            x += shiftX
+        if right and self.background_color is not None:
+            canvas.fill(-self.padding_left, yOffset - ascent - self.padding_top,
+                        right + self.padding_left + self.padding_right,
+                        y + ascent + descent + self.padding_top + self.padding_bottom, self.background_color)
+        for gx, gy, mask in glyphs:
+            canvas.blit(gx, gy, mask, self.color)
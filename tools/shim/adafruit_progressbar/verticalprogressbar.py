@@ -0,0 +1,42 @@
+'''
+Project Foobear: stand-in for adafruit_progressbar.verticalprogressbar
+'''
+
+import displayio
+
+
+class VerticalFillDirection:
+    TOP_TO_BOTTOM = 0
+    BOTTOM_TO_TOP = 1
+
+
+class VerticalProgressBar(displayio.TileGrid):
+
+    def __init__(self, position, size, min_value=0, max_value=100, value=0, bar_color=0x00FF00,
+                 outline_color=0xFFFFFF, fill_color=0x444444, border_thickness=1, margin_size=1,
+                 direction=VerticalFillDirection.BOTTOM_TO_TOP):
+        super().__init__(None, pixel_shader=None, x=position[0], y=position[1])
+        self.width, self.height = size
+        self.minimum = min_value
+        self.maximum = max_value
+        self.value = value
+        self.bar_color = bar_color
+        self.outline_color = outline_color
+        self.fill_color = fill_color
+        self.border_thickness = border_thickness
+        self.margin_size = margin_size
+        self.direction = direction
+
+    # border, then margin in the fill color, then the bar growing from the bottom (or the top)
+    def _draw(self, canvas):
+        if self.hidden:
+            return
+        border = self.border_thickness
+        canvas.fill(self.x, self.y, self.width, self.height, self.outline_color)
+        canvas.fill(self.x + border, self.y + border, self.width - 2 * border, self.height - 2 * border, self.fill_color)
+        inset = border + self.margin_size
+        span = self.height - 2 * inset
+        ratio = (min(self.maximum, max(self.minimum, self.value)) - self.minimum) / (self.maximum - self.minimum)
+        size = round(span * ratio)
+        top = self.y + inset if self.direction == VerticalFillDirection.TOP_TO_BOTTOM else self.y + inset + span - size
+        canvas.fill(self.x + inset, top, self.width - 2 * inset, size, self.bar_color)
@@ -0,0 +1,23 @@
+'''
+Project Foobear: stand-in for audiocore
+
+WaveFile only reads the header of the .wav, which is enough to know how long
+a clip plays on the virtual clock.
+'''
+
+import os
+import wave
+
+
+class WaveFile:
+
+    def __init__(self, file, buffer=None):
+        self.name = os.path.basename(file if isinstance(file, str) else file.name).replace('.wav', '')
+        with wave.open(file, 'rb') as w:
+            self.sample_rate = w.getframerate()
+            self.bits_per_sample = w.getsampwidth() * 8
+            self.channel_count = w.getnchannels()
+            self.duration = w.getnframes() / self.sample_rate
+
+    def deinit(self):
+        pass
@@ -0,0 +1,30 @@
+'''
+Project Foobear: stand-in for audioio
+'''
+
+
+class AudioOut:
+
+    def __init__(self, left_channel, *, right_channel=None, quiescent_value=0x8000):
+        self.left_channel = left_channel
+        self.sample = None
+        self.paused = False
+
+    def play(self, sample, *, loop=False):
+        self.sample = sample
+
+    def stop(self):
+        self.sample = None
+
+    def pause(self):
+        self.paused = True
+
+    def resume(self):
+        self.paused = False
+
+    @property
+    def playing(self):
+        return self.sample is not None
+
+    def deinit(self):
+        pass
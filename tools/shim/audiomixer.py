@@ -0,0 +1,68 @@
+'''
+Project Foobear: stand-in for audiomixer
+
+Voices "play" for the duration of their clip on the virtual clock, and like on
+the device a clip must have the format of the Mixer. Every play is recorded in
+emulation.host.audioLog as (time ns, voice, clip name).
+'''
+
+from emulation import host
+
+
+class MixerVoice:
+
+    def __init__(self, mixer, index):
+        self.mixer = mixer
+        self.index = index
+        self.level = 1.0
+        self.loop = False
+        self.sample = None
+        self.end = 0
+
+    def play(self, sample, *, loop=False):
+        mixer = self.mixer
+        if sample.sample_rate != mixer.sample_rate:
+            raise ValueError("The sample's sample rate does not match the mixer's")
+        if sample.channel_count != mixer.channel_count:
+            raise ValueError("The sample's channel count does not match the mixer's")
+        if sample.bits_per_sample != mixer.bits_per_sample:
+            raise ValueError("The sample's bits_per_sample does not match the mixer's")
+        if (sample.bits_per_sample > 8) != mixer.samples_signed:
+            raise ValueError("The sample's signedness does not match the mixer's")
+        self.sample = sample
+        self.loop = loop
+        self.end = host.now + round(sample.duration * 1000000000)
+        host.audioLog.append((host.now, self.index, sample.name))
+
+    def stop(self):
+        self.sample = None
+        self.end = 0
+
+    @property
+    def playing(self):
+        return self.sample is not None and (self.loop or host.now < self.end)
+
+
+class Mixer:
+
+    def __init__(self, voice_count=2, buffer_size=1024, channel_count=2, bits_per_sample=16,
+                 samples_signed=True, sample_rate=8000):
+        self.voice = tuple(MixerVoice(self, i) for i in range(voice_count))
+        self.buffer_size = buffer_size
+        self.channel_count = channel_count
+        self.bits_per_sample = bits_per_sample
+        self.samples_signed = samples_signed
+        self.sample_rate = sample_rate
+
+    @property
+    def playing(self):
+        return any(v.playing for v in self.voice)
+
+    def play(self, sample, *, voice=0, loop=False):
+        self.voice[voice].play(sample, loop=loop)
+
+    def stop_voice(self, voice=0):
+        self.voice[voice].stop()
+
+    def deinit(self):
+        pass
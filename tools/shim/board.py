@@ -0,0 +1,24 @@
+'''
+Project Foobear: stand-in for the Wio Terminal board module
+'''
+
+from emulation import host
+import displayio
+
+
+class Pin:
+
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return f'board.{self.name}'
+
+
+for _name in ('A0', 'A1', 'A2', 'A3', 'A4', 'A5', 'A6', 'A7', 'A8', 'D0', 'D1', 'D2', 'D3', 'D4', 'D5',
+              'D6', 'D7', 'D8', 'DAC0', 'DAC1', 'BUTTON_1', 'BUTTON_2', 'BUTTON_3', 'SWITCH_UP',
+              'SWITCH_DOWN', 'SWITCH_LEFT', 'SWITCH_RIGHT', 'SWITCH_PRESS', 'BUZZER', 'LED', 'LIGHT'):
+    globals()[_name] = Pin(_name)
+
+DISPLAY = displayio.Display(width=320, height=240)
+host.display = DISPLAY
@@ -0,0 +1,53 @@
+'''
+Project Foobear: stand-in for digitalio
+
+Input pins read the simulated buttons held down in emulation.host.
+'''
+
+from emulation import host
+
+
+class Direction:
+    INPUT = 'INPUT'
+    OUTPUT = 'OUTPUT'
+
+
+class Pull:
+    UP = 'UP'
+    DOWN = 'DOWN'
+
+
+class DriveMode:
+    PUSH_PULL = 'PUSH_PULL'
+    OPEN_DRAIN = 'OPEN_DRAIN'
+
+
+class DigitalInOut:
+
+    def __init__(self, pin):
+        self.pin = pin
+        self.direction = Direction.INPUT
+        self.pull = None
+        self._value = False
+
+    @property
+    def value(self):
+        if self.direction == Direction.OUTPUT:
+            return self._value
+        pressed = host.isPressed(self.pin)
+        return not pressed if self.pull == Pull.UP else pressed
+
+    @value.setter
+    def value(self, value):
+        self._value = bool(value)
+
+    def switch_to_input(self, pull=None):
+        self.direction = Direction.INPUT
+        self.pull = pull
+
+    def switch_to_output(self, value=False, drive_mode=DriveMode.PUSH_PULL):
+        self.direction = Direction.OUTPUT
+        self._value = value
+
+    def deinit(self):
+        pass
@@ -0,0 +1,157 @@
+'''
+Project Foobear: stand-in for displayio
+
+Keeps the layer tree and the display properties code.py sets. refresh() counts
+frames and, with emulation.host.render on, draws the root group into
+host.framebuffer (see framebuffer.py) and records the changed pixels in
+host.frames.
+'''
+
+import numpy as np
+
+from emulation import host
+import framebuffer
+
+
+class Group:
+
+    def __init__(self, *, scale=1, x=0, y=0):
+        self.scale = scale
+        self.x = x
+        self.y = y
+        self.hidden = False
+        self._layers = []
+
+    def append(self, layer):
+        self._layers.append(layer)
+
+    def insert(self, index, layer):
+        self._layers.insert(index, layer)
+
+    def remove(self, layer):
+        self._layers.remove(layer)
+
+    def pop(self, i=-1):
+        return self._layers.pop(i)
+
+    def index(self, layer):
+        return self._layers.index(layer)
+
+    def __len__(self):
+        return len(self._layers)
+
+    def __getitem__(self, index):
+        return self._layers[index]
+
+    def __setitem__(self, index, layer):
+        self._layers[index] = layer
+
+    def __delitem__(self, index):
+        del self._layers[index]
+
+    def __iter__(self):
+        return iter(self._layers)
+
+    def __contains__(self, layer):
+        return layer in self._layers
+
+    def _draw(self, canvas):
+        if self.hidden:
+            return
+        canvas = canvas.child(self.x, self.y, self.scale)
+        for layer in self._layers:
+            layer._draw(canvas)
+
+
+class Bitmap:
+
+    def __init__(self, width, height, value_count):
+        self.width = width
+        self.height = height
+        self.value_count = value_count
+        self._pixels = bytearray(width * height)
+
+    def __getitem__(self, index):
+        x, y = index if isinstance(index, tuple) else (index % self.width, index // self.width)
+        return self._pixels[y * self.width + x]
+
+    def __setitem__(self, index, value):
+        x, y = index if isinstance(index, tuple) else (index % self.width, index // self.width)
+        self._pixels[y * self.width + x] = value
+
+    def fill(self, value):
+        self._pixels[:] = bytes((value,)) * len(self._pixels)
+
+
+class Palette:
+
+    def __init__(self, color_count):
+        self._colors = [0] * color_count
+        self._transparent = set()
+
+    def __len__(self):
+        return len(self._colors)
+
+    def __getitem__(self, index):
+        return self._colors[index]
+
+    def __setitem__(self, index, color):
+        self._colors[index] = color
+        self._transparent.discard(index)
+
+    def make_transparent(self, index):
+        self._transparent.add(index)
+
+    def make_opaque(self, index):
+        self._transparent.discard(index)
+
+    def is_transparent(self, index):
+        return index in self._transparent
+
+
+class TileGrid:
+
+    def __init__(self, bitmap, *, pixel_shader, width=1, height=1, tile_width=None, tile_height=None,
+                 default_tile=0, x=0, y=0):
+        self.bitmap = bitmap
+        self.pixel_shader = pixel_shader
+        self.x = x
+        self.y = y
+        self.hidden = False
+
+    def _draw(self, canvas):
+        if self.hidden or self.bitmap is None:
+            return
+        bitmap = self.bitmap
+        pixels = np.frombuffer(bitmap._pixels, dtype=np.uint8).reshape(bitmap.height, bitmap.width)
+        for index in np.unique(pixels):
+            if not self.pixel_shader.is_transparent(index):
+                canvas.blit(self.x, self.y, pixels == index, self.pixel_shader[index])
+
+
+class Display:
+
+    def __init__(self, width=320, height=240):
+        self.width = width
+        self.height = height
+        self.rotation = 0
+        self.root_group = None
+        self.brightness = 1.0
+        self.auto_refresh = True
+
+    def refresh(self, *, target_frames_per_second=None, minimum_frames_per_second=0):
+        host.refreshes += 1
+        if host.render:
+            frame = framebuffer.render(self.root_group, self.width, self.height)
+            if host.framebuffer is None:
+                host.framebuffer = np.zeros_like(frame)
+            boxes, changed = framebuffer.changedBoxes(host.framebuffer, frame)
+            host.frames.append((host.now, boxes, changed))
+            host.framebuffer = frame
+            if host.onRefresh:
+                host.onRefresh(host, self)
+        return True
+
+
+def release_displays():
+    pass
@@ -0,0 +1,123 @@
+'''
+Project Foobear: emulation state shared by the stand-in hardware modules
+
+Holds the virtual clock, the simulated button states and the counters the
+stand-in modules update. time.monotonic_ns() moves the clock forward by a
+small poll step on every read and time.sleep() jumps it forward, so busy-wait
+loops and animations finish instantly.
+'''
+
+import gc as _gc
+import sys
+import time as _time
+import types
+
+HEAP_SIZE = 192 * 1024  # SAMD51P19 RAM
+
+
+class StopEmulation(BaseException):
+    pass
+
+
+class Host:
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self, pollStep=20000000, policy=None, until=None, render=False):
+        self.now = 0
+        self.pollStep = pollStep
+        self.policy = policy  # policy(host) -> names of the pins held down
+        self.until = until    # until(host) -> True to stop the emulation
+        self.namespace = {}
+        self.pressed = ()
+        self.scanners = []      # keypad scanners, run whenever the clock moves
+        self.display = None
+        self.refreshes = 0
+        self.gcCollects = 0
+        self.audioLog = []
+        self.serialInput = ''  # typed into the serial console, read by code.py through sys.stdin
+        self.render = render    # draw every display refresh into framebuffer (see framebuffer.py)
+        self.framebuffer = None
+        self.frames = []        # (time ns, changed (x, y, width, height) boxes, changed pixels) by refresh
+        self.onRefresh = None   # onRefresh(host, display) after every drawn refresh
+
+    # ===== virtual clock =====
+
+    def advance(self, ns):
+        self.now += ns
+        if self.policy:
+            self.pressed = self.policy(self)
+        for scanner in self.scanners:
+            scanner.scan(self.now)
+        if self.until and self.until(self):
+            raise StopEmulation()
+
+    def monotonic_ns(self):
+        self.advance(self.pollStep)
+        return self.now
+
+    def monotonic(self):
+        return self.monotonic_ns() / 1000000000
+
+    def sleep(self, seconds):
+        self.advance(round(seconds * 1000000000))
+
+    # ===== buttons =====
+
+    def isPressed(self, pin):
+        return pin.name in self.pressed
+
+    # ===== serial console =====
+
+    def readSerial(self, n=1):
+        text, self.serialInput = self.serialInput[:n], self.serialInput[n:]
+        return text
+
+    # ===== built-in module replacements =====
+
+    def timeModule(self):
+        module = types.ModuleType('time')
+        module.__dict__.update(_time.__dict__)
+        module.monotonic_ns = self.monotonic_ns
+        module.monotonic = self.monotonic
+        module.sleep = self.sleep
+        return module
+
+    def gcModule(self):
+        module = types.ModuleType('gc')
+        module.enable = _gc.enable
+        module.disable = _gc.disable
+        module.isenabled = _gc.isenabled
+        module.collect = self.collect
+        module.mem_free = lambda: HEAP_SIZE
+        module.mem_alloc = lambda: 0
+        return module
+
+    def collect(self):
+        self.gcCollects += 1
+
+    def install(self):
+        saved = {name: sys.modules.get(name) for name in ('time', 'gc')}
+        sys.modules['time'] = self.timeModule()
+        sys.modules['gc'] = self.gcModule()
+        self.savedStdin = sys.stdin
+        sys.stdin = SerialInput(self)
+        return saved
+
+    def uninstall(self, saved):
+        for name, module in saved.items():
+            sys.modules[name] = module
+        sys.stdin = self.savedStdin
+
+
+class SerialInput:
+
+    def __init__(self, host):
+        self.host = host
+
+    def read(self, n=1):
+        return self.host.readSerial(n)
+
+
+host = Host()
@@ -0,0 +1,137 @@
+'''
+Project Foobear: software rendering for the displayio stand-ins
+
+When emulation.host.render is on, Display.refresh() draws the root group into
+a NumPy framebuffer of RGB565 pixels (what the ILI9341 holds) and records which
+pixels changed since the previous refresh. The shapes, labels and progress bars
+are drawn the way the Adafruit libraries draw them, close to the device but not
+guaranteed pixel for pixel.
+'''
+
+import numpy as np
+
+BOX_MERGE_GAP = 8  # changed areas closer than this (pixels) are sent as one window
+
+
+def color565(color):
+    return ((color >> 8) & 0xF800) | ((color >> 5) & 0x07E0) | ((color & 0xFF) >> 3)
+
+
+# (height, width, 3) uint8 RGB of an RGB565 frame
+def toRGB(frame):
+    r = (frame >> 11) & 0x1F
+    g = (frame >> 5) & 0x3F
+    b = frame & 0x1F
+    return np.stack(((r << 3) | (r >> 2), (g << 2) | (g >> 4), (b << 3) | (b >> 2)), axis=-1).astype(np.uint8)
+
+
+class Canvas:
+
+    # a frame seen through the position and scale of a group
+    def __init__(self, frame, x=0, y=0, scale=1):
+        self.frame = frame
+        self.x = x
+        self.y = y
+        self.scale = scale
+
+    def child(self, x, y, scale=1):
+        return Canvas(self.frame, self.x + x * self.scale, self.y + y * self.scale, self.scale * scale)
+
+    def fill(self, x, y, width, height, color):
+        if color is None or width <= 0 or height <= 0:
+            return
+        s = self.scale
+        x0, y0 = self.x + x * s, self.y + y * s
+        x1, y1 = x0 + width * s, y0 + height * s
+        h, w = self.frame.shape
+        if x1 <= 0 or y1 <= 0 or x0 >= w or y0 >= h:
+            return
+        self.frame[max(0, y0):min(h, y1), max(0, x0):min(w, x1)] = color565(color)
+
+    # the True pixels of a 2D bool mask, its top left corner at (x, y)
+    def blit(self, x, y, mask, color):
+        if color is None or not mask.size:
+            return
+        s = self.scale
+        if s != 1:
+            mask = mask.repeat(s, axis=0).repeat(s, axis=1)
+        x0, y0 = self.x + x * s, self.y + y * s
+        h, w = self.frame.shape
+        mh, mw = mask.shape
+        cx0, cy0 = max(0, x0), max(0, y0)
+        cx1, cy1 = min(w, x0 + mw), min(h, y0 + mh)
+        if cx1 <= cx0 or cy1 <= cy0:
+            return
+        region = self.frame[cy0:cy1, cx0:cx1]
+        region[mask[cy0 - y0:cy1 - y0, cx0 - x0:cx1 - x0]] = color565(color)
+
+
+def render(group, width, height):
+    frame = np.zeros((height, width), dtype=np.uint16)
+    if group is not None:
+        group._draw(Canvas(frame))
+    return frame
+
+
+# ===== shapes =====
+
+def lineMask(x0, y0, x1, y1):
+    count = max(abs(x1 - x0), abs(y1 - y0)) + 1
+    xs = np.rint(np.linspace(x0, x1, count)).astype(int)
+    ys = np.rint(np.linspace(y0, y1, count)).astype(int)
+    left, top = min(x0, x1), min(y0, y1)
+    mask = np.zeros((abs(y1 - y0) + 1, abs(x1 - x0) + 1), dtype=bool)
+    mask[ys - top, xs - left] = True
+    return mask
+
+
+def outlineMask(width, height, stroke):
+    mask = np.ones((height, width), dtype=bool)
+    mask[stroke:height - stroke, stroke:width - stroke] = False
+    return mask
+
+
+def circleMasks(r, stroke):
+    y, x = np.mgrid[-r:r + 1, -r:r + 1]
+    distance = x * x + y * y
+    inside = distance <= r * r + r
+    return inside, inside & (distance > (r - stroke) * (r - stroke) + (r - stroke))
+
+
+def triangleMasks(points):
+    left = min(x for x, _ in points)
+    top = min(y for _, y in points)
+    right = max(x for x, _ in points)
+    bottom = max(y for _, y in points)
+    y, x = np.mgrid[top:bottom + 1, left:right + 1]
+    signs = []
+    for (ax, ay), (bx, by) in zip(points, points[1:] + points[:1]):
+        signs.append((bx - ax) * (y - ay) - (by - ay) * (x - ax))
+    inside = ((signs[0] >= 0) & (signs[1] >= 0) & (signs[2] >= 0)) | ((signs[0] <= 0) & (signs[1] <= 0) & (signs[2] <= 0))
+    edges = np.zeros_like(inside)
+    for (ax, ay), (bx, by) in zip(points, points[1:] + points[:1]):
+        edge = lineMask(ax - left, ay - top, bx - left, by - top)
+        ox, oy = min(ax, bx) - left, min(ay, by) - top
+        edges[oy:oy + edge.shape[0], ox:ox + edge.shape[1]] |= edge
+    return inside | edges, edges
+
+
+# ===== changed pixels =====
+
+def _runs(indices, gap):
+    return np.split(indices, np.flatnonzero(np.diff(indices) > gap) + 1)
+
+
+# (x, y, width, height) boxes around the pixels that differ, and the number of them
+def changedBoxes(before, after, gap=BOX_MERGE_GAP):
+    changed = before != after
+    count = int(changed.sum())
+    boxes = []
+    if not count:
+        return boxes, count
+    for band in _runs(np.flatnonzero(changed.any(axis=1)), gap):
+        rows = changed[band[0]:band[-1] + 1]
+        for run in _runs(np.flatnonzero(rows.any(axis=0)), gap):
+            used = np.flatnonzero(rows[:, run[0]:run[-1] + 1].any(axis=1))
+            boxes.append((int(run[0]), int(band[0] + used[0]), int(run[-1] - run[0] + 1), int(used[-1] - used[0] + 1)))
+    return boxes, count
@@ -0,0 +1,93 @@
+'''
+Project Foobear: stand-in for keypad
+
+Keys scans the simulated buttons in emulation.host every `interval` seconds of
+virtual time, as the background scanner does on the device, and queues a
+pressed or released Event for every button whose state changed since the last
+scan.
+'''
+
+from emulation import host
+
+
+class Event:
+
+    def __init__(self, key_number=0, pressed=True):
+        self.key_number = key_number
+        self.pressed = pressed
+        self.timestamp = 0
+
+    @property
+    def released(self):
+        return not self.pressed
+
+    def __eq__(self, other):
+        return isinstance(other, Event) and (self.key_number, self.pressed) == (other.key_number, other.pressed)
+
+    def __repr__(self):
+        return f'<Event: key_number {self.key_number} {"pressed" if self.pressed else "released"}>'
+
+
+class EventQueue:
+
+    def __init__(self, maxEvents):
+        self.maxEvents = maxEvents
+        self.queue = []
+        self.overflowed = False
+
+    def put(self, keyNumber, pressed, timestamp):
+        if len(self.queue) >= self.maxEvents:
+            self.overflowed = True
+            return
+        self.queue.append((keyNumber, pressed, timestamp))
+
+    def get(self):
+        event = Event()
+        return event if self.get_into(event) else None
+
+    def get_into(self, event):
+        if not self.queue:
+            return False
+        event.key_number, event.pressed, event.timestamp = self.queue.pop(0)
+        return True
+
+    def clear(self):
+        self.queue.clear()
+        self.overflowed = False
+
+    def __len__(self):
+        return len(self.queue)
+
+    def __bool__(self):
+        return bool(self.queue)
+
+
+class Keys:
+
+    def __init__(self, pins, *, value_when_pressed, pull=True, interval=0.02, max_events=64):
+        self.pins = tuple(pins)
+        self.key_count = len(self.pins)
+        self.intervalNs = round(interval * 1000000000)
+        self.events = EventQueue(max_events)
+        self.state = [False] * self.key_count
+        self.nextScan = host.now
+        host.scanners.append(self)
+
+    # called by the host whenever its clock moves; the buttons only change then
+    def scan(self, now):
+        if now < self.nextScan:
+            return
+        self.nextScan = now + self.intervalNs
+        for i, pin in enumerate(self.pins):
+            pressed = host.isPressed(pin)
+            if pressed != self.state[i]:
+                self.state[i] = pressed
+                self.events.put(i, pressed, now // 1000000)
+
+    # every key counts as released again, so the ones held down are queued as new presses
+    def reset(self):
+        self.state = [False] * self.key_count
+
+    def deinit(self):
+        if self in host.scanners:
+            host.scanners.remove(self)
@@ -0,0 +1,7 @@
+'''
+Project Foobear: stand-in for the micropython module
+'''
+
+
+def const(x):
+    return x
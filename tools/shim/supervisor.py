@@ -0,0 +1,15 @@
+'''
+Project Foobear: stand-in for the supervisor module
+'''
+
+from emulation import host
+
+
+class Runtime:
+
+    @property
+    def serial_bytes_available(self):
+        return len(host.serialInput)
+
+
+runtime = Runtime()
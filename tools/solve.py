@@ -0,0 +1,280 @@
+'''
+Project Foobear: optimal player by value iteration
+
+Packs the game state at each decision point into one dense integer index:
+anomaly room (10) x move mode (5) x power (0-100 in steps of 5) x door (2) x
+zap cooldown x lure cooldown x power reboot (the last three counted in moves),
+and solves the night backwards from 6 AM with value iteration over the
+decisions taken right after every Move() tick. The player is assumed to know
+where FooBear is, so the result is the theoretical ceiling of the survival
+rate for a parameter set. The timing model is the one of tools/montecarlo.py:
+actions take effect at the move tick, power changes per power monitor tick.
+Nobody needs to scan, so the SCAN_* parameters and LAUGH_INTERVAL are
+rejected as they are there.
+
+Each step is split into three precomputed tables - the player's action, the
+power monitor ticks until the next move, and FooBear's move (a 50x50 matrix
+over room and move mode) - so a solve only does gathers and small matrix
+products over the ~840k states and takes a few seconds.
+
+    python tools/solve.py
+    python tools/solve.py --check 100000 --param ZAP_COOLDOWN=100
+'''
+
+import argparse
+import math
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'CIRCUITPY'))
+
+from engine import MOVE_MODES, MOVE_PERF, RESET_ROOMS, TARGET_ROOM, AIR_VENT_ROOM, DOOR_ROOM, WINDOW_ROOM
+from montecarlo import NORMAL, DOOR, AIR_VENT, ESCAPE, LURE, ROOMS, POWER_MONITOR_PERIOD, getParams
+from markov import modeChange, aiLevels
+
+MODES = len(MOVE_MODES)
+# door position after the decision x special action
+SPECIALS = ('none', 'zap', 'lure')
+ACTIONS = tuple(f'{door}+{special}' if special != 'none' else door
+                for door in ('open', 'close') for special in SPECIALS)
+
+
+# ===== FooBear's move =====
+
+def moveKernel(ai, doorClosed, powerOut, p):
+    kernel = np.zeros((ROOMS * MODES, ROOMS * MODES))
+    for room in range(ROOMS):
+        for mode in range(MODES):
+            s = room * MODES + mode
+            if room == TARGET_ROOM:
+                kernel[s, s] = 1.0
+                continue
+            forced = powerOut and mode in (ESCAPE, LURE) and room in (DOOR_ROOM, AIR_VENT_ROOM)
+            move = 1.0 if forced else min(100, max(0, ai)) / 100
+            kernel[s, s] += 1 - move
+            if powerOut and mode in (NORMAL, LURE, ESCAPE):
+                changes = ((DOOR, 0.5), (AIR_VENT, 0.5))
+            else:
+                changes = modeChange(mode, room, p)
+            for newMode, prob in changes:
+                exits = MOVE_PERF[MOVE_MODES[newMode]][room]
+                if not exits:
+                    kernel[s, room * MODES + newMode] += move * prob
+                for newRoom in exits:
+                    weight = move * prob / len(exits)
+                    if newMode == DOOR and room == DOOR_ROOM and newRoom == TARGET_ROOM and doorClosed:
+                        for blockedMode in (NORMAL, AIR_VENT, ESCAPE):
+                            kernel[s, room * MODES + blockedMode] += weight / 3
+                    else:
+                        kernel[s, newRoom * MODES + newMode] += weight
+    return kernel
+
+
+# ===== model =====
+
+class Model:
+
+    def __init__(self, params=None):
+        self.p = p = getParams(params)
+        unit = p['DOOR_POWER_CHANGE_LEVEL']
+        if unit <= 0:
+            raise ValueError('DOOR_POWER_CHANGE_LEVEL must be positive')
+        for name in ('POWER_LIMIT', 'ZAP_POWER_CHANGE_LEVEL', 'AUDIO_POWER_CHANGE_LEVEL'):
+            if p[name] % unit:
+                raise ValueError(f'{name} must be a multiple of DOOR_POWER_CHANGE_LEVEL')
+        self.limit = p['POWER_LIMIT'] // unit
+        self.zapSpend = p['ZAP_POWER_CHANGE_LEVEL'] // unit
+        self.audioSpend = p['AUDIO_POWER_CHANGE_LEVEL'] // unit
+        movePeriod = p['MOVE_INTERVAL'] + 1
+        hourPeriod = p['HOUR_INTERVAL'] + 1
+        self.zapMoves = math.ceil((10 + p['ZAP_COOLDOWN']) / movePeriod)
+        self.audioMoves = math.ceil((10 + p['AUDIO_COOLDOWN']) / movePeriod)
+        self.rebootMoves = max(1, round(p['POWER_REBOOT_INTERNAL'] / movePeriod))
+        self.moveTicks = [0] + list(range(movePeriod, 6 * hourPeriod, movePeriod))
+        levels = aiLevels(p)
+        self.moveAI = [levels[t // hourPeriod] for t in self.moveTicks]
+        self.shape = (ROOMS, MODES, self.limit + 1, 2, self.zapMoves + 1, self.audioMoves + 1, self.rebootMoves + 1)
+        self.preShape = (ROOMS, MODES, self.limit + 1 + max(self.zapSpend, self.audioSpend)) + self.shape[3:]
+        self.size = int(np.prod(self.shape))
+        self.rest = self.size // (ROOMS * MODES)
+        self.buildActions()
+        self.intervals = {}
+        self.kernels = {}
+
+    def components(self, shape):
+        return [a.ravel().astype(np.int32) for a in np.indices(shape)]
+
+    # decision state -> pre-interval state(s), as lists of (index array, probability array)
+    def buildActions(self):
+        r, m, p, d, zc, ac, rb = self.components(self.shape)
+        pre = lambda *c: np.ravel_multi_index(c, self.preShape).astype(np.int32)
+        one = np.ones(self.size)
+        canAct = (rb == 0) & (r != TARGET_ROOM)
+        zapped = r == AIR_VENT_ROOM
+        zr = np.where(zapped, WINDOW_ROOM, r)
+        lured = ((r != TARGET_ROOM) & (r != AIR_VENT_ROOM)) * (self.p['LURED_CHANCE'] / 100)
+        self.valid = []
+        self.actions = []
+        for door in (0, 1):
+            # a player who can't act keeps the door as it is
+            self.valid += [canAct | (d == door), canAct & (zc == 0), canAct & (ac == 0)]
+            zp = p + self.zapSpend
+            ap = p + self.audioSpend
+            self.actions += [
+                [(pre(r, m, p, np.full_like(d, door), zc, ac, rb), one)],
+                [(pre(zr, np.where(zapped, ESCAPE, m), zp, np.full_like(d, door), self.zapMoves, ac, rb), one * 0.5),
+                 (pre(zr, np.where(zapped, DOOR, m), zp, np.full_like(d, door), self.zapMoves, ac, rb), one * 0.5)],
+                [(pre(r, np.full_like(m, LURE), ap, np.full_like(d, door), zc, self.audioMoves, rb), lured),
+                 (pre(r, m, ap, np.full_like(d, door), zc, self.audioMoves, rb), 1 - lured)],
+            ]
+
+    # pre-interval state -> decision-space state before the next move, for k power monitor ticks
+    def interval(self, k):
+        if k in self.intervals:
+            return self.intervals[k]
+        r, m, p, d, zc, ac, rb = self.components(self.preShape)
+        out = rb > 0
+        over = ~out & (k > 0) & (((d == 1) & (p + k >= self.limit)) | ((d == 0) & (p - 1 >= self.limit)))
+        newP = np.where(out, p, np.where(d == 1, np.minimum(self.limit, p + k), np.maximum(0, p - k)))
+        newP = np.where(over, 0, np.minimum(self.limit, newP))  # the clip only touches unreachable states
+        newD = np.where(over, 0, d)
+        newRb = np.where(over, self.rebootMoves, np.maximum(0, rb - 1))
+        calm = over & (m != DOOR) & (m != AIR_VENT)
+        zc1 = np.maximum(0, zc - 1)
+        ac1 = np.maximum(0, ac - 1)
+        post = lambda mode: np.ravel_multi_index((r, mode, newP, newD, zc1, ac1, newRb), self.shape).astype(np.int32)
+        self.intervals[k] = (post(np.where(calm, DOOR, m)), post(np.where(calm, AIR_VENT, m)))
+        return self.intervals[k]
+
+    def kernel(self, ai):
+        if ai not in self.kernels:
+            self.kernels[ai] = {(d, o): moveKernel(ai, d, o, self.p) for d in (0, 1) for o in (0, 1)}
+        return self.kernels[ai]
+
+    # door and power out flags of the state components after room and mode
+    def restFlags(self):
+        _, _, _, d, _, _, rb = self.components((1, 1) + self.shape[2:])
+        return d, (rb > 0).astype(np.int32)
+
+    def restGroups(self):
+        d, out = self.restFlags()
+        return {(dd, oo): np.flatnonzero((d == dd) & (out == oo)) for dd in (0, 1) for oo in (0, 1)}
+
+    # ===== value iteration =====
+
+    def solve(self, keepPolicy=False):
+        groups = self.restGroups()
+        targetRows = slice(TARGET_ROOM * MODES, (TARGET_ROOM + 1) * MODES)
+        value = np.ones(self.size)
+        policy = [None] * (len(self.moveTicks) - 1)
+        for j in range(len(self.moveTicks) - 2, -1, -1):
+            # FooBear's move j+1: reaching it in the control room means death
+            before = value.reshape(ROOMS * MODES, self.rest)
+            afterMove = np.empty_like(before)
+            for key, columns in groups.items():
+                afterMove[:, columns] = self.kernel(self.moveAI[j+1])[key] @ before[:, columns]
+            afterMove[targetRows] = 0.0
+            afterMove = afterMove.ravel()
+            # power monitor ticks between move j and j+1
+            k = self.moveTicks[j+1] // POWER_MONITOR_PERIOD - self.moveTicks[j] // POWER_MONITOR_PERIOD
+            toA, toB = self.interval(k)
+            afterInterval = 0.5 * (afterMove[toA] + afterMove[toB])
+            # the player's decision after move j
+            best = np.full(self.size, -1.0)
+            choice = np.zeros(self.size, dtype=np.int8)
+            for a, branches in enumerate(self.actions):
+                q = sum(prob * afterInterval[index] for index, prob in branches)
+                q = np.where(self.valid[a], q, -1.0)
+                better = q > best + 1e-12
+                best = np.where(better, q, best)
+                choice[better] = a
+            value = best
+            if keepPolicy:
+                policy[j] = choice
+        self.value = value
+        self.policy = policy
+        return value
+
+    def startStates(self):
+        return [np.ravel_multi_index((room, NORMAL, 0, 0, 0, 0, 0), self.shape) for room in RESET_ROOMS]
+
+    def survivalCeiling(self):
+        return float(np.mean(self.value[self.startStates()]))
+
+    # ===== check by simulation =====
+
+    def simulate(self, nights, seed=0):
+        rng = np.random.default_rng(seed)
+        state = np.asarray(self.startStates())[rng.integers(0, len(RESET_ROOMS), nights)]
+        alive = np.ones(nights, dtype=bool)
+        actions = np.zeros(len(ACTIONS), dtype=np.int64)
+        restD, restOut = self.restFlags()
+        for j in range(len(self.moveTicks) - 1):
+            a = self.policy[j][state]
+            actions += np.bincount(a[alive], minlength=len(ACTIONS))
+            pre = np.empty_like(state)
+            u = rng.random(nights)
+            for action, branches in enumerate(self.actions):
+                chosen = a == action
+                (indexA, probA), *others = branches
+                pre[chosen] = indexA[state[chosen]]
+                if others:
+                    indexB, _ = others[0]
+                    second = chosen & (u >= probA[state])
+                    pre[second] = indexB[state[second]]
+            k = self.moveTicks[j+1] // POWER_MONITOR_PERIOD - self.moveTicks[j] // POWER_MONITOR_PERIOD
+            toA, toB = self.interval(k)
+            state = np.where(rng.random(nights) < 0.5, toA[pre], toB[pre])
+            row, rest = np.divmod(state, self.rest)
+            alive &= row // MODES != TARGET_ROOM
+            kernels = self.kernel(self.moveAI[j+1])
+            newRow = row.copy()
+            u = rng.random(nights)
+            for (d, o), kernel in kernels.items():
+                group = (restD[rest] == d) & (restOut[rest] == o)
+                cumulative = np.cumsum(kernel, axis=1)[row[group]]
+                newRow[group] = np.minimum((cumulative <= u[group, None]).sum(axis=1), ROOMS * MODES - 1)
+            state = newRow * self.rest + rest
+        return alive.mean(), dict(zip(ACTIONS, actions.tolist()))
+
+
+def parseParams(specs):
+    params = {}
+    for spec in specs:
+        name, _, value = spec.partition('=')
+        if not value:
+            raise SystemExit(f'bad --param value {spec!r}, expected NAME=value')
+        params[name.strip()] = int(value)
+    return params
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Optimal survival probability by value iteration.')
+    parser.add_argument('--param', action='append', default=[], metavar='NAME=value',
+                        help='override a game parameter (repeat for more)')
+    parser.add_argument('--check', type=int, default=0, metavar='N',
+                        help='play N nights with the optimal policy on the same model')
+    parser.add_argument('--seed', type=int, default=0, help='random seed for --check (default 0)')
+    args = parser.parse_args()
+    start = time.perf_counter()
+    try:
+        model = Model(parseParams(args.param))
+    except (KeyError, ValueError) as e:
+        parser.error(e.args[0])
+    built = time.perf_counter()
+    model.solve(keepPolicy=bool(args.check))
+    solved = time.perf_counter()
+    print(f'{model.size:,} states, {len(model.moveTicks) - 1} moves; tables built in {built - start:.2f} s, '
+          f'solved in {solved - built:.2f} s')
+    print(f'Optimal survival probability (FooBear visible): {model.survivalCeiling():.4f}')
+    if args.check:
+        rate, actions = model.simulate(args.check, args.seed)
+        margin = 1.96 * math.sqrt(max(rate * (1 - rate), 1e-6) / args.check)
+        print(f'Simulated with the optimal policy: {rate:.4f} (+/- {margin:.4f}), actions taken: {actions}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,297 @@
+'''
+Project Foobear: cut the fonts down to the glyphs the game draws
+
+Scans code.py for every Label and every text later written to it (Label(text=),
+label.text = and setUI(label, 'text', ...)), resolves the strings through the
+assignments of code.py and the constants of engine.py, and collects the
+characters per font. The result goes to CIRCUITPY/glyphs.py, which code.py
+uses to load all of these glyphs at boot, and to subset PCF fonts in
+CIRCUITPY/font with only those glyphs (same metrics, so the layout does not
+change), cut from the full Terminus fonts kept in fonts/. Run it again after
+changing any text on screen: a character missing from a subset font is
+silently not drawn.
+
+    python tools/subsetfont.py
+    python tools/subsetfont.py --check   # exits with 1 if glyphs.py or a shipped font is out of date
+'''
+
+import argparse
+import ast
+import os
+import struct
+import sys
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(TOOLS_DIR)
+DEVICE_DIR = os.path.join(ROOT_DIR, 'CIRCUITPY')
+CODE_PATH = os.path.join(DEVICE_DIR, 'code.py')
+GLYPHS_PATH = os.path.join(DEVICE_DIR, 'glyphs.py')
+SOURCE_DIR = os.path.join(ROOT_DIR, 'fonts')
+OUT_DIR = os.path.join(DEVICE_DIR, 'font')
+NUMBER_CHARS = '0123456789'  # stands for a formatted number like f'{engine.hour} AM'
+
+sys.path.insert(0, DEVICE_DIR)
+
+import engine
+
+
+# ===== text scan =====
+
+class TextScanner:
+
+    def __init__(self, source):
+        self.tree = ast.parse(source)
+        self.assignments = {}   # name -> value nodes assigned to it anywhere in code.py
+        self.fonts = {}         # font variable -> font file
+        self.labels = {}        # label variable -> font variable
+        self.chars = {}         # font variable -> set of characters
+        self.resolving = set()
+        for node in ast.walk(self.tree):
+            if isinstance(node, ast.Assign):
+                for target in node.targets:
+                    if isinstance(target, ast.Name):
+                        self.assignments.setdefault(target.id, []).append(node.value)
+
+    def scan(self):
+        for node in ast.walk(self.tree):
+            if isinstance(node, ast.Assign) and isinstance(node.value, ast.Call):
+                call = node.value
+                if isinstance(call.func, ast.Attribute) and call.func.attr == 'load_font':
+                    self.fonts[node.targets[0].id] = os.path.basename(call.args[0].value)
+        for node in ast.walk(self.tree):
+            if isinstance(node, ast.Assign):
+                for call in ast.walk(node.value):
+                    if isinstance(call, ast.Call) and getattr(call.func, 'id', None) == 'Label':
+                        keywords = {k.arg: k.value for k in call.keywords}
+                        font = keywords['font'].id
+                        self.labels[node.targets[0].id] = font
+                        if 'text' in keywords:
+                            self.add(font, keywords['text'])
+        for node in ast.walk(self.tree):
+            if isinstance(node, ast.Assign):
+                for target in node.targets:
+                    if isinstance(target, ast.Attribute) and target.attr == 'text' and target.value.id in self.labels:
+                        self.add(self.labels[target.value.id], node.value)
+            elif isinstance(node, ast.Call) and getattr(node.func, 'id', None) == 'setUI':
+                label, prop, value = node.args
+                if prop.value == 'text' and label.id in self.labels:
+                    self.add(self.labels[label.id], value)
+        return {font: ''.join(sorted(chars - {'\n'})) for font, chars in self.chars.items()}
+
+    def add(self, font, node):
+        self.chars.setdefault(font, set()).update(self.resolve(node))
+
+    # every character the expression can produce
+    def resolve(self, node):
+        if isinstance(node, ast.Constant) and isinstance(node.value, str):
+            return set(node.value)
+        if isinstance(node, ast.JoinedStr):
+            chars = set()
+            for part in node.values:
+                if isinstance(part, ast.FormattedValue):
+                    try:
+                        chars |= self.resolve(part.value)
+                    except ValueError:
+                        chars |= set(NUMBER_CHARS)
+                else:
+                    chars |= self.resolve(part)
+            return chars
+        if isinstance(node, ast.Name):
+            if node.id in self.assignments:
+                if node.id in self.resolving:
+                    return set()
+                self.resolving.add(node.id)
+                try:
+                    return set().union(*(self.resolve(value) for value in self.assignments[node.id]))
+                finally:
+                    self.resolving.discard(node.id)
+            if hasattr(engine, node.id):
+                return self.resolveValue(getattr(engine, node.id), node)
+        if isinstance(node, ast.Subscript):
+            return self.resolve(node.value)
+        if isinstance(node, ast.BinOp) and isinstance(node.op, ast.Add):
+            return self.resolve(node.left) | self.resolve(node.right)
+        if isinstance(node, ast.IfExp):
+            return self.resolve(node.body) | self.resolve(node.orelse)
+        if isinstance(node, ast.Attribute) and node.attr == 'text' and getattr(node.value, 'id', None) in self.labels:
+            return set()  # the label's own text, collected from its assignments
+        raise ValueError(f'code.py line {node.lineno}: cannot tell what text {ast.unparse(node)!r} shows')
+
+    def resolveValue(self, value, node):
+        if isinstance(value, str):
+            return set(value)
+        if isinstance(value, dict):
+            value = value.values()
+        if isinstance(value, (list, tuple, type({}.values()))) and all(isinstance(v, str) for v in value):
+            return set(''.join(value))
+        raise ValueError(f'code.py line {node.lineno}: engine.{ast.unparse(node)} is not text')
+
+
+# ===== PCF subset =====
+
+_PCF_METRICS = 1 << 2
+_PCF_BITMAPS = 1 << 3
+_PCF_BDF_ENCODINGS = 1 << 5
+_PCF_COMPRESSED_METRICS = 0x100
+_PCF_BYTE_MASK = 1 << 2
+_KEPT_TABLES = (1 << 0, 1 << 1, 1 << 8)  # properties and accelerators, copied as they are
+
+
+def readTables(data):
+    if data[:4] != b'\x01fcp':
+        raise ValueError('not a PCF font')
+    (count,) = struct.unpack_from('<I', data, 4)
+    tables = {}
+    for i in range(count):
+        kind, fmt, size, offset = struct.unpack_from('<IIII', data, 8 + 16 * i)
+        if kind in (_PCF_METRICS, _PCF_BITMAPS, _PCF_BDF_ENCODINGS) and not fmt & _PCF_BYTE_MASK:
+            raise ValueError('only big endian PCF tables are supported')
+        tables[kind] = (fmt, size, offset)
+    return tables
+
+
+# a PCF font with the glyphs of codePoints only; returns (font bytes, code points not in the font)
+def subsetPCF(data, codePoints):
+    tables = readTables(data)
+    encFormat, _, encOffset = tables[_PCF_BDF_ENCODINGS]
+    minByte2, maxByte2, minByte1, maxByte1, defaultChar = struct.unpack_from('>5h', data, encOffset + 4)
+    metFormat, _, metOffset = tables[_PCF_METRICS]
+    compressed = metFormat & _PCF_COMPRESSED_METRICS
+    metricsSize = 5 if compressed else 12
+    firstMetric = metOffset + (6 if compressed else 8)
+    bitFormat, _, bitOffset = tables[_PCF_BITMAPS]
+    (glyphCount,) = struct.unpack_from('>I', data, bitOffset + 4)
+    firstBitmap = bitOffset + 4 * (6 + glyphCount)
+
+    glyphs = []
+    missing = []
+    for code in sorted(set(codePoints)):
+        byte1, byte2 = code >> 8, code & 0xFF
+        index = 0xFFFF
+        if minByte1 <= byte1 <= maxByte1 and minByte2 <= byte2 <= maxByte2:
+            entry = (byte1 - minByte1) * (maxByte2 - minByte2 + 1) + byte2 - minByte2
+            (index,) = struct.unpack_from('>H', data, encOffset + 14 + 2 * entry)
+        if index == 0xFFFF:
+            missing.append(code)
+            continue
+        metrics = data[firstMetric + metricsSize * index:firstMetric + metricsSize * (index + 1)]
+        if compressed:
+            lsb, rsb, _, ascent, descent = (v - 0x80 for v in metrics)
+        else:
+            lsb, rsb, _, ascent, descent, _ = struct.unpack('>5hH', metrics)
+        rowBytes = -(-(rsb - lsb) // 8)
+        (offset,) = struct.unpack_from('>I', data, bitOffset + 8 + 4 * index)
+        pad = 1 << (bitFormat & 3)
+        size = (ascent + descent) * -(-rowBytes // pad) * pad
+        glyphs.append((code, metrics, data[firstBitmap + offset:firstBitmap + offset + size], rowBytes, ascent + descent))
+    if not glyphs:
+        raise ValueError('none of the characters are in the font')
+
+    codes = [g[0] for g in glyphs]
+    lo1, hi1 = min(c >> 8 for c in codes), max(c >> 8 for c in codes)
+    lo2, hi2 = min(c & 0xFF for c in codes), max(c & 0xFF for c in codes)
+    indices = [0xFFFF] * ((hi1 - lo1 + 1) * (hi2 - lo2 + 1))
+    for i, code in enumerate(codes):
+        indices[((code >> 8) - lo1) * (hi2 - lo2 + 1) + (code & 0xFF) - lo2] = i
+    encodings = struct.pack('<I', encFormat) + struct.pack('>5h', lo2, hi2, lo1, hi1, defaultChar) \
+        + struct.pack(f'>{len(indices)}H', *indices)
+
+    metricsTable = struct.pack('<I', metFormat) + struct.pack('>H' if compressed else '>I', len(glyphs)) \
+        + b''.join(g[1] for g in glyphs)
+
+    offsets = []
+    position = 0
+    for g in glyphs:
+        offsets.append(position)
+        position += len(g[2])
+    sizes = [sum(rows * -(-rowBytes // (1 << p)) * (1 << p) for _, _, _, rowBytes, rows in glyphs) for p in range(4)]
+    bitmaps = struct.pack('<I', bitFormat) + struct.pack(f'>I{len(glyphs)}I4I', len(glyphs), *offsets, *sizes) \
+        + b''.join(g[2] for g in glyphs)
+
+    contents = {_PCF_BDF_ENCODINGS: (encFormat, encodings), _PCF_METRICS: (metFormat, metricsTable),
+                _PCF_BITMAPS: (bitFormat, bitmaps)}
+    for kind in _KEPT_TABLES:
+        if kind in tables:
+            fmt, size, offset = tables[kind]
+            contents[kind] = (fmt, data[offset:offset + size])
+    kinds = sorted(contents)
+    header = bytearray(b'\x01fcp' + struct.pack('<I', len(kinds)))
+    body = bytearray()
+    position = 8 + 16 * len(kinds)
+    for kind in kinds:
+        fmt, table = contents[kind]
+        header += struct.pack('<IIII', kind, fmt, len(table), position + len(body))
+        body += table + bytes(-len(table) % 4)
+    return bytes(header + body), missing
+
+
+# ===== output =====
+
+def render(chars, fonts):
+    lines = [
+        "'''",
+        'Project Foobear: characters drawn with each font',
+        '',
+        'Generated by tools/subsetfont.py, do not edit: run it again after changing any text on screen.',
+        "'''",
+        '',
+    ]
+    for font in sorted(chars):
+        lines.append(f'# {fonts[font]}')
+        lines.append(f'{font.upper()}_GLYPHS = {chars[font]!r}')
+    return '\n'.join(lines) + '\n'
+
+
+def readFile(path, mode='r'):
+    try:
+        with open(path, mode) as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Write subset fonts with only the glyphs code.py draws.')
+    parser.add_argument('--check', action='store_true',
+                        help='only report whether glyphs.py and the fonts in --out are up to date')
+    parser.add_argument('--out', default=OUT_DIR, help='folder for the subset fonts (default CIRCUITPY/font)')
+    args = parser.parse_args()
+    with open(CODE_PATH) as f:
+        scanner = TextScanner(f.read())
+    try:
+        chars = scanner.scan()
+    except ValueError as e:
+        raise SystemExit(str(e))
+    source = render(chars, scanner.fonts)
+    subsets = {}
+    for font in sorted(chars):
+        filename = scanner.fonts[font]
+        with open(os.path.join(SOURCE_DIR, filename), 'rb') as f:
+            data = f.read()
+        subset, missing = subsetPCF(data, [ord(c) for c in chars[font]])
+        subsets[filename] = (data, subset, missing, chars[font])
+    if args.check:
+        stale = [] if readFile(GLYPHS_PATH) == source else [GLYPHS_PATH]
+        for filename, (_, subset, _, _) in subsets.items():
+            path = os.path.join(args.out, filename)
+            if readFile(path, 'rb') != subset:
+                stale.append(path)
+        if stale:
+            raise SystemExit(f'{", ".join(stale)} out of date, run python tools/subsetfont.py')
+        print(f'{GLYPHS_PATH} and the fonts in {args.out} are up to date')
+        return
+    with open(GLYPHS_PATH, 'w') as f:
+        f.write(source)
+    os.makedirs(args.out, exist_ok=True)
+    print(f'{"font":>14}  {"glyphs":>6}  {"bytes":>7} -> {"bytes":<6}  characters')
+    for filename, (data, subset, missing, text) in subsets.items():
+        with open(os.path.join(args.out, filename), 'wb') as f:
+            f.write(subset)
+        print(f'{filename:>14}  {len(text) - len(missing):>6}  {len(data):>7} -> {len(subset):<6}  {text!r}')
+        if missing:
+            print(f'warning: {filename} has no glyph for {"".join(map(chr, missing))!r}')
+    print(f'Subset fonts written to {args.out}, glyph lists to {GLYPHS_PATH}')
+
+
+if __name__ == '__main__':
+    main()
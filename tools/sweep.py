@@ -0,0 +1,166 @@
+'''
+Project Foobear: parameter sweep over the game constants
+
+Runs every combination of the given game parameter values through the
+vectorized simulator (tools/montecarlo.py) on a process pool and reports the
+survival rate and the death causes of each configuration. Results are cached
+on disk by a hash of the configuration and of the rules (engine.py and
+montecarlo.py), so a re-run only computes new points.
+
+    python tools/sweep.py --grid AI_START_LEVEL=5,10,20 --grid MOVE_INTERVAL=30,40,50
+'''
+
+import argparse
+import concurrent.futures
+import csv
+import hashlib
+import itertools
+import json
+import os
+import sys
+import time
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(TOOLS_DIR)
+CACHE_DIR = os.path.join(ROOT_DIR, '.cache', 'sweep')
+
+import montecarlo
+
+
+def rulesVersion():
+    digest = hashlib.sha256()
+    for path in (os.path.join(ROOT_DIR, 'CIRCUITPY', 'engine.py'), montecarlo.__file__):
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+
+RULES_VERSION = rulesVersion()
+
+
+# ===== configurations =====
+
+def parseGrid(specs):
+    grid = {}
+    for spec in specs:
+        name, _, values = spec.partition('=')
+        if not values:
+            raise SystemExit(f'bad --grid value {spec!r}, expected NAME=v1,v2,...')
+        grid[name.strip()] = [int(v) for v in values.split(',') if v.strip()]
+    montecarlo.getParams({name: values[0] for name, values in grid.items()})  # reject unknown names early
+    return grid
+
+
+def configurations(grid):
+    names = sorted(grid)
+    for values in itertools.product(*(grid[name] for name in names)):
+        yield dict(zip(names, values))
+
+
+def cacheKey(config, nights, policy, seed):
+    payload = json.dumps({
+        'params': montecarlo.getParams(config),
+        'nights': nights,
+        'policy': policy,
+        'seed': seed,
+        'rules': RULES_VERSION,
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+# ===== runs =====
+
+def runConfig(config, nights, policy, seed):
+    start = time.perf_counter()
+    result = montecarlo.simulate(nights, policy, seed, params=config)
+    low, high = result.confidence()
+    return {
+        'config': config,
+        'nights': result.nights,
+        'survivalRate': result.survivalRate,
+        'confidence': [low, high],
+        'deathCauses': result.deathCauses(),
+        'powerOuts': result.powerOuts,
+        'seconds': time.perf_counter() - start,
+    }
+
+
+def loadCached(key):
+    path = os.path.join(CACHE_DIR, f'{key}.json')
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return None
+
+
+def saveCached(key, record):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    path = os.path.join(CACHE_DIR, f'{key}.json')
+    with open(f'{path}.tmp', 'w') as f:
+        json.dump(record, f)
+    os.replace(f'{path}.tmp', path)
+
+
+def sweep(grid, nights, policy='oracle', seed=0, jobs=None, useCache=True):
+    configs = list(configurations(grid))
+    records = [None] * len(configs)
+    pending = {}
+    for i, config in enumerate(configs):
+        key = cacheKey(config, nights, policy, seed)
+        cached = loadCached(key) if useCache else None
+        if cached is not None:
+            records[i] = cached
+        else:
+            pending[i] = key
+    if pending:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = {pool.submit(runConfig, configs[i], nights, policy, seed): i for i in pending}
+            for future in concurrent.futures.as_completed(futures):
+                i = futures[future]
+                records[i] = future.result()
+                saveCached(pending[i], records[i])
+    return records, len(configs) - len(pending)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sweep game constants through the vectorized simulator.')
+    parser.add_argument('--grid', action='append', default=[], metavar='NAME=v1,v2,...',
+                        help='values of one game parameter (repeat for more parameters)')
+    parser.add_argument('--nights', type=int, default=100000, help='nights per configuration (default 100000)')
+    parser.add_argument('--policy', choices=sorted(montecarlo.POLICIES), default='oracle',
+                        help='player policy (default oracle)')
+    parser.add_argument('--seed', type=int, default=0, help='random seed, shared by all configurations (default 0)')
+    parser.add_argument('--jobs', type=int, default=None, help='worker processes (default: CPU count)')
+    parser.add_argument('--no-cache', action='store_true', help='ignore and overwrite cached results')
+    parser.add_argument('--csv', metavar='PATH', help='also write the results as CSV')
+    args = parser.parse_args()
+    try:
+        grid = parseGrid(args.grid)
+    except (KeyError, ValueError) as e:
+        parser.error(e.args[0])
+    start = time.perf_counter()
+    records, cached = sweep(grid, args.nights, args.policy, args.seed, args.jobs, not args.no_cache)
+    elapsed = time.perf_counter() - start
+    names = sorted(grid)
+    causes = list(montecarlo.CAUSES)
+    header = names + ['survival', 'ci_low', 'ci_high'] + causes
+    print('  '.join(f'{h:>12}' for h in header))
+    for record in sorted(records, key=lambda r: -r['survivalRate']):
+        died = max(1, sum(record['deathCauses'].values()))
+        row = [str(record['config'][name]) for name in names]
+        row += [f'{record["survivalRate"]:.4f}', f'{record["confidence"][0]:.4f}', f'{record["confidence"][1]:.4f}']
+        row += [f'{record["deathCauses"][cause] / died:.1%}' for cause in causes]
+        print('  '.join(f'{v:>12}' for v in row))
+    print(f'{len(records)} configurations ({cached} cached) in {elapsed:.1f} s, rules version {RULES_VERSION}')
+    if args.csv:
+        with open(args.csv, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(header + ['nights'])
+            for record in records:
+                writer.writerow([record['config'][name] for name in names]
+                                + [record['survivalRate']] + record['confidence']
+                                + [record['deathCauses'][cause] for cause in causes] + [record['nights']])
+
+
+if __name__ == '__main__':
+    main()
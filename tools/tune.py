@@ -0,0 +1,168 @@
+'''
+Project Foobear: automatic difficulty tuner
+
+Searches the game constants for a target survival rate of a reference player
+(the Monte Carlo 'oracle' by default). Each round samples random
+configurations inside the search space and runs successive halving: every
+configuration plays a small batch of nights, the half closest to the target
+survives to the next rung with twice the nights, until one is left. The next
+round samples around the winner in a narrower space. The result is printed as
+a block of Engine parameters ready to paste into engine.py.
+
+    python tools/tune.py --target 0.7
+    python tools/tune.py --curve 0.99,0.95,0.88,0.80,0.74,0.70 --space MOVE_INTERVAL=25:60
+'''
+
+import argparse
+import concurrent.futures
+import os
+import random
+import re
+import sys
+import time
+
+import numpy as np
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+ENGINE_PATH = os.path.join(os.path.dirname(TOOLS_DIR), 'CIRCUITPY', 'engine.py')
+
+import montecarlo
+
+DEFAULT_SPACE = {
+    'AI_START_LEVEL': (1, 40),
+    'AI_FINAL_LEVEL': (50, 100),
+    'MOVE_INTERVAL': (20, 60),
+    'LURED_CHANCE': (40, 95),
+    'ZAP_COOLDOWN': (80, 250),
+    'AUDIO_COOLDOWN': (300, 900),
+    'DOOR_POWER_CHANGE_LEVEL': (2, 10),
+}
+
+
+# ===== objective =====
+
+# survival probability at the end of every hour
+def survivalCurve(result):
+    return 1 - np.cumsum(result.deathHours) / max(1, result.nights)
+
+
+def evaluate(config, nights, policy, seed):
+    result = montecarlo.simulate(nights, policy, seed, params=config)
+    return survivalCurve(result).tolist()
+
+
+def loss(curve, target):
+    if len(target) == 1:
+        return (curve[-1] - target[0]) ** 2
+    return float(np.mean((np.asarray(curve) - np.asarray(target)) ** 2))
+
+
+# ===== search =====
+
+def sample(rng, space, center=None, scale=1.0):
+    config = {}
+    for name, (low, high) in space.items():
+        if center is None:
+            config[name] = rng.randint(low, high)
+        else:
+            width = max(1, round((high - low) * scale / 2))
+            config[name] = min(high, max(low, center[name] + rng.randint(-width, width)))
+    if 'AI_START_LEVEL' in config and 'AI_FINAL_LEVEL' in config:
+        config['AI_FINAL_LEVEL'] = max(config['AI_FINAL_LEVEL'], config['AI_START_LEVEL'])
+    return config
+
+
+def successiveHalving(pool, configs, target, nights, policy, seed, log):
+    rung = 0
+    while True:
+        futures = [pool.submit(evaluate, config, nights, policy, seed + rung) for config in configs]
+        scored = sorted(zip((loss(f.result(), target) for f in futures), range(len(configs))))
+        log(f'  rung {rung}: {len(configs)} configs x {nights} nights, best loss {scored[0][0]:.5f}')
+        if len(configs) == 1:
+            return configs[0]
+        configs = [configs[i] for _, i in scored[:max(1, len(configs) // 2)]]
+        nights *= 2
+        rung += 1
+
+
+def tune(target, space=None, policy='oracle', configs=32, nights=2000, rounds=3, seed=0, jobs=None, log=print):
+    space = space or DEFAULT_SPACE
+    rng = random.Random(seed)
+    best = None
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as pool:
+        for r in range(rounds):
+            scale = 0.5 ** r
+            candidates = [sample(rng, space, best, scale) for _ in range(configs)]
+            if best is not None:
+                candidates[0] = best
+            log(f'round {r + 1}/{rounds}' + (f' (space scaled to {scale:.0%})' if r else ''))
+            best = successiveHalving(pool, candidates, target, nights, policy, seed + 1000 * r, log)
+    return best
+
+
+# ===== output =====
+
+def constantsBlock(config):
+    with open(ENGINE_PATH) as f:
+        lines = f.read().split('\n')
+    start = lines.index('    # game parameters (all interval and countdown time values are seconds * 10)')
+    block = []
+    for line in lines[start:]:
+        if not line.strip():
+            break
+        match = re.match(r'(\s+)([A-Z_0-9]+) = (\S+)(.*)', line)
+        if match and match.group(2) in config:
+            indent, name, _, rest = match.groups()
+            line = f'{indent}{name} = {config[name]}{rest}'
+        block.append(line)
+    return '\n'.join(block)
+
+
+def parseSpace(specs):
+    space = dict(DEFAULT_SPACE) if not specs else {}
+    for spec in specs:
+        name, _, bounds = spec.partition('=')
+        low, _, high = bounds.partition(':')
+        if not high:
+            raise SystemExit(f'bad --space value {spec!r}, expected NAME=low:high')
+        space[name.strip()] = (int(low), int(high))
+    montecarlo.getParams({name: low for name, (low, _) in space.items()})  # reject unknown names early
+    return space
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Tune the game constants for a target survival rate.')
+    parser.add_argument('--target', type=float, default=0.7, help='target survival rate at 6 AM (default 0.7)')
+    parser.add_argument('--curve', help='target survival at the end of each hour, 6 comma separated values')
+    parser.add_argument('--space', action='append', default=[], metavar='NAME=low:high',
+                        help='search range of one parameter (repeat; default: a built-in space of 7 parameters)')
+    parser.add_argument('--policy', choices=sorted(montecarlo.POLICIES), default='oracle',
+                        help='reference player (default oracle)')
+    parser.add_argument('--configs', type=int, default=32, help='configurations sampled per round (default 32)')
+    parser.add_argument('--nights', type=int, default=2000, help='nights per configuration on the first rung')
+    parser.add_argument('--rounds', type=int, default=3, help='search rounds (default 3)')
+    parser.add_argument('--verify', type=int, default=200000, help='nights for the final check (default 200000)')
+    parser.add_argument('--seed', type=int, default=0, help='random seed (default 0)')
+    parser.add_argument('--jobs', type=int, default=None, help='worker processes (default: CPU count)')
+    args = parser.parse_args()
+    target = [float(v) for v in args.curve.split(',')] if args.curve else [args.target]
+    if len(target) not in (1, 6):
+        raise SystemExit('--curve needs 6 values, one per hour')
+    try:
+        space = parseSpace(args.space)
+    except (KeyError, ValueError) as e:
+        parser.error(e.args[0])
+    start = time.perf_counter()
+    best = tune(target, space, args.policy, args.configs, args.nights, args.rounds,
+                args.seed, args.jobs)
+    result = montecarlo.simulate(args.verify, args.policy, args.seed + 99991, params=best)
+    low, high = result.confidence()
+    print(f'Tuned in {time.perf_counter() - start:.1f} s')
+    print(f'Survival rate over {result.nights} nights: {result.survivalRate:.4f} (95% CI {low:.4f}-{high:.4f})')
+    print(f'Survival per hour: {np.round(survivalCurve(result), 4).tolist()}')
+    print()
+    print(constantsBlock(best))
+
+
+if __name__ == '__main__':
+    main()